@@ -0,0 +1,75 @@
+# General packages and modules
+import logging
+
+# Import modules from FastAPI
+from fastapi import APIRouter
+
+# Import internal utilities for database access, graph constraints, configuration and schemas
+from app.utils.db import read_query, write_query
+from app.utils import queries
+from app.utils.constraints import node_indexes, property_key_pattern
+from app.utils.schema import IndexState, SchemaReport
+
+logger = logging.getLogger(__name__)
+
+# Set the API Router
+router = APIRouter()
+
+
+# Names and Cypher statements of the constraints and indexes the application expects
+def schema_statements():
+    statements = [
+        ('user_username_unique',
+         'CREATE CONSTRAINT user_username_unique IF NOT EXISTS FOR (user:User) REQUIRE user.username IS UNIQUE'),
+    ]
+
+    for label, properties in node_indexes.items():
+        for node_property in properties:
+            if not property_key_pattern.fullmatch(node_property):
+                raise ValueError(f'{node_property!r} is not a valid property name to index on {label}')
+            name = f'{label.lower()}_{node_property}_index'
+            statements.append(
+                (name, f'CREATE INDEX {name} IF NOT EXISTS FOR (node:{label}) ON (node.{node_property})'))
+
+    return statements
+
+
+# Create any missing constraints and indexes, existing ones are left as they are
+async def ensure_schema():
+    for name, cypher in schema_statements():
+        try:
+            await write_query(cypher)
+        except Exception:
+            # The application can still serve requests without the index, only more slowly
+            logger.exception('Could not create constraint or index %s', name)
+
+
+# GET state of the constraints and indexes in the database
+@router.get('/schema', response_model=SchemaReport)
+async def read_schema():
+    """
+    **Reports the indexes and constraints in the database, with the population progress of each index.**
+
+    :returns: SchemaReport response, with indexes, constraints and the names of any expected ones that are missing.
+    """
+    index_data = await read_query(queries.SHOW_INDEXES.render())
+    constraint_data = await read_query(queries.SHOW_CONSTRAINTS.render())
+
+    indexes = [IndexState(name=index['name'],
+                          type=index['type'],
+                          entity_type=index['entityType'],
+                          labels_or_types=index['labelsOrTypes'],
+                          properties=index['properties'],
+                          state=index['state'],
+                          population_percent=index['populationPercent']) for index in index_data]
+
+    constraints = [IndexState(name=constraint['name'],
+                              type=constraint['type'],
+                              entity_type=constraint['entityType'],
+                              labels_or_types=constraint['labelsOrTypes'],
+                              properties=constraint['properties']) for constraint in constraint_data]
+
+    existing = {index.name for index in indexes} | {constraint.name for constraint in constraints}
+    missing = [name for name, _ in schema_statements() if name not in existing]
+
+    return SchemaReport(indexes=indexes, constraints=constraints, missing=missing)
@@ -0,0 +1,84 @@
+# General packages and modules
+from secrets import compare_digest
+
+# Import modules from FastAPI
+from fastapi import APIRouter, Depends
+from fastapi.responses import Response
+
+# Import internal utilities for authorisation, configuration, metrics, caches and pools
+from app.utils.environment import Config
+from app.utils.metrics import Counter, Gauge, render
+from app.authorisation.auth import user_cache, oauth2_scheme, get_current_user, get_current_active_user
+from app.authorisation.hashing import hashing_pool
+from app.graph.cache import graph_cache
+from app.query.cache import query_cache
+from app.graph.adjacency import adjacency_snapshot
+from app.utils import db
+
+# Set the API Router
+router = APIRouter()
+
+PROMETHEUS_MEDIA_TYPE = 'text/plain; version=0.0.4'
+
+# Statistics kept by the caches and pools, copied into the metrics when they are collected
+CACHE_ENTRIES = Gauge('cache_entries', 'Entries held by a response cache', ['cache'])
+CACHE_HITS = Counter('cache_hits_total', 'Lookups answered by a response cache', ['cache'])
+CACHE_MISSES = Counter('cache_misses_total', 'Lookups not answered by a response cache', ['cache'])
+CACHE_EVICTIONS = Counter('cache_evictions_total', 'Entries evicted from a response cache', ['cache'])
+CACHE_BYTES = Gauge('cache_bytes', 'Estimated size of the entries held by a response cache', ['cache'])
+HASHING_IN_FLIGHT = Gauge('hashing_pool_in_flight', 'Password hashes running on the hashing pool')
+HASHING_QUEUED = Gauge('hashing_pool_queued', 'Password hashes waiting for a slot on the hashing pool')
+HASHING_COMPLETED = Counter('hashing_pool_completed_total', 'Password hashes completed by the hashing pool')
+HASHING_WAIT = Counter('hashing_pool_wait_seconds_total', 'Time password hashes waited for a slot on the pool')
+CYPHER_IN_FLIGHT = Gauge('cypher_queries_in_flight', 'Cypher statements running, including open streams')
+ADJACENCY_BYTES = Gauge('adjacency_snapshot_bytes', 'Memory held by the adjacency snapshot', ['part'])
+ADJACENCY_AGE = Gauge('adjacency_snapshot_age_seconds', 'Time since the adjacency snapshot was read')
+
+
+# Accept the static METRICS_TOKEN when it is set, as a scraper cannot refresh an expiring access token,
+# and the access token of an active user otherwise
+async def metrics_access(token: str = Depends(oauth2_scheme)):
+    if Config.METRICS_TOKEN and compare_digest(token.encode(), Config.METRICS_TOKEN.encode()):
+        return None
+    return await get_current_active_user(await get_current_user(token))
+
+
+def collect():
+    for name, stats in (('users', user_cache.stats()), ('graph', graph_cache.stats()),
+                        ('queries', query_cache.stats())):
+        CACHE_HITS.set(stats['hits'], cache=name)
+        CACHE_MISSES.set(stats['misses'], cache=name)
+        # Redis manages the size and evictions of a shared cache
+        if stats['size'] is not None:
+            CACHE_ENTRIES.set(stats['size'], cache=name)
+            CACHE_EVICTIONS.set(stats['evictions'], cache=name)
+        if stats.get('maxbytes') is not None:
+            CACHE_BYTES.set(stats['bytes'], cache=name)
+
+    CYPHER_IN_FLIGHT.set(db.in_flight)
+    HASHING_IN_FLIGHT.set(hashing_pool.in_flight)
+    HASHING_QUEUED.set(hashing_pool.queued)
+    HASHING_COMPLETED.set(hashing_pool.completed)
+    HASHING_WAIT.set(hashing_pool.total_wait)
+
+    if adjacency_snapshot.enabled and adjacency_snapshot.built_at is not None:
+        arrays, overlay = adjacency_snapshot.memory()
+        ADJACENCY_BYTES.set(arrays, part='arrays')
+        ADJACENCY_BYTES.set(overlay, part='overlay')
+        ADJACENCY_AGE.set(adjacency_snapshot.age())
+
+
+# GET metrics in the Prometheus text format
+@router.get('/metrics', response_class=Response)
+async def read_metrics():
+    """
+    **Exposes request, Cypher, authorisation, cache and pool metrics in the Prometheus text format.**
+
+    Request latency is labelled by route, Cypher latency and records by query template and access mode, and
+    the wait for a pooled connection by access mode, so that tail latency can be traced to the database,
+    to serialisation or to the event loop (event_loop_lag_seconds).
+
+    :returns: Prometheus text exposition.
+    """
+    collect()
+    return Response(render(), media_type=PROMETHEUS_MEDIA_TYPE)
@@ -0,0 +1,67 @@
+# Import modules from FastAPI
+from fastapi import APIRouter
+
+# Import internal utilities for query templates, caches and schemas
+from app.utils.queries import template_stats
+from app.authorisation.auth import user_cache
+from app.graph.cache import graph_cache
+from app.query.cache import query_cache
+from app.graph.adjacency import adjacency_snapshot
+from app.utils.profiling import slow_query_log
+from app.utils.schema import (QueryStatistics, TemplateStatistics, CachesStatistics, CacheStatistics,
+                              AdjacencyStatistics, SlowQueries, SlowQuery)
+
+# Set the API Router
+router = APIRouter()
+
+
+# GET execution statistics of each query template
+@router.get('/queries', response_model=QueryStatistics)
+async def read_query_statistics():
+    """
+    **Reports calls, errors, latency and repeated statements for each query template since the worker started.**
+
+    The repeated statement ratio is the share of executions whose text this worker had already run, and is
+    computed in process rather than read from the Neo4j plan cache.
+
+    :returns: QueryStatistics response, with statistics by template name.
+    """
+    return QueryStatistics(templates={name: TemplateStatistics(**stats.summary())
+                                      for name, stats in list(template_stats.items())})
+
+
+# GET size, hit ratio and evictions of the response caches
+@router.get('/caches', response_model=CachesStatistics)
+async def read_cache_statistics():
+    """
+    **Reports size, hits, misses, hit ratio and evictions of the user, graph and custom query caches.**
+
+    :returns: CachesStatistics response, with statistics by cache name.
+    """
+    return CachesStatistics(caches={'users': CacheStatistics(**user_cache.stats()),
+                                    'graph': CacheStatistics(**graph_cache.stats()),
+                                    'queries': CacheStatistics(**query_cache.stats())})
+
+
+# GET the most recent slow queries
+@router.get('/slow_queries', response_model=SlowQueries)
+async def read_slow_queries():
+    """
+    **Reports the most recent statements slower than SLOW_QUERY_SECONDS, newest first.**
+
+    :returns: SlowQueries response, with the template, access mode, parameter types, duration and plan summary
+    of each statement.
+    """
+    return SlowQueries(threshold_seconds=slow_query_log.threshold,
+                       queries=[SlowQuery(**entry) for entry in slow_query_log.recent()])
+
+
+# GET size and freshness of the adjacency snapshot
+@router.get('/adjacency', response_model=AdjacencyStatistics)
+async def read_adjacency_statistics():
+    """
+    **Reports the nodes, relationships, memory footprint and age of the in-memory adjacency snapshot.**
+
+    :returns: AdjacencyStatistics response, with the bytes held by the arrays and by the overlay of recent writes.
+    """
+    return AdjacencyStatistics(**adjacency_snapshot.stats())
@@ -1,6 +1,7 @@
 # General packages and modules
 from datetime import datetime, timedelta, timezone
 from typing import Optional
+import asyncio
 import time
 
 # FastAPI modules for authorisation
@@ -9,45 +10,60 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 
 # Modules for encryption and security
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 
 
 # Import utilities functions, configuration and schemas
 from app.utils.environment import Config
-from app.utils.db import neo4j_driver
+from app.utils.db import read_query, write_query
+from app.utils import queries
+from app.utils.cache import TTLCache
+from app.utils.coalescing import Coalescer
+from app.utils.metrics import AUTH_LOOKUP
+from app.query.cache import query_cache
+from app.authorisation.hashing import hashing_pool, hash_password, check_password
 from app.utils.schema import Token, TokenData, User, UserInDB
 
 
 # Set the API Router
 router = APIRouter()
 
-# Generate password hash
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
+# Authenticated users by username, so that each request does not need a database round trip
+# Entries are invalidated by the user management endpoints when a user is changed or deleted
+user_cache = TTLCache(maxsize=Config.USER_CACHE_SIZE, ttl=Config.USER_CACHE_TTL)
 
-def create_password_hash(password):
-    return pwd_context.hash(password)
 
+# Hashing is CPU bound, so it runs on the hashing pool rather than the event loop
+async def create_password_hash(password):
+    return await hashing_pool.run(hash_password, password)
 
-def verify_password(plain_password, password_hash):
-    return pwd_context.verify(plain_password, password_hash)
 
+async def verify_password(plain_password, password_hash):
+    return await hashing_pool.run(check_password, plain_password, password_hash)
+
+
+# Users of concurrent lookups, read with one statement
+async def load_users(usernames: list):
+    records = await read_query(queries.READ_USERS.render(), {'usernames': usernames})
+    return {record['user']['username']: record['user'] for record in records}
 
-# Search the database for user with specified username
-def get_user(username: str):
-    query = f'MATCH (a:User) WHERE a.username = \'{username}\' RETURN a'
 
-    with neo4j_driver.session() as session:
-        user_in_db = session.run(query)
-        user_data = user_in_db.data()[0]['a']
-        return UserInDB(**user_data)
+user_loader = Coalescer('users', load_users, window=Config.COALESCE_WINDOW, max_batch=Config.COALESCE_MAX_BATCH)
+
+
+# Search the database for user with specified username
+async def get_user(username: str):
+    user_data = await user_loader.load(username)
+    if user_data is None:
+        return None
+    return UserInDB(**user_data)
 
 
 # Authenticate user by checking they exist and that the password is correct
-def authenticate_user(username, password):
+async def authenticate_user(username, password):
     # First, retrieve the user by the email provided
-    user = get_user(username)
+    user = await get_user(username)
     if not user:
         return False
 
@@ -55,7 +71,7 @@ def authenticate_user(username, password):
     password_hash = user.hashed_password
     username = user.username
 
-    return user if verify_password(password, password_hash) else False
+    return user if await verify_password(password, password_hash) else False
 
 
 # Create access token, required for OAuth2 flow
@@ -84,9 +100,17 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         token_data = TokenData(username=username)
     except JWTError as e:
         raise credentials_exception from e
-    user = get_user(username=token_data.username)
+    start = time.perf_counter()
+    user = user_cache.get(token_data.username)
+    if user is not None:
+        AUTH_LOOKUP.observe(time.perf_counter() - start, cache='hit')
+        return user
+
+    user = await get_user(username=token_data.username)
+    AUTH_LOOKUP.observe(time.perf_counter() - start, cache='miss')
     if user is None:
         raise credentials_exception
+    user_cache.set(token_data.username, user)
     return user
 
 
@@ -100,7 +124,7 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
 # Endpoint for token authorisation
 @router.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+    user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -128,34 +152,30 @@ async def first_user(username: str,
             detail="Incorrect application password, please try again.",
             headers={"WWW-Authenticate": "Bearer"},
         )
-        time.sleep(1)
+        await asyncio.sleep(1)
         return denial
 
     # Create dictionary of new user attributes
     attributes = {
         'username': username,
         'full_name': full_name,
-        'hashed_password': create_password_hash(password),
+        'hashed_password': await create_password_hash(password),
         'joined': str(datetime.now(timezone.utc)),
         'disabled': False,
     }
 
-    # Write Cypher query and run against the database
-    cypher_search = 'MATCH (user:User) WHERE user.username = $username RETURN user'
-    cypher_create = 'CREATE (user:User $params) RETURN user'
-
-    with neo4j_driver.session() as session:
-        # First, run a search of users to determine if username is already in use
-        check_users = session.run(query=cypher_search, parameters={'username': username})
+    # First, run a search of users to determine if username is already in use
+    check_users = await read_query(queries.READ_USER.render(), {'username': username})
 
-        # Return error message if username is already in the database
-        if check_users.data():
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail=f"Operation not permitted, user with username {username} already exists.",
-                headers={"WWW-Authenticate": "Bearer"}
-            )
+    # Return error message if username is already in the database
+    if check_users:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Operation not permitted, user with username {username} already exists.",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
 
-        response = session.run(query=cypher_create, parameters={'params': attributes})
-        user_data = response.data()[0]['user']
+    response = await write_query(queries.CREATE_USER.render(), {'params': attributes})
+    query_cache.changed('User')
+    user_data = response[0]['user']
     return User(**user_data)
@@ -0,0 +1,105 @@
+# General packages and modules
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import os
+import time
+
+# Modules for encryption and security
+from passlib.context import CryptContext
+
+# Import configuration
+from app.utils.environment import Config
+
+# Generate password hash
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+# Module level functions, so they can be sent to worker processes
+def hash_password(password):
+    return pwd_context.hash(password)
+
+
+def check_password(plain_password, password_hash):
+    return pwd_context.verify(plain_password, password_hash)
+
+
+class HashingPool:
+    """
+    Runs password hashing and verification on a pool of threads or processes, off the event loop.
+
+    At most max_concurrency calls are submitted to the pool at once, any others wait in a queue.
+
+    :param kind: 'thread' or 'process'
+    :param workers: number of threads or processes in the pool, defaults to the number of cores
+    :param max_concurrency: maximum number of calls running in the pool, defaults to workers
+    """
+
+    def __init__(self, kind: str = 'thread', workers: int = None, max_concurrency: int = None):
+        self._executor = None
+        self._semaphore = None
+        self.configure(kind, workers, max_concurrency)
+
+        # Queueing metrics
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def configure(self, kind: str = 'thread', workers: int = None, max_concurrency: int = None):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Hashing pool kind must be 'thread' or 'process', not {kind!r}")
+        self.shutdown()
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency or self.workers
+        self._semaphore = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            executor_class = ProcessPoolExecutor if self.kind == 'process' else ThreadPoolExecutor
+            self._executor = executor_class(max_workers=self.workers)
+        return self._executor
+
+    async def run(self, function, *args):
+        # Semaphore is created on first use, so that it belongs to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        self.queued += 1
+        queued_at = time.perf_counter()
+        async with self._semaphore:
+            wait = time.perf_counter() - queued_at
+            self.queued -= 1
+            self.in_flight += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.executor, function, *args)
+            finally:
+                self.in_flight -= 1
+                self.completed += 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self):
+        return {
+            'kind': self.kind,
+            'workers': self.workers,
+            'max_concurrency': self.max_concurrency,
+            'queued': self.queued,
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'mean_wait': self.total_wait / self.completed if self.completed else 0.0,
+            'max_wait': self.max_wait,
+        }
+
+
+hashing_pool = HashingPool(kind=Config.HASH_POOL,
+                           workers=Config.HASH_WORKERS,
+                           max_concurrency=Config.HASH_MAX_CONCURRENCY)
@@ -0,0 +1,317 @@
+# General packages and modules
+from array import array
+import asyncio
+import sys
+import time
+
+import numpy as np
+from neo4j import READ_ACCESS
+
+# Import internal utilities for database access, query templates, graph constraints and configuration
+from app.utils.db import stream_query
+from app.utils import queries, constraints
+from app.utils.environment import Config
+
+
+class CSR:
+    """
+    Relationships of the snapshot in one direction, in compressed sparse row form.
+
+    The relationships of the node at position i are at offsets[i]:offsets[i + 1] of the other arrays, with the
+    position of the node at the other end, the code of the relationship type and the relationship ID.
+    """
+
+    def __init__(self, node_count: int, origins, others, type_codes, relationship_ids):
+        order = np.argsort(origins, kind='stable')
+        self.offsets = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(origins, minlength=node_count), out=self.offsets[1:])
+        self.others = others[order].astype(np.int32)
+        self.type_codes = type_codes[order]
+        self.relationship_ids = relationship_ids[order]
+
+    def slice(self, position: int):
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return self.others[start:end], self.type_codes[start:end], self.relationship_ids[start:end]
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.others.nbytes + self.type_codes.nbytes + self.relationship_ids.nbytes
+
+
+class AdjacencySnapshot:
+    """
+    In-memory adjacency of the nodes with the configured labels, through relationships of the configured types.
+
+    The snapshot is read from Neo4j into arrays, sorted node IDs with one CSR for each direction, so it holds
+    about 26 bytes for each relationship, rather than the hundreds of a dictionary of dictionaries. Writes made
+    through the graph endpoints are applied to a small overlay on top of the arrays, and the snapshot is read
+    again once the overlay reaches max_changes, or once it is older than max_staleness, which bounds how long
+    writes made elsewhere (custom Cypher, other workers) can go unseen. Relationships created in bulk are not
+    returned with their IDs, so they make the snapshot stale.
+
+    :param labels: labels of the nodes in the snapshot, the snapshot is disabled when empty
+    :param relationship_types: types of the relationships in the snapshot, all acceptable types when empty
+    :param max_staleness: seconds after which the snapshot is read again from Neo4j
+    :param max_changes: number of changes kept in the overlay before the snapshot is read again
+    """
+
+    def __init__(self, labels, relationship_types=None, max_staleness: float = 60, max_changes: int = 10_000):
+        for label in labels:
+            if label not in constraints.node_labels:
+                raise ValueError(f'{label!r} is not an acceptable node label for the adjacency snapshot')
+        for relationship_type in relationship_types or []:
+            if relationship_type not in constraints.relationship_types:
+                raise ValueError(f'{relationship_type!r} is not an acceptable relationship type '
+                                 f'for the adjacency snapshot')
+
+        self.labels = list(labels)
+        self.types = list(relationship_types or constraints.relationship_types)
+        self.type_codes = {relationship_type: code for code, relationship_type in enumerate(self.types)}
+        self.max_staleness = max_staleness
+        self.max_changes = max_changes
+
+        self.node_ids = np.empty(0, dtype=np.int64)
+        self.outgoing = self.incoming = None
+        self.built_at = None
+        self.build_seconds = 0.0
+        self.builds = 0
+        self.stale = True
+        self._clear_overlay()
+        self._journal = None
+        self._lock = None
+
+    @property
+    def enabled(self):
+        return bool(self.labels)
+
+    def _clear_overlay(self):
+        self.added_nodes = set()
+        self.added_relationships = {}
+        self.removed_nodes = set()
+        self.removed_relationships = set()
+        self.changes = 0
+
+    # Age of the snapshot in seconds, None before it is first read
+    def age(self):
+        return None if self.built_at is None else time.monotonic() - self.built_at
+
+    def needs_rebuild(self):
+        return self.stale or self.built_at is None or self.age() > self.max_staleness \
+            or self.changes >= self.max_changes
+
+    # Return the snapshot, reading it again from Neo4j first if it is stale
+    async def current(self):
+        if self.needs_rebuild():
+            # The lock is created on first use, so that it belongs to the running event loop
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                if self.needs_rebuild():
+                    await self.rebuild()
+        return self
+
+    async def rebuild(self):
+        start = time.perf_counter()
+        # Changes made while the snapshot is read are replayed on the new arrays, as the read may have missed them
+        self._journal = []
+        try:
+            node_ids = array('q')
+            async for record in stream_query(queries.ADJACENCY_NODES.render(), {'labels': self.labels},
+                                             access_mode=READ_ACCESS):
+                node_ids.append(record['id'])
+
+            sources, targets, codes, relationship_ids = array('q'), array('q'), array('B'), array('q')
+            async for record in stream_query(queries.ADJACENCY_RELATIONSHIPS.render(),
+                                             {'labels': self.labels, 'relationship_types': self.types},
+                                             access_mode=READ_ACCESS):
+                sources.append(record['source'])
+                targets.append(record['target'])
+                codes.append(self.type_codes[record['type']])
+                relationship_ids.append(record['id'])
+
+            self._load(np.asarray(node_ids, dtype=np.int64),
+                       np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64),
+                       np.asarray(codes, dtype=np.uint8), np.asarray(relationship_ids, dtype=np.int64))
+            journal = self._journal
+        finally:
+            self._journal = None
+
+        for change, args in journal:
+            change(*args)
+        self.build_seconds = time.perf_counter() - start
+
+    # Replace the arrays with the given nodes and relationships, dropping relationships to nodes not included
+    def _load(self, node_ids, sources, targets, type_codes, relationship_ids):
+        self.node_ids = np.unique(node_ids)
+        source_positions = self._positions(sources)
+        target_positions = self._positions(targets)
+        included = (source_positions >= 0) & (target_positions >= 0)
+        source_positions, target_positions = source_positions[included], target_positions[included]
+        type_codes, relationship_ids = type_codes[included], relationship_ids[included]
+
+        node_count = len(self.node_ids)
+        self.outgoing = CSR(node_count, source_positions, target_positions, type_codes, relationship_ids)
+        self.incoming = CSR(node_count, target_positions, source_positions, type_codes, relationship_ids)
+
+        self._clear_overlay()
+        self.stale = False
+        self.built_at = time.monotonic()
+        self.builds += 1
+
+    # Positions of node IDs in the sorted node_ids array, -1 where a node is not in the snapshot
+    def _positions(self, ids):
+        positions = np.searchsorted(self.node_ids, ids)
+        positions[positions >= len(self.node_ids)] = 0
+        found = self.node_ids[positions] == ids if len(self.node_ids) else np.zeros(len(ids), dtype=bool)
+        return np.where(found, positions, -1)
+
+    def _position(self, node_id: int):
+        position = int(np.searchsorted(self.node_ids, node_id))
+        if position < len(self.node_ids) and self.node_ids[position] == node_id:
+            return position
+        return None
+
+    def contains(self, node_id: int):
+        if node_id in self.removed_nodes:
+            return False
+        return node_id in self.added_nodes or self._position(node_id) is not None
+
+    # Relationships of a node in one direction, as (other node ID, type code, relationship ID) tuples
+    def _relationships(self, node_id: int, direction: str):
+        position = self._position(node_id)
+        if position is not None:
+            csr = self.outgoing if direction == 'out' else self.incoming
+            others, type_codes, relationship_ids = csr.slice(position)
+            yield from zip(self.node_ids[others].tolist(), type_codes.tolist(), relationship_ids.tolist())
+        yield from self.added_relationships.get((node_id, direction), ())
+
+    # Other ends of the relationships of a node, filtered by type codes and with the overlay applied
+    def _neighbours(self, node_id: int, direction: str, codes):
+        directions = ('out', 'in') if direction == 'both' else (direction,)
+        for each_direction in directions:
+            for other, code, relationship_id in self._relationships(node_id, each_direction):
+                if codes is not None and code not in codes:
+                    continue
+                if relationship_id in self.removed_relationships or other in self.removed_nodes:
+                    continue
+                yield other
+
+    def _codes(self, relationship_types):
+        if not relationship_types:
+            return None
+        return {self.type_codes[relationship_type] for relationship_type in relationship_types}
+
+    def degree(self, node_id: int, relationship_types=None, direction: str = 'both'):
+        return sum(1 for _ in self._neighbours(node_id, direction, self._codes(relationship_types)))
+
+    # IDs of the nodes within depth hops of a node, in the order they are reached
+    def neighbours(self, node_id: int, depth: int = 1, relationship_types=None, direction: str = 'both',
+                   limit: int = None):
+        codes = self._codes(relationship_types)
+        seen = {node_id}
+        found = []
+        frontier = [node_id]
+        for _ in range(depth):
+            next_frontier = []
+            for current in frontier:
+                for other in self._neighbours(current, direction, codes):
+                    if other in seen:
+                        continue
+                    seen.add(other)
+                    found.append(other)
+                    next_frontier.append(other)
+                    if limit is not None and len(found) >= limit:
+                        return found
+            frontier = next_frontier
+        return found
+
+    # Record a change, keeping it for replay if the snapshot is being read
+    def _change(self, change, *args):
+        if not self.enabled:
+            return
+        if self._journal is not None:
+            self._journal.append((change, args))
+        if not self.stale:
+            change(*args)
+
+    def _add_node(self, node_id: int, labels):
+        if any(label in self.labels for label in labels):
+            self.removed_nodes.discard(node_id)
+            if self._position(node_id) is None:
+                self.added_nodes.add(node_id)
+            self.changes += 1
+
+    def _remove_node(self, node_id: int):
+        if self.contains(node_id):
+            self.removed_nodes.add(node_id)
+            self.added_nodes.discard(node_id)
+            self.changes += 1
+
+    def _add_relationship(self, relationship_id: int, source_id: int, target_id: int, relationship_type: str):
+        if relationship_type not in self.type_codes or not (self.contains(source_id) and self.contains(target_id)):
+            return
+        # The relationship may already be in the arrays, when it is replayed after the snapshot was read
+        if any(relationship_id == existing for _, _, existing in self._relationships(source_id, 'out')):
+            return
+        code = self.type_codes[relationship_type]
+        self.added_relationships.setdefault((source_id, 'out'), []).append((target_id, code, relationship_id))
+        self.added_relationships.setdefault((target_id, 'in'), []).append((source_id, code, relationship_id))
+        self.changes += 1
+
+    def _remove_relationship(self, relationship_id: int):
+        self.removed_relationships.add(relationship_id)
+        self.changes += 1
+
+    # Changes made by the graph endpoints
+    def node_created(self, node_id: int, labels):
+        self._change(self._add_node, node_id, labels)
+
+    def node_deleted(self, node_id: int):
+        self._change(self._remove_node, node_id)
+
+    def relationship_created(self, relationship_id: int, source_id: int, target_id: int, relationship_type: str):
+        self._change(self._add_relationship, relationship_id, source_id, target_id, relationship_type)
+
+    def relationship_deleted(self, relationship_id: int):
+        self._change(self._remove_relationship, relationship_id)
+
+    def mark_stale(self):
+        self._change(self._set_stale)
+
+    def _set_stale(self):
+        self.stale = True
+
+    # Memory held by the snapshot, with the arrays counted exactly and the overlay estimated
+    def memory(self):
+        arrays = self.node_ids.nbytes
+        if self.outgoing is not None:
+            arrays += self.outgoing.nbytes + self.incoming.nbytes
+        overlay = sum(sys.getsizeof(part) for part in (self.added_nodes, self.removed_nodes,
+                                                       self.removed_relationships, self.added_relationships))
+        overlay += sum(sys.getsizeof(relationships) + 72 * len(relationships)
+                       for relationships in self.added_relationships.values())
+        return arrays, overlay
+
+    def stats(self):
+        arrays, overlay = self.memory()
+        return {
+            'enabled': self.enabled,
+            'labels': self.labels,
+            'relationship_types': self.types,
+            'nodes': len(self.node_ids) + len(self.added_nodes) - len(self.removed_nodes),
+            'relationships': 0 if self.outgoing is None else len(self.outgoing.others),
+            'pending_changes': self.changes,
+            'array_bytes': arrays,
+            'overlay_bytes': overlay,
+            'age_seconds': self.age(),
+            'max_staleness_seconds': self.max_staleness,
+            'builds': self.builds,
+            'build_ms': self.build_seconds * 1000,
+        }
+
+
+# Snapshot used by the graph endpoints, disabled unless ADJACENCY_LABELS is set
+adjacency_snapshot = AdjacencySnapshot(labels=Config.ADJACENCY_LABELS,
+                                       relationship_types=Config.ADJACENCY_RELATIONSHIP_TYPES,
+                                       max_staleness=Config.ADJACENCY_MAX_STALENESS,
+                                       max_changes=Config.ADJACENCY_MAX_CHANGES)
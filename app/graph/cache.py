@@ -0,0 +1,150 @@
+# General packages and modules
+import json
+
+# Import internal utilities for caching and configuration
+from app.utils.cache import TTLCache
+from app.utils.environment import Config
+
+
+class LocalStore:
+    """
+    Cache store held in the memory of this worker.
+
+    The relationships attached to each node are kept outside of the LRU, so that they cannot be evicted
+    before the relationships themselves. If the index outgrows the cache, the whole cache is cleared.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.attached = {}
+
+    async def get(self, key: str):
+        return self.cache.get(key)
+
+    async def set(self, key: str, value):
+        self.cache.set(key, value)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self.cache.invalidate(key)
+
+    async def attach(self, node_id: int, relationship_id: int):
+        if node_id not in self.attached and len(self.attached) >= 2 * self.cache.maxsize:
+            self.cache.clear()
+            self.attached.clear()
+        self.attached.setdefault(node_id, set()).add(relationship_id)
+
+    async def detach_all(self, node_id: int):
+        return self.attached.pop(node_id, set())
+
+    def stats(self):
+        return {'size': len(self.cache), 'maxsize': self.cache.maxsize, 'evictions': self.cache.evictions}
+
+
+class RedisStore:
+    """
+    Cache store shared between workers through Redis, which evicts entries by its own policy.
+
+    The relationships attached to each node are kept in a set whose expiry is renewed whenever a relationship
+    is attached, so with the volatile-ttl eviction policy the set is never evicted before its relationships.
+    Requires the redis package, which is not installed by default.
+    """
+
+    def __init__(self, url: str, ttl: float, prefix: str = 'fast-graph:'):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError('GRAPH_CACHE_REDIS_URL is set, but the redis package is not installed') from e
+
+        self.client = redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str):
+        raw = await self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value):
+        await self.client.set(self.prefix + key, json.dumps(value, default=str), ex=max(int(self.ttl), 1))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    async def attach(self, node_id: int, relationship_id: int):
+        key = f'{self.prefix}node-relationships:{node_id}'
+        await self.client.sadd(key, relationship_id)
+        await self.client.expire(key, max(int(self.ttl), 1))
+
+    async def detach_all(self, node_id: int):
+        key = f'{self.prefix}node-relationships:{node_id}'
+        attached = await self.client.smembers(key)
+        await self.client.delete(key)
+        return {int(relationship_id) for relationship_id in attached}
+
+    # Size and evictions are managed by Redis
+    def stats(self):
+        return {'size': None, 'maxsize': None, 'evictions': None}
+
+
+class GraphCache:
+    """
+    Read-through cache of Node and Relationship responses by ID, stored as plain dictionaries.
+
+    Each node keeps a list of the cached relationships attached to it, so that changing or deleting
+    the node also invalidates the relationships that contain a copy of it.
+
+    :param store: LocalStore or RedisStore holding the entries
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    # Look up a cached response, counting hits and misses
+    async def _lookup(self, key: str):
+        value = await self.store.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def get_node(self, node_id: int):
+        return await self._lookup(f'node:{node_id}')
+
+    async def set_node(self, node_id: int, node: dict):
+        await self.store.set(f'node:{node_id}', node)
+
+    async def invalidate_node(self, node_id: int):
+        attached = await self.store.detach_all(node_id)
+        await self.store.delete(f'node:{node_id}',
+                                *(f'relationship:{relationship_id}' for relationship_id in attached))
+
+    async def get_relationship(self, relationship_id: int):
+        return await self._lookup(f'relationship:{relationship_id}')
+
+    async def set_relationship(self, relationship_id: int, relationship: dict):
+        await self.store.set(f'relationship:{relationship_id}', relationship)
+
+        # Attach the relationship to both of its nodes
+        for node in (relationship['source_node'], relationship['target_node']):
+            await self.store.attach(node['node_id'], relationship_id)
+
+    async def invalidate_relationship(self, relationship_id: int):
+        await self.store.delete(f'relationship:{relationship_id}')
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return dict(self.store.stats(),
+                    hits=self.hits,
+                    misses=self.misses,
+                    hit_ratio=self.hits / lookups if lookups else 0.0)
+
+
+# Cache used by the graph endpoints, shared through Redis when a URL is configured
+if Config.GRAPH_CACHE_REDIS_URL:
+    graph_cache = GraphCache(RedisStore(Config.GRAPH_CACHE_REDIS_URL, ttl=Config.GRAPH_CACHE_TTL))
+else:
+    graph_cache = GraphCache(LocalStore(maxsize=Config.GRAPH_CACHE_SIZE, ttl=Config.GRAPH_CACHE_TTL))
@@ -1,30 +1,38 @@
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional, Union
+import base64
+import binascii
+import json
 
 # Import modules from FastAPI
-from fastapi import APIRouter, Depends, HTTPException, status
-
-# Import internal utilities for database access, authorisation, and schemas
-from app.utils.db import neo4j_driver
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+
+# Import Neo4j errors, reported for each chunk or operation of a batch
+from neo4j.exceptions import ClientError, DriverError, Neo4jError
+
+# Import internal utilities for database access, authorisation, configuration and schemas
+from app.utils.db import read_query, write_query, profile_query, write_transaction, run_statement
+from app.utils.environment import Config
+from app.utils import queries
+from app.graph.cache import graph_cache
+from app.query.cache import query_cache
+from app.graph.adjacency import adjacency_snapshot
+from app.utils.responses import FastJSONResponse
+from app.utils.coalescing import Coalescer
+from app.utils.deadlines import Deadline, request_deadline, cancellable
+from app.utils.constraints import node_labels, relationship_types, base_properties, property_key_pattern
 from app.authorisation.auth import get_current_active_user
-from app.utils.schema import User, Node, Nodes, Relationship
+from app.utils.schema import (User, Node, ProfiledNode, Nodes, Relationship, NodeIn, BatchNodes, ChunkError,
+                              RelationshipIn, BatchRelationships, BatchOperation, BatchResults)
 
 # Set the API Router
 router = APIRouter()
 
-# List of acceptable node labels and relationship types
-# Modify these to add constraints
-node_labels = ['Address', 'Geography', 'Person', 'Company', 'Event']
-relationship_types = ['LIVES_IN', 'USED_TO_LIVE_IN', 'WORKS_FOR', 'LOCATED_IN', 'KNOWS', 'ATTENDED', 'FRIEND']
-
-# Used for validation to ensure they are not overwritten
-base_properties = ['created_by', 'created_time']
+# Node labels, relationship types and base properties are set in app.utils.constraints
 
 
-# CREATE new node
-@router.post('/create_node', response_model=Node)
-async def create_node(label: str, node_attributes: dict,
-                      current_user: User = Depends(get_current_active_user)):
+# Check that a node label can be created through the graph endpoints
+def validate_node_label(label: str):
     # Check that node is not User
     if label == 'User':
         raise HTTPException(
@@ -32,69 +40,226 @@ async def create_node(label: str, node_attributes: dict,
             detail="Operation not permitted, cannot create a User with this method.",
             headers={"WWW-Authenticate": "Bearer"})
 
-    # Check that node has an acceptable label
+    validate_label(label)
+
+
+# Check that node has an acceptable label
+def validate_label(label: str):
     if label not in node_labels:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail="Operation not permitted, node label is not accepted.",
             headers={"WWW-Authenticate": "Bearer"})
 
-    # Check that attributes dictionary does not modify base fields
-    for key in node_attributes:
+
+# Check that relationship has an acceptable type
+def validate_relationship_type(relationship_type: str):
+    if relationship_type not in relationship_types:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Operation not permitted, relationship type is not accepted.",
+            headers={"WWW-Authenticate": "Bearer"})
+
+
+# Check that a property key can be used in a Cypher statement
+def validate_property_key(key: str):
+    if not property_key_pattern.fullmatch(key):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Operation not permitted, {key!r} is not a valid property name.",
+            headers={"WWW-Authenticate": "Bearer"})
+
+
+# Check that attributes dictionary does not modify base fields
+def validate_attributes(attributes: dict):
+    for key in attributes:
         if key in base_properties:
             raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                                 detail="Operation not permitted, you cannot modify those fields with this method.",
                                 headers={"WWW-Authenticate": "Bearer"})
 
-    unpacked_attributes = 'SET ' + ', '.join(f'new_node.{key}=\'{value}\'' for (key, value) in node_attributes.items())
 
-    cypher = f"""
-            CREATE (new_node:{label})\n'
-            SET new_node.created_by = $created_by\n'
-            SET new_node.created_time = $created_time\n'
-            {unpacked_attributes}\n
-            RETURN new_node, LABELS(new_node) as labels, ID(new_node) as id')
-            """
+# Encode the ID of the last node in a page as an opaque cursor for the next page
+def encode_cursor(last_node_id: int):
+    return base64.urlsafe_b64encode(json.dumps({'after': last_node_id}).encode()).decode()
+
+
+# Decode a cursor from a previous page into the ID of the last node returned
+def decode_cursor(cursor: str):
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))['after'])
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid cursor, use the next_cursor of a previous page.",
+            headers={"WWW-Authenticate": "Bearer"}) from e
+
+
+# Organise a record with id, labels and node into the content of a Node response, without validation
+def node_content(record: dict):
+    return {'node_id': record['id'], 'labels': record['labels'], 'properties': record['node']}
+
+
+# Check the property names of a fields projection
+def validate_fields(fields: Optional[List[str]]):
+    for field in fields or []:
+        validate_property_key(field)
+
 
-    with neo4j_driver.session() as session:
-        result = session.run(
-            query=cypher,
-            parameters={
-                'created_by': current_user.username,
-                'created_time': str(datetime.now(timezone.utc)),
-                'attributes': node_attributes,
-            },
-        )
+# Properties from the values a *_FIELDS template returns in the order of fields, without the missing ones
+def projected(fields: List[str], values: list) -> dict:
+    return {field: value for field, value in zip(fields, values) if value is not None}
 
-        node_data = result.data()[0]
+
+# Requested properties of a node read in full, such as a cached one, all of them when fields is None
+def selected(properties: Optional[dict], fields: Optional[List[str]]):
+    if fields is None or properties is None:
+        return properties
+    return {field: properties[field] for field in fields if field in properties}
+
+
+def selected_node(node: dict, fields: Optional[List[str]], node_properties: bool = True):
+    return dict(node, properties=selected(node['properties'], fields) if node_properties else None)
+
+
+# Split a list into consecutive chunks of at most chunk_size items
+def chunked(items: list, chunk_size: int):
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
+
+
+# Nodes of concurrent lookups by ID, read with one statement
+async def load_nodes(node_ids: list):
+    records = await read_query(queries.READ_NODES_BY_ID.render(), {'ids': node_ids})
+    return {record['id']: record for record in records}
+
+
+node_loader = Coalescer('nodes', load_nodes, window=Config.COALESCE_WINDOW, max_batch=Config.COALESCE_MAX_BATCH)
+
+
+# Run a read query, under PROFILE when asked, and return the records with the plan tree, or None
+async def read_records(query: str, parameters: dict, profile: bool, timeout: float = None):
+    if profile:
+        return await profile_query(query, parameters, timeout=timeout)
+    return await read_query(query, parameters, timeout=timeout), None
+
+
+# CREATE new node
+@router.post('/create_node', response_model=Node)
+async def create_node(label: str, node_attributes: dict,
+                      current_user: User = Depends(get_current_active_user)):
+    validate_node_label(label)
+    validate_attributes(node_attributes)
+
+    result = await write_query(queries.CREATE_NODE.render(label=label), {
+        'created_by': current_user.username,
+        'created_time': str(datetime.now(timezone.utc)),
+        'attributes': node_attributes,
+    })
+
+    node_data = result[0]
+    adjacency_snapshot.node_created(node_data['id'], node_data['labels'])
+    query_cache.changed(*node_data['labels'])
 
     return Node(node_id=node_data['id'],
                 labels=node_data['labels'],
                 properties=node_data['new_node'])
 
 
+# CREATE a batch of new nodes
+@router.post('/create_nodes', response_model=BatchNodes)
+async def create_nodes(nodes: List[NodeIn],
+                       chunk_size: int = Query(Config.BATCH_CHUNK_SIZE, ge=1),
+                       current_user: User = Depends(get_current_active_user)):
+    """
+    **Creates a batch of nodes, with one transaction per chunk of nodes sharing a label.**
+
+    :param **nodes** (list) - nodes to create, each with a label and properties
+
+    :param **chunk_size** (int) - maximum number of nodes written in each transaction
+
+    :returns: IDs of the created nodes in the order they were sent, None where the chunk of a node failed,
+    and the errors of any failed chunks.
+    """
+    # Validate the whole batch before anything is written
+    for node in nodes:
+        validate_node_label(node.label)
+        validate_attributes(node.properties)
+
+    # Group the positions of the nodes by label, as labels cannot be passed as parameters
+    positions_by_label = {}
+    for position, node in enumerate(nodes):
+        positions_by_label.setdefault(node.label, []).append(position)
+
+    node_ids = [None] * len(nodes)
+    errors = []
+    created_time = str(datetime.now(timezone.utc))
+
+    for label, positions in positions_by_label.items():
+        cypher = queries.CREATE_NODES.render(label=label)
+
+        for chunk_number, chunk in enumerate(chunked(positions, chunk_size)):
+            rows = [{'position': position, 'properties': nodes[position].properties} for position in chunk]
+            try:
+                result = await write_query(cypher, {
+                    'rows': rows,
+                    'created_by': current_user.username,
+                    'created_time': created_time,
+                })
+            except (Neo4jError, DriverError) as e:
+                errors.append(ChunkError(group=label, chunk=chunk_number, positions=chunk, detail=str(e)))
+                continue
+
+            for row in result:
+                node_ids[row['position']] = row['id']
+                adjacency_snapshot.node_created(row['id'], [label])
+            query_cache.changed(label)
+
+    return BatchNodes(node_ids=node_ids, errors=errors)
+
+
 # READ data about a node in the graph by ID
-@router.get('/read/{node_id}', response_model=Node)
-async def read_node_id(node_id: int, current_user: User = Depends(get_current_active_user)):
+@router.get('/read/{node_id}', response_model=Union[ProfiledNode, Node])
+async def read_node_id(node_id: int, profile: bool = False,
+                       fields: Optional[List[str]] = Query(None),
+                       current_user: User = Depends(get_current_active_user)):
     """
     **Retrieves data about a node in the graph, based on node ID.**
 
     :param **node_id** (str) - node id, used for indexed search
 
-    :returns: Node response, with node id, labels, and properties.
-    """
+    :param **profile** (bool) - run the query under PROFILE, bypassing the cache, and return its plan
 
-    cypher = """
-    MATCH (node)
-    WHERE ID(node) = $node_id
-    RETURN ID(node) as id, LABELS(node) as labels, node
-    """
+    :param **fields** (list) - only return these properties, read from the database without the others
 
-    with neo4j_driver.session() as session:
-        result = session.run(query=cypher,
-                             parameters={'node_id': node_id})
+    :returns: Node response, with node id, labels, and properties, and the plan with the rows and
+    database hits of each operator when profiled.
+    """
+    validate_fields(fields)
+
+    # A cached node is read in full, so the requested properties are picked from it
+    if not profile:
+        cached_node = await graph_cache.get_node(node_id)
+        if cached_node is not None:
+            return selected_node(cached_node, fields)
+
+    # A profiled or projected lookup runs on its own, other lookups of concurrent requests are loaded together
+    plan = None
+    if fields is not None:
+        result, plan = await read_records(queries.READ_NODE_FIELDS.render(),
+                                          {'node_id': node_id, 'fields': fields}, profile)
+        node_data = dict(result[0], node=projected(fields, result[0]['node'])) if result else None
+    elif profile:
+        result, plan = await read_records(queries.READ_NODE.render(), {'node_id': node_id}, profile)
+        node_data = result[0] if result else None
+    else:
+        node_data = await node_loader.load(node_id)
 
-        node_data = result.data()[0]
+    if node_data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Node with ID: {node_id} was not found.",
+            headers={"WWW-Authenticate": "Bearer"})
 
     # Check node for type User, and send error message if needed
     if 'User' in node_data['labels']:
@@ -103,16 +268,29 @@ async def read_node_id(node_id: int, current_user: User = Depends(get_current_ac
             detail="Operation not permitted, please use User endpoints to retrieve user information.",
             headers={"WWW-Authenticate": "Bearer"})
 
-    # Return Node response
-    return Node(node_id=node_data['id'],
+    # Cache and return Node response
+    node = Node(node_id=node_data['id'],
                 labels=node_data['labels'],
                 properties=node_data['node'])
+    if profile:
+        return ProfiledNode(**node.dict(), plan=plan)
+    if fields is None:
+        await graph_cache.set_node(node_id, node.dict())
+    return node
 
 
 # READ data about a collection of nodes in the graph
 @router.get('/read_node_collection', response_model=Nodes)
-async def read_nodes(search_node_property: str, node_property_value: str,
-                     current_user: User = Depends(get_current_active_user)):
+async def read_nodes(request: Request,
+                     search_node_property: str, node_property_value: str,
+                     label: Optional[str] = None,
+                     limit: int = Query(Config.PAGE_SIZE, ge=1, le=Config.MAX_PAGE_SIZE),
+                     cursor: Optional[str] = None,
+                     profile: bool = False,
+                     fields: Optional[List[str]] = Query(None),
+                     current_user: User = Depends(get_current_active_user),
+                     deadline: Deadline = Depends(request_deadline('/graph/read_node_collection',
+                                                                   Config.COLLECTION_TIMEOUT))):
     """
     Retrieves data about a collection of nodes in the graph, based on node property.
 
@@ -120,19 +298,54 @@ async def read_nodes(search_node_property: str, node_property_value: str,
 
     :param **node_property_value** (str) - value of property, to select the correct node
 
-    :returns: Node response, with node id, labels, and properties. Returns only first response.
-    """
+    :param **label** (str) - optional node label, so that the search can use the label's indexes
 
-    cypher = f"""
-        MATCH (node)
-        WHERE node.{search_node_property} = '{node_property_value}'
-        RETURN ID(node) as id, LABELS(node) as labels, node')
-        """
+    :param **limit** (int) - maximum number of nodes in the page
 
-    with neo4j_driver.session() as session:
-        result = session.run(query=cypher)
+    :param **cursor** (str) - next_cursor of the previous page, to continue from where it ended
 
-        collection_data = result.data()
+    :param **profile** (bool) - run the query under PROFILE and return its plan
+
+    :param **fields** (list) - only return these properties of each node, read from the database without the others
+
+    :returns: Nodes response, with node id, labels, and properties, a next_cursor if there are more nodes,
+    and the plan with the rows and database hits of each operator when profiled. The query is stopped when the
+    client disconnects, or once the deadline set by the X-Request-Timeout header, at most COLLECTION_TIMEOUT
+    seconds, has passed.
+    """
+    validate_property_key(search_node_property)
+    validate_fields(fields)
+
+    # Check that the label is one of the acceptable labels, so that User nodes cannot be searched
+    if label is not None:
+        validate_label(label)
+        template = queries.READ_NODES_BY_LABEL if fields is None else queries.READ_NODES_BY_LABEL_FIELDS
+        cypher = template.render(label=label, search_property=search_node_property)
+    else:
+        template = queries.READ_NODES if fields is None else queries.READ_NODES_FIELDS
+        cypher = template.render(search_property=search_node_property)
+
+    after = decode_cursor(cursor) if cursor else -1
+
+    # One extra node is fetched to find out whether there is a next page
+    parameters = {'value': node_property_value, 'after': after, 'limit': limit + 1}
+    if fields is not None:
+        parameters['fields'] = fields
+    collection_data, plan = await cancellable(request, deadline,
+                                              read_records(cypher, parameters, profile, deadline.remaining()))
+    if fields is not None:
+        collection_data = [dict(record, node=projected(fields, record['node'])) for record in collection_data]
+
+    next_cursor = None
+    if len(collection_data) > limit:
+        collection_data = collection_data[:limit]
+        next_cursor = encode_cursor(collection_data[-1]['id'])
+
+    # Driver output is trusted, so the fast path skips building and validating the pydantic models
+    if Config.FAST_SERIALIZATION:
+        return FastJSONResponse({'nodes': [node_content(node) for node in collection_data],
+                                 'next_cursor': next_cursor,
+                                 'plan': plan})
 
     node_list = []
     for node in collection_data:
@@ -145,7 +358,7 @@ async def read_nodes(search_node_property: str, node_property_value: str,
         node_list.append(node)
 
     # Return Nodes response with collection as list
-    return Nodes(nodes=node_list)
+    return Nodes(nodes=node_list, next_cursor=next_cursor, plan=plan)
 
 
 # UPDATE properties of node in the graph
@@ -159,15 +372,11 @@ async def update_node(node_id: int, attributes: dict):
                 detail="Operation not permitted, that property field cannot be updated.",
                 headers={"WWW-Authenticate": "Bearer"})
 
-    cypher = '''MATCH (node) WHERE ID(node) = $id
-                SET node += $attributes
-                RETURN node, ID(node) as id, LABELS(node) as labels'''
+    result = await write_query(queries.UPDATE_NODE.render(), {'node_id': node_id, 'attributes': attributes})
+    await graph_cache.invalidate_node(node_id)
 
-    with neo4j_driver.session() as session:
-        result = session.run(query=cypher,
-                             parameters={'id': node_id, 'attributes': attributes})
-
-        node_data = result.data()[0]
+    node_data = result[0]
+    query_cache.changed(*node_data['labels'])
 
     # Return Node response
     return Node(node_id=node_data['id'],
@@ -179,17 +388,11 @@ async def update_node(node_id: int, attributes: dict):
 @router.post('/delete/{node_id}')
 async def delete_node(node_id: int):
 
-    cypher = """
-    MATCH (node)
-    WHERE ID(node) = $node_id
-    DETACH DELETE node
-    """
-
-    with neo4j_driver.session() as session:
-        result = session.run(query=cypher,
-                             parameters={'node_id': node_id})
-
-        node_data = result.data()
+    node_data = await write_query(queries.DELETE_NODE.render(), {'node_id': node_id})
+    await graph_cache.invalidate_node(node_id)
+    adjacency_snapshot.node_deleted(node_id)
+    # The labels of the deleted node and of its relationships are not returned
+    query_cache.changed_everything()
 
     # Confirm deletion was completed by empty response
     return node_data or {
@@ -204,47 +407,35 @@ async def create_relationship(source_node_label: str, source_node_property: str,
                               target_node_label: str, target_node_property: str, target_node_property_value: str,
                               relationship_type: str, relationship_attributes: Optional[dict] = None,
                               current_user: User = Depends(get_current_active_user)):
-    # Check that relationship has an acceptable type
-    if relationship_type not in relationship_types:
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail="Operation not permitted, relationship type is not accepted.",
-            headers={"WWW-Authenticate": "Bearer"})
-
-    # Check that attributes dictionary does not modify base fields
-    for key in relationship_attributes:
-        if key in base_properties:
-            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                                detail="Operation not permitted, you cannot modify those fields with this method.",
-                                headers={"WWW-Authenticate": "Bearer"})
-
-    if relationship_attributes:
-        unpacked_attributes = 'SET ' + ', '.join(f'relationship.{key}=\'{value}\'' for (key, value) in relationship_attributes.items())
-    else:
-        unpacked_attributes = ''
-
-    cypher = f"""
-        MATCH (nodeA:{source_node_label}) WHERE nodeA.{source_node_property} = $nodeA_property
-        MATCH (nodeB:{target_node_label}) WHERE nodeB.{target_node_property} = $nodeB_property
-        CREATE (nodeA)-[relationship:{relationship_type}]->(nodeB)
-        SET relationship.created_by = $created_by
-        SET relationship.created_time = $created_time
-        {unpacked_attributes}
-        RETURN nodeA, nodeB, LABELS(nodeA), LABELS(nodeB), ID(nodeA), ID(nodeB), ID(relationship), TYPE(relationship), PROPERTIES(relationship)
-        """
-
-    with neo4j_driver.session() as session:
-        result = session.run(
-            query=cypher,
-            parameters={
-                'created_by': current_user.username,
-                'created_time': str(datetime.now(timezone.utc)),
-                'nodeA_property': source_node_property_value,
-                'nodeB_property': target_node_property_value,
-            },
-        )
-
-        relationship_data = result.data()[0]
+    validate_label(source_node_label)
+    validate_label(target_node_label)
+    validate_property_key(source_node_property)
+    validate_property_key(target_node_property)
+    validate_relationship_type(relationship_type)
+    validate_attributes(relationship_attributes or {})
+
+    cypher = queries.CREATE_RELATIONSHIP.render(source_label=source_node_label,
+                                                source_property=source_node_property,
+                                                target_label=target_node_label,
+                                                target_property=target_node_property,
+                                                relationship_type=relationship_type)
+
+    result = await write_query(cypher, {
+        'created_by': current_user.username,
+        'created_time': str(datetime.now(timezone.utc)),
+        'nodeA_property': source_node_property_value,
+        'nodeB_property': target_node_property_value,
+        'attributes': relationship_attributes or {},
+    })
+
+    # Every pair of matching nodes gets a relationship
+    for row in result:
+        adjacency_snapshot.relationship_created(row['ID(relationship)'], row['ID(nodeA)'], row['ID(nodeB)'],
+                                                row['TYPE(relationship)'])
+
+    query_cache.changed(source_node_label, target_node_label, relationship_type)
+
+    relationship_data = result[0]
 
     # Organise the data about the nodes in the relationship
     source_node = Node(node_id=relationship_data['ID(nodeA)'],
@@ -263,56 +454,170 @@ async def create_relationship(source_node_label: str, source_node_property: str,
                         target_node=target_node)
 
 
+# Create a batch of new relationships, matching their nodes by label and property
+@router.post('/create_relationships', response_model=BatchRelationships)
+async def create_relationships(relationships: List[RelationshipIn],
+                               chunk_size: int = Query(Config.BATCH_CHUNK_SIZE, ge=1),
+                               current_user: User = Depends(get_current_active_user)):
+    """
+    **Creates a batch of relationships, with one transaction per chunk of relationships sharing a pattern.**
+
+    :param **relationships** (list) - relationships to create, each with the label, property and value
+    used to match the source and target nodes, the relationship type and its properties
+
+    :param **chunk_size** (int) - maximum number of relationships written in each transaction
+
+    :returns: Number of relationships created, the positions of relationships whose source or target node
+    was not found, and the errors of any failed chunks.
+    """
+    # Validate the whole batch before anything is written
+    for relationship in relationships:
+        validate_label(relationship.source_label)
+        validate_label(relationship.target_label)
+        validate_property_key(relationship.source_property)
+        validate_property_key(relationship.target_property)
+        validate_relationship_type(relationship.relationship_type)
+        validate_attributes(relationship.properties)
+
+    # Group the positions by pattern, as labels, property keys and types cannot be passed as parameters
+    positions_by_pattern = {}
+    for position, relationship in enumerate(relationships):
+        pattern = (relationship.source_label, relationship.source_property,
+                   relationship.target_label, relationship.target_property,
+                   relationship.relationship_type)
+        positions_by_pattern.setdefault(pattern, []).append(position)
+
+    created = 0
+    matched_positions = set()
+    failed_positions = set()
+    errors = []
+    created_time = str(datetime.now(timezone.utc))
+
+    for pattern, positions in positions_by_pattern.items():
+        source_label, source_property, target_label, target_property, relationship_type = pattern
+        cypher = queries.CREATE_RELATIONSHIPS.render(source_label=source_label,
+                                                     source_property=source_property,
+                                                     target_label=target_label,
+                                                     target_property=target_property,
+                                                     relationship_type=relationship_type)
+
+        for chunk_number, chunk in enumerate(chunked(positions, chunk_size)):
+            rows = [{'position': position,
+                     'source_value': relationships[position].source_value,
+                     'target_value': relationships[position].target_value,
+                     'properties': relationships[position].properties} for position in chunk]
+            try:
+                result = await write_query(cypher, {
+                    'rows': rows,
+                    'created_by': current_user.username,
+                    'created_time': created_time,
+                })
+            except (Neo4jError, DriverError) as e:
+                group = f'(:{source_label})-[:{relationship_type}]->(:{target_label})'
+                errors.append(ChunkError(group=group, chunk=chunk_number, positions=chunk, detail=str(e)))
+                failed_positions.update(chunk)
+                continue
+
+            for row in result:
+                created += row['created']
+                matched_positions.add(row['position'])
+            query_cache.changed(source_label, target_label, relationship_type)
+
+    # The IDs of relationships created in bulk are not returned, so the adjacency snapshot is read again
+    if created:
+        adjacency_snapshot.mark_stale()
+
+    # Relationships in successful chunks that did not return a row had no matching source or target node
+    unmatched_positions = [position for position in range(len(relationships))
+                           if position not in matched_positions and position not in failed_positions]
+
+    return BatchRelationships(created=created,
+                              unmatched=len(unmatched_positions),
+                              unmatched_positions=unmatched_positions,
+                              errors=errors)
+
+
 # READ data about a relationship
 @router.get('/read_relationship/{relationship_id}', response_model=Relationship)
-async def read_relationship(relationship_id: int):
+async def read_relationship(relationship_id: int, profile: bool = False,
+                            fields: Optional[List[str]] = Query(None),
+                            node_properties: bool = True):
+    """
+    **Retrieves data about a relationship and its nodes, based on relationship ID.**
+
+    :param **relationship_id** (int) - relationship id
+
+    :param **profile** (bool) - run the query under PROFILE, bypassing the cache, and return its plan
+
+    :param **fields** (list) - only return these properties of the source and target nodes, read from the
+    database without the others
 
-    cypher = """
-        MATCH (nodeA)-[relationship]->(nodeB)
-        WHERE ID(relationship) = $rel_id
-        RETURN nodeA, ID(nodeA), LABELS(nodeA), relationship, ID(relationship), TYPE(relationship), nodeB, ID(nodeB), LABELS(nodeB), PROPERTIES(relationship)
-        """
+    :param **node_properties** (bool) - return the properties of the source and target nodes, or only their
+    id and labels
 
-    with neo4j_driver.session() as session:
-        result = session.run(query=cypher,
-                             parameters={'rel_id': relationship_id})
+    :returns: Relationship response, with the plan with the rows and database hits of each operator
+    when profiled.
+    """
+    validate_fields(fields)
+    # Nodes without properties are read with an empty projection
+    if not node_properties:
+        fields = []
+
+    # A cached relationship is read in full, so the requested properties are picked from its nodes
+    if not profile:
+        cached_relationship = await graph_cache.get_relationship(relationship_id)
+        if cached_relationship is not None:
+            if fields is None:
+                return cached_relationship
+            return dict(cached_relationship,
+                        source_node=selected_node(cached_relationship['source_node'], fields, node_properties),
+                        target_node=selected_node(cached_relationship['target_node'], fields, node_properties))
+
+    if fields is None:
+        result, plan = await read_records(queries.READ_RELATIONSHIP.render(), {'rel_id': relationship_id}, profile)
+    else:
+        result, plan = await read_records(queries.READ_RELATIONSHIP_FIELDS.render(),
+                                          {'rel_id': relationship_id, 'fields': fields}, profile)
 
-        relationship_data = result.data()[0]
+    relationship_data = result[0]
 
     # Organise the data about the nodes in the relationship
+    source_properties, target_properties = relationship_data["nodeA"], relationship_data["nodeB"]
+    if fields is not None:
+        source_properties = projected(fields, source_properties) if node_properties else None
+        target_properties = projected(fields, target_properties) if node_properties else None
+
     source_node = Node(node_id=relationship_data["ID(nodeA)"],
                        labels=relationship_data["LABELS(nodeA)"],
-                       properties=relationship_data["nodeA"])
+                       properties=source_properties)
 
     target_node = Node(node_id=relationship_data["ID(nodeB)"],
                        labels=relationship_data["LABELS(nodeB)"],
-                       properties=relationship_data["nodeB"])
+                       properties=target_properties)
 
-    # Return Relationship response
-    return Relationship(relationship_id=relationship_data["ID(relationship)"],
-                        relationship_type=relationship_data["TYPE(relationship)"],
-                        properties=relationship_data["PROPERTIES(relationship)"],
-                        source_node=source_node,
-                        target_node=target_node)
+    # Cache and return Relationship response
+    relationship = Relationship(relationship_id=relationship_data["ID(relationship)"],
+                                relationship_type=relationship_data["TYPE(relationship)"],
+                                properties=relationship_data["PROPERTIES(relationship)"],
+                                source_node=source_node,
+                                target_node=target_node,
+                                plan=plan)
+    if not profile and fields is None:
+        await graph_cache.set_relationship(relationship_id, relationship.dict())
+    return relationship
 
 
 # READ data about a relationship
 @router.put('/update_relationship/{relationship_id}', response_model=Relationship)
 async def update_relationship(relationship_id: int, attributes: dict):
 
-    cypher = """
-    MATCH (nodeA)-[relationship]->(nodeB)
-    WHERE ID(relationship) = $rel_id
-    SET relationship += $attributes
-    RETURN nodeA, ID(nodeA), LABELS(nodeA), relationship, ID(relationship), TYPE(relationship), nodeB, ID(nodeB), LABELS(nodeB), PROPERTIES(relationship)
-    """
-
-    with neo4j_driver.session() as session:
-        result = session.run(query=cypher,
-                             parameters={'rel_id': relationship_id,
-                                         'attributes': attributes})
+    result = await write_query(queries.UPDATE_RELATIONSHIP.render(), {'rel_id': relationship_id,
+                                                                      'attributes': attributes})
+    await graph_cache.invalidate_relationship(relationship_id)
 
-        relationship_data = result.data()[0]
+    relationship_data = result[0]
+    query_cache.changed(relationship_data['TYPE(relationship)'], *relationship_data['LABELS(nodeA)'],
+                        *relationship_data['LABELS(nodeB)'])
 
     # Organise the data about the nodes in the relationship
     source_node = Node(node_id=relationship_data['ID(nodeA)'],
@@ -335,19 +640,190 @@ async def update_relationship(relationship_id: int, attributes: dict):
 @router.post('/delete_relationship/{relationship_id}')
 async def delete_relationship(relationship_id: int):
 
-    cypher = """
-        MATCH (a)-[relationship]->(b)
-        WHERE ID(relationship) = $relationship_id
-        DELETE relationship
-        """
-
-    with neo4j_driver.session() as session:
-        result = session.run(query=cypher,
-                             parameters={'relationship_id': relationship_id})
-
-        relationship_data = result.data()
+    relationship_data = await write_query(queries.DELETE_RELATIONSHIP.render(), {'rel_id': relationship_id})
+    await graph_cache.invalidate_relationship(relationship_id)
+    adjacency_snapshot.relationship_deleted(relationship_id)
+    # The type of the deleted relationship and the labels of its nodes are not returned
+    query_cache.changed_everything()
 
     # Confirm deletion was completed by empty response
     return relationship_data or {
         'response': f'Relationship with ID: {relationship_id} was successfully deleted from the graph.'
     }
+
+
+# BATCH
+# Fields needed by each operation of a batch
+batch_operations = {
+    'create_node': ('label',),
+    'update_node': ('node_id',),
+    'delete_node': ('node_id',),
+    'create_relationship': ('source_node_id', 'target_node_id', 'relationship_type'),
+    'update_relationship': ('relationship_id',),
+    'delete_relationship': ('relationship_id',),
+}
+
+
+class BatchOperationError(Exception):
+    """
+    Operation of a batch that matched nothing or was refused by the database, which rolls the batch back.
+    """
+
+    def __init__(self, position: int, operation: str, detail: str):
+        super().__init__(f'Operation {position} ({operation}): {detail}')
+
+
+def batch_error(detail: str):
+    return HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                         detail=f"Operation not permitted, {detail}",
+                         headers={"WWW-Authenticate": "Bearer"})
+
+
+# Check that an ID is an integer, or a reference to the node or relationship created by an earlier operation
+def validate_reference(operations: List[BatchOperation], position: int, value, created_by: str):
+    if not isinstance(value, str):
+        return
+    reference = value[1:] if value.startswith('$') else ''
+    if not reference.isdigit() or int(reference) >= position or operations[int(reference)].operation != created_by:
+        raise batch_error(f"operation {position} references {value!r}, which is not an earlier {created_by}.")
+
+
+# Check every operation of a batch before anything is written
+def validate_batch(operations: List[BatchOperation]):
+    if len(operations) > Config.BATCH_MAX_OPERATIONS:
+        raise batch_error(f"a batch has at most {Config.BATCH_MAX_OPERATIONS} operations.")
+
+    for position, operation in enumerate(operations):
+        required = batch_operations.get(operation.operation)
+        if required is None:
+            raise batch_error(f"operation {position} is not one of {', '.join(batch_operations)}.")
+        missing = [field for field in required if getattr(operation, field) is None]
+        if missing:
+            raise batch_error(f"operation {position} ({operation.operation}) needs {', '.join(missing)}.")
+
+        validate_attributes(operation.properties)
+        if operation.operation == 'create_node':
+            validate_node_label(operation.label)
+        if operation.operation == 'create_relationship':
+            validate_relationship_type(operation.relationship_type)
+        for field in ('node_id', 'source_node_id', 'target_node_id'):
+            validate_reference(operations, position, getattr(operation, field), 'create_node')
+        validate_reference(operations, position, operation.relationship_id, 'create_relationship')
+
+
+# Transaction function running the operations of a batch in order, resolving references to earlier results
+# Caches and the adjacency snapshot are only updated once the transaction is committed, from the results
+async def run_batch(tx, operations: List[BatchOperation], created_by: str, created_time: str):
+    results = []
+
+    def resolve(value, field: str):
+        return results[int(value[1:])][field] if isinstance(value, str) else value
+
+    for position, operation in enumerate(operations):
+        name = operation.operation
+        if name == 'create_node':
+            cypher = queries.CREATE_NODE.render(label=operation.label)
+            parameters = {'attributes': operation.properties, 'created_by': created_by, 'created_time': created_time}
+        elif name == 'update_node':
+            cypher = queries.UPDATE_NODE.render()
+            parameters = {'node_id': resolve(operation.node_id, 'node_id'), 'attributes': operation.properties}
+        elif name == 'delete_node':
+            cypher = queries.DELETE_NODE_RETURNING.render()
+            parameters = {'node_id': resolve(operation.node_id, 'node_id')}
+        elif name == 'create_relationship':
+            cypher = queries.CREATE_RELATIONSHIP_BY_ID.render(relationship_type=operation.relationship_type)
+            parameters = {'source_id': resolve(operation.source_node_id, 'node_id'),
+                          'target_id': resolve(operation.target_node_id, 'node_id'),
+                          'attributes': operation.properties, 'created_by': created_by, 'created_time': created_time}
+        elif name == 'update_relationship':
+            cypher = queries.UPDATE_RELATIONSHIP.render()
+            parameters = {'rel_id': resolve(operation.relationship_id, 'relationship_id'),
+                          'attributes': operation.properties}
+        else:
+            cypher = queries.DELETE_RELATIONSHIP_RETURNING.render()
+            parameters = {'rel_id': resolve(operation.relationship_id, 'relationship_id')}
+
+        try:
+            records = await run_statement(tx, cypher, parameters)
+        except ClientError as e:
+            raise BatchOperationError(position, name, e.message) from e
+        if not records:
+            raise BatchOperationError(position, name, 'no matching node or relationship was found.')
+        results.append(operation_result(name, records[0]))
+    return results
+
+
+# Organise the first record of an operation into its result, with the labels of the nodes of a relationship
+# kept for invalidating the query cache and left out of the response
+def operation_result(name: str, record: dict):
+    if name in ('create_node', 'update_node'):
+        return {'operation': name, 'node_id': record['id'], 'labels': record['labels'],
+                'properties': record['new_node' if name == 'create_node' else 'node']}
+    if name == 'delete_node':
+        return {'operation': name, 'node_id': record['id'], 'labels': record['labels']}
+    if name == 'update_relationship':
+        return {'operation': name, 'relationship_id': record['ID(relationship)'],
+                'relationship_type': record['TYPE(relationship)'], 'properties': record['PROPERTIES(relationship)'],
+                'source_node_id': record['ID(nodeA)'], 'target_node_id': record['ID(nodeB)'],
+                'node_labels': record['LABELS(nodeA)'] + record['LABELS(nodeB)']}
+    if name == 'delete_relationship':
+        return {'operation': name, 'relationship_id': record['id'], 'relationship_type': record['type'],
+                'source_node_id': record['source_id'], 'target_node_id': record['target_id']}
+    return {'operation': name, 'relationship_id': record['id'], 'relationship_type': record['type'],
+            'properties': record['properties'], 'source_node_id': record['source_id'],
+            'target_node_id': record['target_id'], 'node_labels': record['source_labels'] + record['target_labels']}
+
+
+# Apply the committed operations of a batch to the caches and the adjacency snapshot
+async def batch_committed(results: list):
+    for result in results:
+        name = result['operation']
+        if name == 'create_node':
+            adjacency_snapshot.node_created(result['node_id'], result['labels'])
+        elif name == 'update_node':
+            await graph_cache.invalidate_node(result['node_id'])
+        elif name == 'delete_node':
+            await graph_cache.invalidate_node(result['node_id'])
+            adjacency_snapshot.node_deleted(result['node_id'])
+        elif name == 'create_relationship':
+            adjacency_snapshot.relationship_created(result['relationship_id'], result['source_node_id'],
+                                                    result['target_node_id'], result['relationship_type'])
+        elif name == 'update_relationship':
+            await graph_cache.invalidate_relationship(result['relationship_id'])
+        else:
+            await graph_cache.invalidate_relationship(result['relationship_id'])
+            adjacency_snapshot.relationship_deleted(result['relationship_id'])
+
+    # A deleted node takes its relationships with it, whose types are not returned
+    if any(result['operation'] == 'delete_node' for result in results):
+        query_cache.changed_everything()
+    else:
+        query_cache.changed(*{name for result in results
+                              for name in result.get('labels', []) + result.get('node_labels', [])
+                              + [result.get('relationship_type')] if name})
+
+
+# Run several operations in one transaction
+@router.post('/batch', response_model=BatchResults)
+async def batch(operations: List[BatchOperation], current_user: User = Depends(get_current_active_user)):
+    """
+    **Runs an ordered list of node and relationship operations in one transaction, all or none committed.**
+
+    :param **operations** (list) - operations, each with an operation of create_node, update_node, delete_node,
+    create_relationship, update_relationship or delete_relationship and the fields it needs: label and
+    properties, node_id, relationship_id, source_node_id, target_node_id, relationship_type. IDs may be
+    "$<position>" to use the ID created by an earlier create_node or create_relationship of the batch
+
+    :returns: BatchResults response, with the ID, labels or type, and properties of each operation in order.
+    The batch is rolled back, with a 422 naming the operation, if any operation matches nothing.
+    """
+    validate_batch(operations)
+
+    try:
+        results = await write_transaction(run_batch, operations, current_user.username,
+                                          str(datetime.now(timezone.utc)))
+    except BatchOperationError as e:
+        raise batch_error(f"the batch was rolled back. {e}") from e
+
+    await batch_committed(results)
+    return BatchResults(results=results)
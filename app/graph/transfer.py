@@ -0,0 +1,423 @@
+# Import required base modules
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import List, Optional
+import codecs
+import csv
+import json
+import logging
+import uuid
+
+# Import modules from FastAPI
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from neo4j import READ_ACCESS
+from neo4j.exceptions import DriverError, Neo4jError
+from pydantic import ValidationError
+from starlette.requests import ClientDisconnect
+
+# Import internal utilities for database access, validation, caches, configuration and schemas
+from app.utils.db import write_queries, stream_query
+from app.utils import queries
+from app.utils.environment import Config
+from app.utils.constraints import base_properties
+from app.utils.streaming import ndjson_response, csv_response
+from app.graph.crud import (validate_node_label, validate_label, validate_relationship_type, validate_property_key,
+                            validate_attributes)
+from app.graph.adjacency import adjacency_snapshot
+from app.query.cache import query_cache
+from app.authorisation.auth import get_current_active_user
+from app.utils.schema import User, NodeIn, RelationshipIn, ImportProgress
+
+logger = logging.getLogger(__name__)
+
+# Set the API Router
+router = APIRouter()
+
+FORMAT_PATTERN = '^(jsonl|csv)$'
+
+# CSV columns that are not properties, node and relationship IDs are written by the export and ignored on import
+NODE_COLUMNS = {'label', 'node_id'}
+RELATIONSHIP_COLUMNS = set(RelationshipIn.__fields__) - {'properties'}
+IGNORED_COLUMNS = {'node_id', 'relationship_id', 'source_node_id', 'target_node_id'}
+
+# Progress of the most recent imports of this worker, by import ID
+IMPORTS_KEPT = 100
+imports = OrderedDict()
+
+# Positions of unmatched relationship rows kept in the progress of an import, the rest are only counted
+UNMATCHED_POSITIONS_KEPT = 1000
+
+
+class RowError(ValueError):
+    """
+    Row of an upload that cannot be parsed or imported, with its position in the upload.
+    """
+
+    def __init__(self, position: int, detail):
+        super().__init__(f'Row {position}: {detail}')
+        self.position = position
+
+
+# Decode an upload as it is received and yield its lines, without holding more than one line in memory
+async def upload_lines(request: Request):
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            yield line.rstrip('\r')
+    pending += decoder.decode(b'', final=True)
+    if pending.rstrip('\r'):
+        yield pending.rstrip('\r')
+
+
+# Yield each row of an upload as a dictionary, JSON objects one per line or CSV rows keyed by the header
+async def upload_rows(request: Request, file_format: str):
+    position = 0
+    header = None
+    record = ''
+    async for line in upload_lines(request):
+        if file_format == 'jsonl':
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                raise RowError(position, f'invalid JSON, {e}') from e
+            if not isinstance(row, dict):
+                raise RowError(position, 'each line must be a JSON object')
+        else:
+            # A quoted value may span lines, so a CSV row is complete once its quotes are balanced
+            record = record + '\n' + line if record else line
+            if record.count('"') % 2:
+                continue
+            values = next(csv.reader([record])) if record else []
+            record = ''
+            if header is None:
+                header = values
+                continue
+            if not values:
+                continue
+            if len(values) != len(header):
+                raise RowError(position, f'expected {len(header)} values, got {len(values)}')
+            row = dict(zip(header, values))
+        yield position, row
+        position += 1
+
+    if record:
+        raise RowError(position, 'unterminated quoted value')
+
+
+# Check a row with the validators of the graph endpoints, which raise HTTP errors
+def checked(position: int, check, *args):
+    try:
+        return check(*args)
+    except HTTPException as e:
+        raise RowError(position, e.detail) from e
+    except ValidationError as e:
+        raise RowError(position, e.errors()) from e
+
+
+def node_row(position: int, row: dict, file_format: str):
+    if file_format == 'csv':
+        row = {'label': row.get('label'),
+               'properties': {key: value for key, value in row.items() if key not in NODE_COLUMNS and value != ''}}
+    node = checked(position, lambda: NodeIn(**row))
+    checked(position, validate_node_label, node.label)
+    checked(position, validate_attributes, node.properties)
+    return node
+
+
+def relationship_row(position: int, row: dict, file_format: str):
+    if file_format == 'csv':
+        properties = {key: value for key, value in row.items()
+                      if key not in RELATIONSHIP_COLUMNS | IGNORED_COLUMNS and value != ''}
+        row = dict({key: row.get(key) for key in RELATIONSHIP_COLUMNS}, properties=properties)
+    relationship = checked(position, lambda: RelationshipIn(**row))
+    checked(position, validate_label, relationship.source_label)
+    checked(position, validate_label, relationship.target_label)
+    checked(position, validate_property_key, relationship.source_property)
+    checked(position, validate_property_key, relationship.target_property)
+    checked(position, validate_relationship_type, relationship.relationship_type)
+    checked(position, validate_attributes, relationship.properties)
+    return relationship
+
+
+# Write a chunk of nodes in one transaction, with one UNWIND statement for each label
+async def write_nodes(chunk: list, current_user: User, progress: ImportProgress):
+    rows_by_label = {}
+    for position, node in chunk:
+        rows_by_label.setdefault(node.label, []).append({'position': position, 'properties': node.properties})
+
+    parameters = {'created_by': current_user.username, 'created_time': str(datetime.now(timezone.utc))}
+    results = await write_queries((queries.CREATE_NODES.render(label=label), dict(parameters, rows=rows))
+                                  for label, rows in rows_by_label.items())
+
+    for label, result in zip(rows_by_label, results):
+        for row in result:
+            adjacency_snapshot.node_created(row['id'], [label])
+        progress.created += len(result)
+    query_cache.changed(*rows_by_label)
+
+
+# Write a chunk of relationships in one transaction, with one UNWIND statement for each pattern
+async def write_relationships(chunk: list, current_user: User, progress: ImportProgress):
+    rows_by_pattern = {}
+    for position, relationship in chunk:
+        pattern = (relationship.source_label, relationship.source_property,
+                   relationship.target_label, relationship.target_property,
+                   relationship.relationship_type)
+        rows_by_pattern.setdefault(pattern, []).append({'position': position,
+                                                        'source_value': relationship.source_value,
+                                                        'target_value': relationship.target_value,
+                                                        'properties': relationship.properties})
+
+    parameters = {'created_by': current_user.username, 'created_time': str(datetime.now(timezone.utc))}
+    results = await write_queries(
+        (queries.CREATE_RELATIONSHIPS.render(source_label=source_label, source_property=source_property,
+                                             target_label=target_label, target_property=target_property,
+                                             relationship_type=relationship_type), dict(parameters, rows=rows))
+        for (source_label, source_property, target_label, target_property, relationship_type), rows
+        in rows_by_pattern.items())
+
+    created = 0
+    matched = set()
+    for result in results:
+        for row in result:
+            created += row['created']
+            matched.add(row['position'])
+    progress.created += created
+    unmatched = [position for position, _ in chunk if position not in matched]
+    progress.unmatched += len(unmatched)
+    kept = UNMATCHED_POSITIONS_KEPT - len(progress.unmatched_positions)
+    if kept > 0:
+        progress.unmatched_positions.extend(unmatched[:kept])
+
+    # The IDs of relationships created in bulk are not returned, so the adjacency snapshot is read again
+    if created:
+        adjacency_snapshot.mark_stale()
+    query_cache.changed(*{name for pattern in rows_by_pattern for name in (pattern[0], pattern[2], pattern[4])})
+
+
+# Start tracking the progress of an import, forgetting the oldest beyond IMPORTS_KEPT
+def start_import(import_id: Optional[str], kind: str, offset: int):
+    progress = ImportProgress(import_id=import_id or uuid.uuid4().hex, kind=kind, status='running', offset=offset)
+    imports[progress.import_id] = progress
+    imports.move_to_end(progress.import_id)
+    while len(imports) > IMPORTS_KEPT:
+        imports.popitem(last=False)
+    return progress
+
+
+# Parse an upload and commit it in chunks, stopping at the first row or chunk that fails
+# Each chunk is committed in one transaction, so every row before progress.offset is in the graph
+async def run_import(request: Request, file_format: str, offset: int, chunk_size: int, progress: ImportProgress,
+                     parse_row, write_chunk, current_user: User):
+    chunk = []
+
+    async def commit():
+        await write_chunk(chunk, current_user, progress)
+        progress.offset = chunk[-1][0] + 1
+        chunk.clear()
+
+    try:
+        async for position, row in upload_rows(request, file_format):
+            progress.rows_read = position + 1
+            if position < offset:
+                continue
+            chunk.append((position, parse_row(position, row, file_format)))
+            if len(chunk) >= chunk_size:
+                await commit()
+        if chunk:
+            await commit()
+        progress.status = 'completed'
+    except (RowError, ClientDisconnect) as e:
+        progress.status = 'failed'
+        progress.error = str(e) if isinstance(e, RowError) else 'The upload was interrupted.'
+        # Rows before the failure are committed, so that the upload can resume from the failed row
+        if chunk:
+            try:
+                await commit()
+            except (Neo4jError, DriverError) as chunk_error:
+                progress.error += f' Rows from {chunk[0][0]} were not committed: {chunk_error}'
+    except (Neo4jError, DriverError) as e:
+        progress.status = 'failed'
+        progress.error = f'Rows from {chunk[0][0]} were not committed: {e}'
+    except BaseException:
+        progress.status = 'failed'
+        raise
+
+    logger.info('Import %s of %s %s at offset %d, %d created', progress.import_id, progress.kind,
+                progress.status, progress.offset, progress.created)
+    return progress
+
+
+# Import nodes from a JSONL or CSV upload
+@router.post('/import/nodes', response_model=ImportProgress)
+async def import_nodes(request: Request,
+                       file_format: str = Query('jsonl', alias='format', regex=FORMAT_PATTERN),
+                       offset: int = Query(0, ge=0),
+                       chunk_size: int = Query(Config.BATCH_CHUNK_SIZE, ge=1),
+                       import_id: Optional[str] = None,
+                       current_user: User = Depends(get_current_active_user)):
+    """
+    **Creates nodes from an upload read as it arrives, committing one transaction per chunk of rows.**
+
+    JSONL uploads have one {"label": ..., "properties": {...}} object per line. CSV uploads have a header with
+    a label column and one column per property, empty values are left out and values are imported as strings.
+
+    :param **format** (str) - jsonl or csv
+
+    :param **offset** (int) - number of rows to skip, the offset returned by an earlier import that stopped
+
+    :param **chunk_size** (int) - maximum number of rows written in each transaction
+
+    :param **import_id** (str) - ID under which the progress of the import is reported, generated if empty
+
+    :returns: ImportProgress response, with the offset to resume from if the import stopped at a bad row
+    or a failed chunk.
+    """
+    progress = start_import(import_id, 'nodes', offset)
+    return await run_import(request, file_format, offset, chunk_size, progress, node_row, write_nodes, current_user)
+
+
+# Import relationships from a JSONL or CSV upload
+@router.post('/import/relationships', response_model=ImportProgress)
+async def import_relationships(request: Request,
+                               file_format: str = Query('jsonl', alias='format', regex=FORMAT_PATTERN),
+                               offset: int = Query(0, ge=0),
+                               chunk_size: int = Query(Config.BATCH_CHUNK_SIZE, ge=1),
+                               import_id: Optional[str] = None,
+                               current_user: User = Depends(get_current_active_user)):
+    """
+    **Creates relationships from an upload read as it arrives, committing one transaction per chunk of rows.**
+
+    Rows have the fields of /graph/create_relationships, matching the source and target nodes by label and
+    property. CSV uploads have one column per field and one column per relationship property.
+
+    :param **format** (str) - jsonl or csv
+
+    :param **offset** (int) - number of rows to skip, the offset returned by an earlier import that stopped
+
+    :param **chunk_size** (int) - maximum number of rows written in each transaction
+
+    :param **import_id** (str) - ID under which the progress of the import is reported, generated if empty
+
+    :returns: ImportProgress response, with the number of relationships created, the positions of rows whose
+    nodes were not found, and the offset to resume from if the import stopped.
+    """
+    progress = start_import(import_id, 'relationships', offset)
+    return await run_import(request, file_format, offset, chunk_size, progress, relationship_row,
+                            write_relationships, current_user)
+
+
+# READ the progress of an import running on this worker, or one of the last to finish
+@router.get('/imports/{import_id}', response_model=ImportProgress)
+async def read_import(import_id: str):
+    progress = imports.get(import_id)
+    if progress is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Import {import_id} is not known to this worker.",
+            headers={"WWW-Authenticate": "Bearer"})
+    return progress
+
+
+# Properties of an exported record, without the base properties when they are left out
+def exported_properties(properties: dict, include_base_properties: bool):
+    if include_base_properties:
+        return properties
+    return {key: value for key, value in properties.items() if key not in base_properties}
+
+
+# Export the nodes of a label
+@router.get('/export/nodes')
+async def export_nodes(label: str,
+                       file_format: str = Query('jsonl', alias='format', regex=FORMAT_PATTERN),
+                       columns: Optional[List[str]] = Query(None),
+                       include_base_properties: bool = True,
+                       fetch_size: int = Query(Config.FETCH_SIZE, ge=1)):
+    """
+    **Streams the nodes of a label as they are fetched, as JSONL or CSV.**
+
+    :param **label** (str) - label of the nodes to export
+
+    :param **format** (str) - jsonl, one {"node_id", "label", "labels", "properties"} object per line, which
+    /graph/import/nodes accepts, or csv
+
+    :param **columns** (list) - properties written to CSV columns, required for csv
+
+    :param **include_base_properties** (bool) - export created_by and created_time, leave them out to
+    import the nodes again
+
+    :param **fetch_size** (int) - number of records fetched from the database at a time
+
+    :returns: One node per line, or a CSV header with node_id, label and the columns, then one row per node.
+    """
+    validate_label(label)
+    if file_format == 'csv' and not columns:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Operation not permitted, columns are needed to export CSV.",
+            headers={"WWW-Authenticate": "Bearer"})
+
+    records = stream_query(queries.EXPORT_NODES.render(label=label), fetch_size=fetch_size, access_mode=READ_ACCESS)
+
+    if file_format == 'csv':
+        return await csv_response(records, ['node_id', 'label'] + columns,
+                                  lambda record: [record['id'], label] + [record['node'].get(column)
+                                                                          for column in columns])
+    return await ndjson_response(records, lambda record: {
+        'node_id': record['id'],
+        'label': label,
+        'labels': record['labels'],
+        'properties': exported_properties(record['node'], include_base_properties),
+    })
+
+
+# Export the relationships of a type
+@router.get('/export/relationships')
+async def export_relationships(relationship_type: str,
+                               file_format: str = Query('jsonl', alias='format', regex=FORMAT_PATTERN),
+                               columns: Optional[List[str]] = Query(None),
+                               include_base_properties: bool = True,
+                               fetch_size: int = Query(Config.FETCH_SIZE, ge=1)):
+    """
+    **Streams the relationships of a type as they are fetched, as JSONL or CSV.**
+
+    :param **relationship_type** (str) - type of the relationships to export
+
+    :param **format** (str) - jsonl, one {"relationship_id", "relationship_type", "source_node_id",
+    "target_node_id", "properties"} object per line, or csv
+
+    :param **columns** (list) - properties written to CSV columns, required for csv
+
+    :param **include_base_properties** (bool) - export created_by and created_time
+
+    :param **fetch_size** (int) - number of records fetched from the database at a time
+
+    :returns: One relationship per line, or a CSV header with the IDs and the columns, then one row per
+    relationship.
+    """
+    validate_relationship_type(relationship_type)
+    if file_format == 'csv' and not columns:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Operation not permitted, columns are needed to export CSV.",
+            headers={"WWW-Authenticate": "Bearer"})
+
+    records = stream_query(queries.EXPORT_RELATIONSHIPS.render(relationship_type=relationship_type),
+                           fetch_size=fetch_size, access_mode=READ_ACCESS)
+
+    if file_format == 'csv':
+        return await csv_response(records, ['relationship_id', 'source_node_id', 'target_node_id'] + columns,
+                                  lambda record: [record['id'], record['source_id'], record['target_id']]
+                                  + [record['properties'].get(column) for column in columns])
+    return await ndjson_response(records, lambda record: {
+        'relationship_id': record['id'],
+        'relationship_type': relationship_type,
+        'source_node_id': record['source_id'],
+        'target_node_id': record['target_id'],
+        'properties': exported_properties(record['properties'], include_base_properties),
+    })
@@ -0,0 +1,213 @@
+# Import required base modules
+from typing import List, Optional
+
+# Import modules from FastAPI
+from fastapi import APIRouter, HTTPException, Query, status
+from neo4j import READ_ACCESS
+
+# Import internal utilities for database access, validation, configuration and streaming
+from app.utils.db import stream_query
+from app.utils import queries
+from app.utils.environment import Config
+from app.utils.streaming import ndjson_response
+from app.utils.schema import Degree, Neighbours
+from app.graph.crud import validate_label, validate_relationship_type, node_content
+from app.graph.adjacency import adjacency_snapshot
+
+# Set the API Router
+router = APIRouter()
+
+
+# Check the optional label and relationship type filters, an empty filter is passed to Cypher as null
+def validate_filters(labels: Optional[List[str]], relationship_types: Optional[List[str]]):
+    for label in labels or []:
+        validate_label(label)
+    for relationship_type in relationship_types or []:
+        validate_relationship_type(relationship_type)
+    return labels or None, relationship_types or None
+
+
+# Organise a record of a path into the position, node and relationship to the next node
+def path_line(record: dict):
+    return {'position': record['position'],
+            'node': node_content(record),
+            'next_relationship': record['next_relationship']}
+
+
+# Expand the neighbourhood one hop at a time, yielding the new nodes with one of the labels up to the limit
+# Nodes without the labels are not returned, but are still expanded in the next hop
+async def expand_neighbourhood(node_id: int, depth: int, relationship_types, labels, fanout: int, limit: int):
+    seen = {node_id}
+    frontier = [node_id]
+    found = 0
+    for _ in range(depth):
+        next_frontier = []
+        records = stream_query(queries.NEIGHBOURHOOD_HOP.render(),
+                               {'frontier': frontier,
+                                'relationship_types': relationship_types,
+                                'fanout': fanout},
+                               access_mode=READ_ACCESS)
+        try:
+            async for record in records:
+                if record['id'] in seen:
+                    continue
+                seen.add(record['id'])
+                next_frontier.append(record['id'])
+                if labels is None or any(label in labels for label in record['labels']):
+                    yield record
+                    found += 1
+                    if found >= limit:
+                        return
+        finally:
+            # Closing the records of a hop left early releases its session straight away
+            await records.aclose()
+        if not next_frontier:
+            return
+        frontier = next_frontier
+
+
+# READ the neighbourhood of a node, up to a number of hops away
+@router.get('/neighbourhood/{node_id}')
+async def read_neighbourhood(node_id: int,
+                             depth: int = Query(1, ge=1, le=Config.TRAVERSAL_MAX_DEPTH),
+                             relationship_types: Optional[List[str]] = Query(None),
+                             labels: Optional[List[str]] = Query(None),
+                             fanout: int = Query(Config.TRAVERSAL_MAX_FANOUT, ge=1, le=Config.TRAVERSAL_MAX_FANOUT),
+                             limit: int = Query(Config.TRAVERSAL_MAX_RESULTS, ge=1, le=Config.TRAVERSAL_MAX_RESULTS)):
+    """
+    **Streams the nodes within a number of hops of a node, in either direction, as newline delimited JSON.**
+
+    The neighbourhood is expanded one hop at a time, following at most fanout relationships of each node,
+    so nodes with more relationships than that are only partly expanded.
+
+    :param **node_id** (int) - id of the node to start from
+
+    :param **depth** (int) - maximum number of hops from the start node
+
+    :param **relationship_types** (list) - only follow relationships of these types, all types if empty
+
+    :param **labels** (list) - only return nodes with one of these labels, all labels if empty
+
+    :param **fanout** (int) - maximum number of relationships followed from each node
+
+    :param **limit** (int) - maximum number of nodes returned
+
+    :returns: One Node per line, with node id, labels, and properties, each node returned once, nearest hops first.
+    """
+    labels, relationship_types = validate_filters(labels, relationship_types)
+
+    records = expand_neighbourhood(node_id, depth, relationship_types, labels, fanout, limit)
+    return await ndjson_response(records, node_content)
+
+
+# READ the shortest path between two nodes
+@router.get('/shortest_path/{source_node_id}/{target_node_id}')
+async def read_shortest_path(source_node_id: int, target_node_id: int,
+                             max_depth: int = Query(Config.TRAVERSAL_MAX_DEPTH, ge=1, le=Config.TRAVERSAL_MAX_DEPTH),
+                             relationship_types: Optional[List[str]] = Query(None)):
+    """
+    **Streams the shortest path between two nodes, in either direction, as newline delimited JSON.**
+
+    :param **source_node_id** (int) - id of the node the path starts from
+
+    :param **target_node_id** (int) - id of the node the path ends at
+
+    :param **max_depth** (int) - maximum number of hops in the path
+
+    :param **relationship_types** (list) - only follow relationships of these types, all types if empty
+
+    :returns: One line per node on the path in order, with its position, the Node and the relationship
+    to the next node on the path.
+    """
+    if source_node_id == target_node_id:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Operation not permitted, source and target nodes must be different.",
+            headers={"WWW-Authenticate": "Bearer"})
+
+    _, relationship_types = validate_filters(None, relationship_types)
+
+    records = stream_query(queries.SHORTEST_PATH.render(max_depth=max_depth),
+                           {'source_id': source_node_id,
+                            'target_id': target_node_id,
+                            'relationship_types': relationship_types},
+                           access_mode=READ_ACCESS)
+    return await ndjson_response(records, path_line)
+
+
+# Check that the adjacency snapshot is enabled and holds the node and relationship types, and bring it up to date
+async def snapshot_for(node_id: int, relationship_types: Optional[List[str]]):
+    if not adjacency_snapshot.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="The adjacency snapshot is not enabled, set ADJACENCY_LABELS to enable it.")
+
+    for relationship_type in relationship_types or []:
+        if relationship_type not in adjacency_snapshot.types:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Operation not permitted, {relationship_type} relationships are not in the "
+                       f"adjacency snapshot.",
+                headers={"WWW-Authenticate": "Bearer"})
+
+    snapshot = await adjacency_snapshot.current()
+    if not snapshot.contains(node_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Node with ID: {node_id} is not in the adjacency snapshot.")
+    return snapshot
+
+
+# READ the degree of a node from the in-memory adjacency snapshot
+@router.get('/adjacency/{node_id}/degree', response_model=Degree)
+async def read_degree(node_id: int,
+                      relationship_types: Optional[List[str]] = Query(None),
+                      direction: str = Query('both', regex='^(out|in|both)$')):
+    """
+    **Counts the relationships of a node, served from the in-memory adjacency snapshot.**
+
+    The snapshot holds the nodes with the ADJACENCY_LABELS, and the relationships of the
+    ADJACENCY_RELATIONSHIP_TYPES between them, and is at most ADJACENCY_MAX_STALENESS seconds old.
+
+    :param **node_id** (int) - id of the node
+
+    :param **relationship_types** (list) - only count relationships of these types, all snapshot types if empty
+
+    :param **direction** (str) - 'out', 'in' or 'both'
+
+    :returns: Degree response, with the number of relationships and the age of the snapshot.
+    """
+    snapshot = await snapshot_for(node_id, relationship_types)
+    return Degree(node_id=node_id,
+                  degree=snapshot.degree(node_id, relationship_types, direction),
+                  snapshot_age_seconds=snapshot.age())
+
+
+# READ the IDs of the nodes around a node from the in-memory adjacency snapshot
+@router.get('/adjacency/{node_id}/neighbours', response_model=Neighbours)
+async def read_neighbours(node_id: int,
+                          depth: int = Query(1, ge=1, le=Config.TRAVERSAL_MAX_DEPTH),
+                          relationship_types: Optional[List[str]] = Query(None),
+                          direction: str = Query('both', regex='^(out|in|both)$'),
+                          limit: int = Query(Config.TRAVERSAL_MAX_RESULTS, ge=1, le=Config.TRAVERSAL_MAX_RESULTS)):
+    """
+    **Finds the IDs of the nodes within a number of hops of a node, served from the in-memory adjacency snapshot.**
+
+    Only nodes and relationships in the snapshot are followed, see the degree endpoint.
+
+    :param **node_id** (int) - id of the node to start from
+
+    :param **depth** (int) - maximum number of hops from the start node
+
+    :param **relationship_types** (list) - only follow relationships of these types, all snapshot types if empty
+
+    :param **direction** (str) - 'out', 'in' or 'both'
+
+    :param **limit** (int) - maximum number of nodes returned
+
+    :returns: Neighbours response, with node IDs in the order they are reached and the age of the snapshot.
+    """
+    snapshot = await snapshot_for(node_id, relationship_types)
+    return Neighbours(node_id=node_id,
+                      neighbours=snapshot.neighbours(node_id, depth, relationship_types, direction, limit),
+                      snapshot_age_seconds=snapshot.age())
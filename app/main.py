@@ -1,12 +1,20 @@
+# General packages and modules
+import asyncio
+
 # Import main FastAPI modules
 from fastapi import FastAPI, Depends
 
 # Internal packages
 from app.authorisation import auth
 from app.authorisation.auth import get_current_active_user
+from app.authorisation.hashing import hashing_pool
 from app.user_management import users
-from app.graph import crud
+from app.graph import crud, traversal, transfer
 from app.query import cypher
+from app.admin import indexes, statistics, metrics
+from app.utils.environment import Config
+from app.utils.db import open_driver, close_driver
+from app.utils.metrics import MetricsMiddleware, monitor_event_loop
 
 
 app = FastAPI(title='Fast-graph',
@@ -15,6 +23,9 @@ app = FastAPI(title='Fast-graph',
               docs_url='/docs',
               redoc_url='/redoc')
 
+# Time every request, labelled by route
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(
     auth.router,
     prefix='/auth',
@@ -35,8 +46,78 @@ app.include_router(
     dependencies=[Depends(get_current_active_user)]
 )
 
+app.include_router(
+    traversal.router,
+    prefix='/graph',
+    tags=['Graph Traversal'],
+    dependencies=[Depends(get_current_active_user)]
+)
+
+app.include_router(
+    transfer.router,
+    prefix='/graph',
+    tags=['Graph Import and Export'],
+    dependencies=[Depends(get_current_active_user)]
+)
+
 app.include_router(
     cypher.router,
     tags=['Query Database'],
     dependencies=[Depends(get_current_active_user)]
 )
+
+app.include_router(
+    indexes.router,
+    prefix='/admin',
+    tags=['Administration'],
+    dependencies=[Depends(get_current_active_user)]
+)
+
+app.include_router(
+    statistics.router,
+    prefix='/admin',
+    tags=['Administration'],
+    dependencies=[Depends(get_current_active_user)]
+)
+
+app.include_router(
+    metrics.router,
+    tags=['Administration'],
+    dependencies=[Depends(metrics.metrics_access)]
+)
+
+
+# Connect to the database and warm up the connection pool before serving requests
+@app.on_event('startup')
+async def connect_database():
+    await open_driver()
+
+
+# Create the indexes and constraints for the hot lookups before serving requests
+@app.on_event('startup')
+async def create_schema():
+    if Config.SCHEMA_ON_STARTUP:
+        await indexes.ensure_schema()
+
+
+# Measure how long other work holds the event loop, for as long as the server runs
+@app.on_event('startup')
+async def start_event_loop_monitor():
+    app.state.event_loop_monitor = asyncio.ensure_future(monitor_event_loop())
+
+
+@app.on_event('shutdown')
+async def stop_event_loop_monitor():
+    app.state.event_loop_monitor.cancel()
+
+
+# Release the password hashing workers when the server stops
+@app.on_event('shutdown')
+async def shutdown_hashing_pool():
+    hashing_pool.shutdown()
+
+
+# Let running statements finish, then close the connection pool
+@app.on_event('shutdown')
+async def disconnect_database():
+    await close_driver()
@@ -0,0 +1,131 @@
+# General packages and modules
+import asyncio
+import time
+
+# Import modules from FastAPI
+from fastapi import HTTPException, status
+
+# Import internal utilities for configuration, metrics and schemas
+from app.utils.environment import Config
+from app.utils.metrics import QUERY_REJECTED, QUERY_QUEUED
+from app.utils.schema import Rejection
+
+
+# Refuse a statement with a structured reason, counted by reason
+def rejection(status_code: int, reason: str, detail: str, headers: dict = None, **values):
+    QUERY_REJECTED.inc(reason=reason)
+    return HTTPException(
+        status_code=status_code,
+        detail=Rejection(reason=reason, detail=detail, **values).dict(),
+        headers={"WWW-Authenticate": "Bearer", **(headers or {})})
+
+
+class Ticket:
+    """
+    Admission of one statement, released once the statement has finished or its stream has closed.
+    """
+
+    def __init__(self, admission, username: str):
+        self.admission = admission
+        self.username = username
+        self.expensive = False
+        self.released = False
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        self.admission.running[self.username] -= 1
+        if not self.admission.running[self.username]:
+            del self.admission.running[self.username]
+        if self.expensive:
+            self.admission.expensive.release()
+
+
+class Admission:
+    """
+    Admission control of custom statements, by the rows EXPLAIN estimates and by the statements of each user.
+
+    A user running user_concurrency statements has further statements refused. A statement estimated to produce
+    more than row_budget rows in any of its operators is refused, or with over_budget set to 'queue' waits for
+    one of expensive_concurrency turns, and is refused if none is free after queue_timeout seconds.
+
+    :param row_budget: largest estimated rows admitted straight away, 0 admits every statement, and statements
+    without an estimate are refused while it is set
+    :param over_budget: 'reject' or 'queue' statements over the budget
+    :param expensive_concurrency: over-budget statements run at once when queued
+    :param queue_timeout: seconds an over-budget statement waits for its turn
+    :param user_concurrency: statements each user may run at once, 0 for no limit
+    """
+
+    def __init__(self, row_budget: int, over_budget: str = 'reject', expensive_concurrency: int = 2,
+                 queue_timeout: float = 10.0, user_concurrency: int = 0):
+        self.row_budget = row_budget
+        self.over_budget = over_budget
+        self.expensive_concurrency = expensive_concurrency
+        self.queue_timeout = queue_timeout
+        self.user_concurrency = user_concurrency
+        self.running = {}
+        self._expensive = None
+
+    # Semaphore of the over-budget statements, created on first use inside the running event loop
+    @property
+    def expensive(self):
+        if self._expensive is None:
+            self._expensive = asyncio.Semaphore(max(self.expensive_concurrency, 1))
+        return self._expensive
+
+    def over(self, estimated_rows):
+        return 0 < self.row_budget < (estimated_rows or 0)
+
+    # Refusal of a statement whose rows could not be estimated while a budget is set, so that the budget
+    # cannot be bypassed by a failing EXPLAIN
+    def unestimated(self):
+        return rejection(
+            status.HTTP_503_SERVICE_UNAVAILABLE, 'estimate',
+            "Operation not permitted, the rows of the statement could not be estimated to check the budget.",
+            headers={'Retry-After': '1'}, budget=self.row_budget)
+
+    async def admit(self, username: str, estimated_rows: int = None) -> Ticket:
+        if self.row_budget > 0 and estimated_rows is None:
+            raise self.unestimated()
+
+        if 0 < self.user_concurrency <= self.running.get(username, 0):
+            raise rejection(
+                status.HTTP_429_TOO_MANY_REQUESTS, 'concurrency',
+                f"Operation not permitted, {self.user_concurrency} statements are already running for this user.",
+                headers={'Retry-After': '1'}, limit=self.user_concurrency)
+
+        over = self.over(estimated_rows)
+        if over and self.over_budget != 'queue':
+            raise rejection(
+                status.HTTP_422_UNPROCESSABLE_ENTITY, 'budget',
+                "Operation not permitted, the statement is estimated to produce more rows than the budget.",
+                estimated_rows=estimated_rows, budget=self.row_budget)
+
+        # Counted before waiting, so that a user cannot queue more statements than they may run
+        self.running[username] = self.running.get(username, 0) + 1
+        ticket = Ticket(self, username)
+        if over:
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(self.expensive.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                ticket.release()
+                raise rejection(
+                    status.HTTP_429_TOO_MANY_REQUESTS, 'queue_timeout',
+                    "Operation not permitted, no turn to run an over-budget statement became free in time.",
+                    headers={'Retry-After': str(max(int(self.queue_timeout), 1))},
+                    estimated_rows=estimated_rows, budget=self.row_budget, limit=self.queue_timeout)
+            except BaseException:
+                ticket.release()
+                raise
+            QUERY_QUEUED.observe(time.perf_counter() - started)
+            ticket.expensive = True
+        return ticket
+
+
+# Admission control of /q
+admission = Admission(row_budget=Config.QUERY_ROW_BUDGET, over_budget=Config.QUERY_OVER_BUDGET,
+                      expensive_concurrency=Config.QUERY_EXPENSIVE_CONCURRENCY,
+                      queue_timeout=Config.QUERY_QUEUE_TIMEOUT, user_concurrency=Config.QUERY_USER_CONCURRENCY)
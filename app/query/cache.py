@@ -0,0 +1,113 @@
+# General packages and modules
+import json
+import re
+import threading
+
+import orjson
+
+# Import internal utilities for caching, graph constraints and configuration
+from app.utils.cache import TTLCache
+from app.utils.constraints import node_labels, relationship_types
+from app.utils.environment import Config
+
+# Generation bumped by every change, for statements that do not name a label or relationship type
+ANY = '*'
+# Generation bumped by changes that cannot be scoped to labels, such as deletes and custom writes
+EVERYTHING = '**'
+
+# Labels and relationship types whose changes are tracked, the User label is written by the user endpoints
+TRACKED = frozenset(node_labels) | frozenset(relationship_types) | {'User'}
+
+# Quoted strings and escaped names, whose whitespace and contents are kept as they are
+QUOTED = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`)""")
+WHITESPACE = re.compile(r'\s+')
+
+# Names following a colon, or a bar or ampersand in a label expression
+NAMED = re.compile(r'[:|&]\s*(`[^`]+`|\w+)')
+
+
+# Collapse whitespace outside of quoted strings, so that reformatted statements share an entry
+def normalise(statement: str) -> str:
+    parts = QUOTED.split(statement.strip())
+    return ''.join(part if index % 2 else WHITESPACE.sub(' ', part) for index, part in enumerate(parts))
+
+
+# Tracked labels and relationship types named in a statement, None if it names none and so depends on all
+def dependencies(statement: str):
+    named = set()
+    for index, part in enumerate(QUOTED.split(statement)):
+        if index % 2 and not part.startswith('`'):
+            continue
+        named.update(name.strip('`') for name in NAMED.findall(part if index % 2 == 0 else ':' + part))
+    return frozenset(named & TRACKED) or None
+
+
+class QueryResultCache:
+    """
+    Cache of the records of read-only custom statements, keyed by their normalised text and parameters.
+
+    Whether a statement is read-only is found with EXPLAIN, once for each statement (see app.query.plans). Each entry remembers the
+    generations of the labels and relationship types its statement names, and is only served while none
+    of them has changed. The graph and user endpoints bump the generations of the labels and types they write,
+    and writes that cannot be scoped, such as deletes and custom statements, bump every generation.
+
+    Changes to nodes that a statement only reaches through unlabelled patterns, and changes made by other
+    workers, are seen once the entry expires.
+
+    :param maxbytes: bound on the total size of the cached records as JSON, 0 disables the cache
+    :param ttl: seconds an entry stays valid
+    :param maxsize: maximum number of entries
+    """
+
+    def __init__(self, maxbytes: int, ttl: float, maxsize: int = 10_000):
+        self.results = TTLCache(maxsize=maxsize, ttl=ttl, maxbytes=maxbytes)
+        self.generations = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.results.maxbytes > 0 and self.results.ttl > 0
+
+    def key(self, statement: str, parameters: dict):
+        return normalise(statement), json.dumps(parameters or {}, sort_keys=True, default=str)
+
+    # Current generations of the dependencies, with the generation bumped by changes that cannot be scoped
+    def snapshot(self, depends_on):
+        names = (ANY,) if depends_on is None else tuple(sorted(depends_on))
+        with self._lock:
+            return tuple(self.generations.get(name, 0) for name in names + (EVERYTHING,))
+
+    def get(self, key):
+        entry = self.results.get(key)
+        if entry is None:
+            return None
+        depends_on, generations, records = entry
+        if self.snapshot(depends_on) != generations:
+            self.results.invalidate(key)
+            return None
+        return records
+
+    # Store records with the generations taken before the statement ran, so that a change made while it ran
+    # makes the entry stale straight away
+    def set(self, key, depends_on, generations, records):
+        size = len(orjson.dumps(records, default=str, option=orjson.OPT_NON_STR_KEYS))
+        self.results.set(key, (depends_on, generations, records), size=size)
+
+    # Changes made by the graph and user endpoints, to the named labels and relationship types
+    def changed(self, *names: str):
+        with self._lock:
+            for name in set(names) | {ANY}:
+                self.generations[name] = self.generations.get(name, 0) + 1
+
+    def changed_everything(self):
+        with self._lock:
+            self.generations[EVERYTHING] = self.generations.get(EVERYTHING, 0) + 1
+        self.results.clear()
+
+    def stats(self):
+        return self.results.stats()
+
+
+# Cache of read-only /q results, disabled when QUERY_CACHE_BYTES or QUERY_CACHE_TTL is 0
+query_cache = QueryResultCache(maxbytes=Config.QUERY_CACHE_BYTES, ttl=Config.QUERY_CACHE_TTL,
+                               maxsize=Config.QUERY_CACHE_SIZE)
@@ -1,24 +1,165 @@
 # Import required base modules
-from dotenv import load_dotenv, find_dotenv
+from typing import Optional
+import json
 
 # Import modules from FastAPI
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Header, HTTPException, Query as QueryParameter, Request, status
+from neo4j import READ_ACCESS, WRITE_ACCESS
+from neo4j.exceptions import DriverError, Neo4jError
 
-# Import internal utilities for database access and schemas
-from app.utils.db import neo4j_driver
-from app.utils.schema import Query
-
-# Load environment variables
-env_loc = find_dotenv('.env')
-load_dotenv(env_loc)
+# Import internal utilities for database access, configuration and schemas
+from app.utils.db import read_query, write_query, stream_query, profile_query
+from app.utils.environment import Config
+from app.utils.schema import Query, User
+from app.authorisation.auth import get_current_active_user
+from app.query.admission import admission
+from app.query.cache import query_cache, dependencies
+from app.query.plans import explain
+from app.utils.streaming import NDJSON_MEDIA_TYPE, ndjson_response
+from app.utils.responses import FastJSONResponse
+from app.utils.deadlines import Deadline, request_deadline, cancellable, watched
 
 # Set the API Router
 router = APIRouter()
 
 
+# Drop every cached result once a statement that may write has streamed its records
+async def invalidating(records):
+    try:
+        async for record in records:
+            yield record
+    finally:
+        query_cache.changed_everything()
+
+
+# Keep a statement admitted for as long as its records are streamed
+async def admitted(ticket, records):
+    try:
+        async for record in records:
+            yield record
+    finally:
+        ticket.release()
+
+
+def respond(response, plan=None):
+    # Driver output is trusted, so the fast path skips validating it against the Query model
+    if Config.FAST_SERIALIZATION:
+        return FastJSONResponse({'response': response, 'plan': plan})
+    return Query(response=response, plan=plan)
+
+
 # Query endpoint
 @router.get('/q', response_model=Query, summary='Query the database with a custom Cypher string')
-async def cypher_query(cypher_string: str):
-    with neo4j_driver.session() as session:
-        response = session.run(query=cypher_string)
-        return Query(response=response.data())
+async def cypher_query(request: Request,
+                       cypher_string: str,
+                       stream: bool = False,
+                       fetch_size: int = QueryParameter(Config.FETCH_SIZE, ge=1),
+                       profile: bool = False,
+                       read_only: bool = False,
+                       parameters: Optional[str] = None,
+                       accept: Optional[str] = Header(None),
+                       current_user: User = Depends(get_current_active_user),
+                       deadline: Deadline = Depends(request_deadline('/q', Config.QUERY_TIMEOUT))):
+    """
+    **Runs a custom Cypher statement against the database.**
+
+    :param **cypher_string** (str) - Cypher statement to run
+
+    :param **stream** (bool) - stream records as newline delimited JSON, also used when the request
+    accepts application/x-ndjson
+
+    :param **fetch_size** (int) - number of records fetched from the database at a time when streaming
+
+    :param **profile** (bool) - run the statement under PROFILE and return its plan, cannot be streamed
+
+    :param **read_only** (bool) - run the statement in a read transaction, which a cluster routes to followers
+    and read replicas, statements that write then fail
+
+    :param **parameters** (str) - JSON object of the parameters of the statement
+
+    :returns: Query response with all records, and the plan with the rows and database hits of each operator
+    when profiled, or one JSON record per line when streaming. Records of statements that only read are cached
+    for QUERY_CACHE_TTL seconds, or until the labels and relationship types they name are written. Statements
+    estimated to produce more than QUERY_ROW_BUDGET rows, or beyond the statements each user may run at once,
+    are refused with a reason. The statement is stopped when the client disconnects, or once the deadline set
+    by the X-Request-Timeout header in seconds, at most QUERY_TIMEOUT, has passed.
+    """
+    try:
+        parameters = json.loads(parameters) if parameters else {}
+    except ValueError:
+        parameters = None
+    if not isinstance(parameters, dict):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Operation not permitted, parameters must be a JSON object.",
+            headers={"WWW-Authenticate": "Bearer"})
+
+    streaming = stream or NDJSON_MEDIA_TYPE in (accept or '')
+    if streaming and profile:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Operation not permitted, a profiled query cannot be streamed.",
+            headers={"WWW-Authenticate": "Bearer"})
+
+    # Custom statements may write to the graph, so they run in a write transaction unless marked read only
+    access_mode = READ_ACCESS if read_only else WRITE_ACCESS
+
+    # EXPLAIN gives the estimate checked against the row budget, and tells which statements only read
+    cacheable = query_cache.enabled and not streaming and not profile
+    estimate = None
+    if admission.row_budget or (cacheable and not read_only):
+        try:
+            estimate = await explain(cypher_string, parameters, timeout=deadline.remaining())
+        except (Neo4jError, DriverError) as e:
+            # Without an estimate the budget cannot be checked, otherwise the statement is run as one that writes
+            if admission.row_budget:
+                raise admission.unestimated() from e
+
+    key = None
+    if cacheable and (read_only or (estimate is not None and estimate.query_type == 'r')):
+        key = query_cache.key(cypher_string, parameters)
+        response = query_cache.get(key)
+        if response is not None:
+            return respond(response)
+
+    return await cancellable(request, deadline, run_query(
+        cypher_string, parameters, current_user.username, estimate, key, access_mode,
+        streaming=streaming, fetch_size=fetch_size, profile=profile, read_only=read_only, deadline=deadline))
+
+
+# Admit and run a statement that missed the cache, within the deadline of its request
+async def run_query(cypher_string: str, parameters: dict, username: str, estimate, key, access_mode: str,
+                    streaming: bool, fetch_size: int, profile: bool, read_only: bool, deadline: Deadline):
+    ticket = await admission.admit(username, estimate.estimated_rows if estimate else None)
+    try:
+        # The time spent waiting for admission counts against the deadline
+        timeout = deadline.remaining()
+        if streaming:
+            records = stream_query(cypher_string, parameters, fetch_size=fetch_size, access_mode=access_mode,
+                                   timeout=timeout)
+            records = watched(deadline, records if read_only else invalidating(records))
+            return await ndjson_response(admitted(ticket, records))
+
+        plan = None
+        if profile:
+            response, plan = await profile_query(cypher_string, parameters, access_mode=access_mode, timeout=timeout)
+            if not read_only:
+                query_cache.changed_everything()
+        elif key is not None:
+            # Generations are taken before the statement runs, so a write made meanwhile invalidates the entry
+            depends_on = dependencies(cypher_string)
+            generations = query_cache.snapshot(depends_on)
+            response = await read_query(cypher_string, parameters, timeout=timeout)
+            query_cache.set(key, depends_on, generations, response)
+        elif read_only:
+            response = await read_query(cypher_string, parameters, timeout=timeout)
+        else:
+            response = await write_query(cypher_string, parameters, timeout=timeout)
+            # What a custom statement wrote cannot be told from its text, so every cached result is dropped
+            query_cache.changed_everything()
+    except BaseException:
+        ticket.release()
+        raise
+
+    ticket.release()
+    return respond(response, plan)
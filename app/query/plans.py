@@ -0,0 +1,46 @@
+# General packages and modules
+from collections import namedtuple
+
+from neo4j import Query, READ_ACCESS
+from neo4j.exceptions import ClientError
+
+# Import internal utilities for database access, caching, plans and configuration
+from app.utils.cache import TTLCache
+from app.utils.environment import Config
+from app.utils.profiling import plan_tree, operators
+from app.utils import db
+from app.query.cache import normalise
+
+# What EXPLAIN tells of a statement without running it: its query type ('r' for statements that only read)
+# and the largest number of rows the planner expects any operator to produce
+Estimate = namedtuple('Estimate', ['query_type', 'estimated_rows'])
+
+# Estimates by normalised statement, planned again once they expire so that they follow the database statistics
+estimates = TTLCache(maxsize=Config.QUERY_CACHE_SIZE, ttl=3600)
+
+# Errors of statements that cannot be planned, such as syntax errors, which fail the same way when they are run
+INVALID_STATEMENT = 'Neo.ClientError.Statement.'
+
+
+# Plan a statement with EXPLAIN, terminated by the server after timeout seconds
+# An invalid statement gets an estimate of no rows, of no query type, and is run so that its error is reported
+# by the normal path. Other errors, such as a lost connection, are raised, as nothing is known of the statement
+async def explain(statement: str, parameters: dict = None, timeout: float = None):
+    text = normalise(statement)
+    estimate = estimates.get(text)
+    if estimate is None:
+        try:
+            async with db.get_driver().session(default_access_mode=READ_ACCESS) as session:
+                result = await session.run(Query('EXPLAIN ' + statement, timeout=timeout), parameters or {})
+                summary = await result.consume()
+        except ClientError as e:
+            if not (e.code or '').startswith(INVALID_STATEMENT):
+                raise
+            return Estimate(None, 0)
+        estimated_rows = None
+        if summary.plan:
+            tree = plan_tree(summary.plan)
+            estimated_rows = max(int(operator['estimated_rows'] or 0) for operator in operators(tree))
+        estimate = Estimate(summary.query_type, estimated_rows)
+        estimates.set(text, estimate)
+    return estimate
@@ -6,8 +6,10 @@ from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 
 # Import internal utilities for database access, authorisation, and schemas
-from app.utils.db import neo4j_driver
-from app.authorisation.auth import get_current_active_user, create_password_hash
+from app.utils.db import read_query, write_query
+from app.utils import queries
+from app.authorisation.auth import get_current_active_user, create_password_hash, user_cache, get_user
+from app.query.cache import query_cache
 from app.utils.schema import User
 
 # Set the API Router
@@ -23,13 +25,14 @@ async def read_users_me(current_user: User = Depends(get_current_active_user)):
 # GET Specified user's information by username
 @router.get('/{username}', response_model=User)
 async def read_user(username: str):
-    query = 'MATCH (user:User) WHERE user.username = $username RETURN user'
+    user_in_db = await get_user(username)
+    if user_in_db is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with username {username} was not found.",
+            headers={"WWW-Authenticate": "Bearer"})
 
-    with neo4j_driver.session() as session:
-        user_in_db = session.run(query=query, parameters={'username': username})
-        user_data = user_in_db.data()[0]['user']
-
-    return User(**user_data)
+    return User(**user_in_db.dict())
 
 
 # CREATE User
@@ -42,28 +45,24 @@ async def create_user(username: str, password: str,
     attributes = {
         'username': username,
         'full_name': full_name,
-        'hashed_password': create_password_hash(password),
+        'hashed_password': await create_password_hash(password),
         'joined': str(datetime.now(timezone.utc)),
         'disabled': disabled,
     }
 
-    # Write Cypher query and run against the database
-    cypher_search = 'MATCH (user:User) WHERE user.username = $username RETURN user'
-    cypher_create = 'CREATE (user:User $params) RETURN user'
+    # First, run a search of users to determine if username is already in use
+    check_users = await read_query(queries.READ_USER.render(), {'username': username})
 
-    with neo4j_driver.session() as session:
-        # First, run a search of users to determine if username is already in use
-        check_users = session.run(query=cypher_search, parameters={'username': username})
+    # Return error message if username is already in the database
+    if check_users:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Operation not permitted, user with username {username} already exists.",
+            headers={"WWW-Authenticate": "Bearer"})
 
-        # Return error message if username is already in the database
-        if check_users.data():
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail=f"Operation not permitted, user with username {username} already exists.",
-                headers={"WWW-Authenticate": "Bearer"})
-
-        response = session.run(query=cypher_create, parameters={'params': attributes})
-        user_data = response.data()[0]['user']
+    response = await write_query(queries.CREATE_USER.render(), {'params': attributes})
+    query_cache.changed('User')
+    user_data = response[0]['user']
     return User(**user_data)
 
 
@@ -78,20 +77,12 @@ async def update_user(attributes: dict, username: str):
                 detail="Operation not permitted, cannot update password with this method.",
                 headers={"WWW-Authenticate": "Bearer"})
 
-    if attributes:
-        unpacked_attributes = 'SET ' + ', '.join(f'user.{key}=\'{value}\'' for (key, value) in attributes.items())
-    else:
-        unpacked_attributes = ''
-
     # Execute Cypher query to update the user attributes
-    cypher_update_user = ('MATCH (user: User) WHERE user.username = $user\n'
-                          f'{unpacked_attributes}\n'
-                          'RETURN user')
-
-    with neo4j_driver.session() as session:
-        updated_user = session.run(query=cypher_update_user,
-                                   parameters={'user': username})
-        user_data = updated_user.data()[0]['user']
+    updated_user = await write_query(queries.UPDATE_USER.render(), {'username': username,
+                                                                    'attributes': attributes})
+    user_cache.invalidate(username)
+    query_cache.changed('User')
+    user_data = updated_user[0]['user']
 
     return User(**user_data)
 
@@ -100,11 +91,9 @@ async def update_user(attributes: dict, username: str):
 @router.delete('/{username}/delete')
 async def delete_user(username: str):
     # Execute Cypher query to delete the user
-    cypher_delete_user = """MATCH (user: User) WHERE user.username=$user DELETE user"""
-
-    with neo4j_driver.session() as session:
-        session.run(query=cypher_delete_user,
-                    parameters={'user': username})
+    await write_query(queries.DELETE_USER.render(), {'username': username})
+    user_cache.invalidate(username)
+    query_cache.changed('User')
 
 
 # RESET User password
@@ -112,16 +101,12 @@ async def delete_user(username: str):
 async def reset_password(new_password: str, current_user: User = Depends(get_current_active_user)):
     # Get current user's username and encrypt new password
     username = current_user.username
-    new_password_hash = create_password_hash(new_password)
+    new_password_hash = await create_password_hash(new_password)
 
     # Execute Cypher query to reset the hashed_password attribute
-    cypher_reset_password = ('MATCH (user:User) WHERE user.username = $username\n'
-                             'SET user.hashed_password = $new_password_hash\n'
-                             'RETURN user')
-
-    with neo4j_driver.session() as session:
-        updated_user = session.run(query=cypher_reset_password,
-                                   parameters={'username': username,
-                                               'new_password_hash': new_password_hash})
-        user_data = updated_user.data()[0]['user']
+    updated_user = await write_query(queries.RESET_PASSWORD.render(), {'username': username,
+                                                                       'new_password_hash': new_password_hash})
+    user_cache.invalidate(username)
+    query_cache.changed('User')
+    user_data = updated_user[0]['user']
     return User(**user_data)
@@ -0,0 +1,84 @@
+# General packages and modules
+from collections import OrderedDict
+import threading
+import time
+
+
+class TTLCache:
+    """
+    Bounded least-recently-used cache whose entries expire after a fixed time to live.
+
+    :param maxsize: maximum number of entries, the least recently used entry is evicted beyond this
+    :param ttl: seconds an entry stays valid after it is set
+    :param maxbytes: optional bound on the total size given for the entries, evicting in the same way
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, maxbytes: int = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires, size = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.bytes -= size
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size: int = 0):
+        if self.maxsize <= 0 or (self.maxbytes is not None and size > self.maxbytes):
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+            self._entries[key] = (value, time.monotonic() + self.ttl, size)
+            self.bytes += size
+            while len(self._entries) > self.maxsize or (self.maxbytes is not None and self.bytes > self.maxbytes):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'bytes': self.bytes,
+            'maxbytes': self.maxbytes,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,66 @@
+# General packages and modules
+import asyncio
+
+# Import the metric of the batch sizes
+from app.utils.metrics import COALESCED_BATCH
+
+
+class Coalescer:
+    """
+    Lookups by key made by concurrent requests, collected over a short window and loaded with one statement.
+
+    Requests for the same key while it is pending share one result. A batch is loaded once the window has
+    passed, or as soon as it has max_batch distinct keys. Lookups are only joined while they are pending, not
+    once their batch is running, so that a lookup made after a write never gets a result read before it.
+
+    :param name: name of the lookups, used in metrics
+    :param load: coroutine function taking a list of distinct keys and returning a dictionary of the values found
+    :param window: seconds to collect lookups for, 0 collects the lookups made until the next event loop iteration
+    :param max_batch: number of distinct keys after which a batch is loaded without waiting for the window
+    """
+
+    def __init__(self, name: str, load, window: float = 0.0, max_batch: int = 100):
+        self.name = name
+        self.window = window
+        self.max_batch = max_batch
+        self._load = load
+        self._pending = {}
+        self._timer = None
+        self._loading = set()
+
+    # Value for a key, None if it was not found
+    async def load(self, key):
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush) if self.window > 0 \
+                    else loop.call_soon(self._flush)
+        # A request that is cancelled does not cancel the lookup shared with other requests
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._load_batch(batch))
+            self._loading.add(task)
+            task.add_done_callback(self._loading.discard)
+
+    async def _load_batch(self, batch: dict):
+        COALESCED_BATCH.observe(len(batch), lookup=self.name)
+        try:
+            values = await self._load(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(values.get(key))
@@ -0,0 +1,24 @@
+# Packages for validating identifiers
+import re
+
+# List of acceptable node labels and relationship types
+# Modify these to add constraints
+node_labels = ['Address', 'Geography', 'Person', 'Company', 'Event']
+relationship_types = ['LIVES_IN', 'USED_TO_LIVE_IN', 'WORKS_FOR', 'LOCATED_IN', 'KNOWS', 'ATTENDED', 'FRIEND']
+
+# Node properties indexed for each label, created at startup by app.admin.indexes
+# Modify these to match the properties your nodes are looked up by
+node_indexes = {
+    'Address': ['name'],
+    'Geography': ['name'],
+    'Person': ['name'],
+    'Company': ['name'],
+    'Event': ['name'],
+}
+
+# Used for validation to ensure they are not overwritten
+base_properties = ['created_by', 'created_time']
+
+# Property keys that are safe to write into a Cypher statement, checked with fullmatch, as $ would accept a
+# trailing newline
+property_key_pattern = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
@@ -1,7 +1,275 @@
-# Import Neo4j Python driver
-from neo4j import GraphDatabase
+# General packages and modules
+from contextlib import contextmanager
+import asyncio
+import itertools
+import logging
+import time
+
+# Import Neo4j async Python driver
+from neo4j import AsyncGraphDatabase, Query, READ_ACCESS, WRITE_ACCESS, unit_of_work
+from neo4j.exceptions import Neo4jError
 
 # Packages and functions for loading environment variables
 from app.utils.environment import Config
+from app.utils.queries import record_execution
+from app.utils import queries
+from app.utils.constraints import node_labels, relationship_types
+from app.utils.metrics import observe_query, TRANSACTION_ACQUIRE
+from app.utils.profiling import slow_query_log, plan_tree
+
+logger = logging.getLogger(__name__)
+
+
+# Settings of the driver and of the sessions it opens
+def driver_config():
+    config = {
+        'max_connection_pool_size': Config.NEO4J_MAX_CONNECTION_POOL_SIZE,
+        'connection_acquisition_timeout': Config.NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+        'connection_timeout': Config.NEO4J_CONNECTION_TIMEOUT,
+        'max_connection_lifetime': Config.NEO4J_MAX_CONNECTION_LIFETIME,
+        'fetch_size': Config.FETCH_SIZE,
+    }
+    if Config.NEO4J_DATABASE:
+        # Naming the database saves resolving the home database of the user for each session
+        config['database'] = Config.NEO4J_DATABASE
+    if Config.NEO4J_CAUSAL_CONSISTENCY:
+        config['bookmark_manager'] = AsyncGraphDatabase.bookmark_manager()
+    return config
+
+
+# Driver shared by every request, created by open_driver when the application starts, or on first use
+neo4j_driver = None
+
+# Statements running, waited for by close_driver
+in_flight = 0
+
+
+def get_driver():
+    global neo4j_driver
+    if neo4j_driver is None:
+        neo4j_driver = AsyncGraphDatabase.driver(Config.NEO4J_URI,
+                                                 auth=(Config.NEO4J_USERNAME, Config.NEO4J_PASSWORD),
+                                                 **driver_config())
+    return neo4j_driver
+
+
+# Create the driver and check that the database can be reached, then open pooled connections and plan the
+# query templates ahead of the first requests
+async def open_driver():
+    driver = get_driver()
+    await driver.verify_connectivity()
+    await asyncio.gather(*(_open_connection(driver) for _ in range(Config.NEO4J_WARMUP_CONNECTIONS)))
+    if Config.NEO4J_PRIME_PLANS:
+        await prime_plans(driver)
+    logger.info('Connected to %s with %d pooled connections', Config.NEO4J_URI, Config.NEO4J_WARMUP_CONNECTIONS)
+
+
+# Sessions run at the same time each hold their own connection, which returns to the pool when they close
+async def _open_connection(driver):
+    async with driver.session() as session:
+        result = await session.run('RETURN 1')
+        await result.consume()
+
+
+# Neo4j caches plans by statement text, so explaining each rendering of the templates saves planning them
+# on the first requests. Templates are rendered for every label and relationship type, and templates with
+# property keys or depths in their text are left to be planned when they are first used
+async def prime_plans(driver):
+    statements = [statement for template in queries.templates.values() for statement in renderings(template)]
+    primed = 0
+    async with driver.session() as session:
+        for statement in statements:
+            try:
+                result = await session.run('EXPLAIN ' + statement)
+                await result.consume()
+                primed += 1
+            except Neo4jError:
+                logger.debug('Could not plan %s', statement.template, exc_info=True)
+    logger.info('Planned %d of %d template statements', primed, len(statements))
+
+
+# Every rendering of a template whose placeholders are all labels and relationship types
+def renderings(template):
+    choices = []
+    for placeholder in sorted(template.placeholders):
+        if placeholder.endswith('label'):
+            choices.append([(placeholder, label) for label in node_labels])
+        elif placeholder.endswith('type'):
+            choices.append([(placeholder, relationship_type) for relationship_type in relationship_types])
+        else:
+            return []
+    return [template.render(**dict(identifiers)) for identifiers in itertools.product(*choices)]
+
+
+# Wait for the running statements to finish, up to NEO4J_DRAIN_TIMEOUT seconds, then close the pool
+async def close_driver():
+    global neo4j_driver
+    if neo4j_driver is None:
+        return
+    deadline = time.monotonic() + Config.NEO4J_DRAIN_TIMEOUT
+    while in_flight and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    if in_flight:
+        logger.warning('Closing the driver with %d statements still running', in_flight)
+    for task in list(_explaining):
+        task.cancel()
+    await neo4j_driver.close()
+    neo4j_driver = None
+
+
+# Time the execution of a statement and record it against its query template, with the number of records
+# A generator closed by its consumer while it streams records has completed, only errors count as failures
+@contextmanager
+def timed(query: str, parameters: dict, access_mode: str):
+    global in_flight
+    execution = {'rows': 0, 'plan': None}
+    start = time.perf_counter()
+    failed = True
+    in_flight += 1
+    try:
+        yield execution
+        failed = False
+    except GeneratorExit:
+        failed = False
+        raise
+    finally:
+        in_flight -= 1
+        seconds = time.perf_counter() - start
+        record_execution(query, seconds, failed)
+        observe_query(query, access_mode, seconds, execution['rows'], failed)
+        if slow_query_log.is_slow(seconds):
+            log_slow_query(query, parameters, access_mode, seconds, failed, execution['plan'])
+
+
+# Explain tasks of slow statements, referenced until they are done
+_explaining = set()
+
+
+# Log a slow statement, explaining it first if it was not profiled, without holding up the response
+def log_slow_query(query: str, parameters: dict, access_mode: str, seconds: float, failed: bool, plan: dict):
+    entry = slow_query_log.entry(query, parameters, access_mode, seconds, failed)
+    if plan is not None or failed or not Config.SLOW_QUERY_EXPLAIN:
+        slow_query_log.record(entry, plan)
+        return
+
+    task = asyncio.ensure_future(_explain_and_record(query, parameters, access_mode, entry))
+    _explaining.add(task)
+    task.add_done_callback(_explaining.discard)
+
+
+# EXPLAIN plans a statement without running it
+async def _explain_and_record(query: str, parameters: dict, access_mode: str, entry: dict):
+    plan = None
+    try:
+        async with get_driver().session(default_access_mode=access_mode) as session:
+            result = await session.run('EXPLAIN ' + query, parameters or {})
+            plan = (await result.consume()).plan
+    except Exception:
+        logger.exception('Could not explain slow query %s', entry['template'])
+    slow_query_log.record(entry, plan)
+
+
+# Transaction function, run inside a managed read or write transaction
+# The time since the session was opened is mostly spent acquiring a pooled connection and beginning the
+# transaction, and also covers earlier attempts when the driver retries the function
+async def _run_and_fetch(tx, query: str, parameters: dict, opened: float, access_mode: str):
+    TRANSACTION_ACQUIRE.observe(time.perf_counter() - opened, access_mode=access_mode)
+    result = await tx.run(query, parameters)
+    return await result.data()
+
+
+# Transaction function terminated by the server after timeout seconds, None keeps the server's own timeout
+def with_timeout(transaction_function, timeout: float = None):
+    return transaction_function if timeout is None else unit_of_work(timeout=timeout)(transaction_function)
+
+
+# Run a read-only query in a managed read transaction, routed to followers and read replicas in a cluster,
+# and return the records as dictionaries
+async def read_query(query: str, parameters: dict = None, timeout: float = None):
+    with timed(query, parameters, READ_ACCESS) as execution:
+        async with get_driver().session() as session:
+            records = await session.execute_read(with_timeout(_run_and_fetch, timeout), query, parameters or {},
+                                                 time.perf_counter(), READ_ACCESS)
+        execution['rows'] = len(records)
+        return records
+
+
+# Run a query that writes to the graph in a managed write transaction, routed to the leader in a cluster,
+# and return the records as dictionaries
+async def write_query(query: str, parameters: dict = None, timeout: float = None):
+    with timed(query, parameters, WRITE_ACCESS) as execution:
+        async with get_driver().session() as session:
+            records = await session.execute_write(with_timeout(_run_and_fetch, timeout), query, parameters or {},
+                                                  time.perf_counter(), WRITE_ACCESS)
+        execution['rows'] = len(records)
+        return records
+
+
+# Run a statement inside a write transaction, timed against its query template, and return its records
+async def run_statement(tx, query: str, parameters: dict = None):
+    with timed(query, parameters, WRITE_ACCESS) as execution:
+        result = await tx.run(query, parameters or {})
+        records = await result.data()
+        execution['rows'] = len(records)
+        return records
+
+
+async def _acquired(tx, opened: float, transaction_function, *args):
+    TRANSACTION_ACQUIRE.observe(time.perf_counter() - opened, access_mode=WRITE_ACCESS)
+    return await transaction_function(tx, *args)
+
+
+# Run a transaction function in one managed write transaction, committed once it returns and rolled back
+# if it raises, the driver runs it again on transient errors so it must not have other side effects
+async def write_transaction(transaction_function, *args):
+    async with get_driver().session() as session:
+        return await session.execute_write(_acquired, time.perf_counter(), transaction_function, *args)
+
+
+async def _run_statements(tx, statements):
+    return [await run_statement(tx, query, parameters) for query, parameters in statements]
+
+
+# Run several (query, parameters) statements in one managed write transaction, so that all of them are
+# committed or none is, and return the records of each statement
+async def write_queries(statements):
+    return await write_transaction(_run_statements, list(statements))
+
+
+# Transaction function running a statement under PROFILE, returning its records and the profiled plan
+async def _run_and_profile(tx, query: str, parameters: dict):
+    result = await tx.run('PROFILE ' + query, parameters)
+    records = await result.data()
+    summary = await result.consume()
+    return records, summary.profile
+
+
+# Run a query under PROFILE in a managed transaction, and return the records with the plan tree of the
+# operators, with the rows and database hits of each
+async def profile_query(query: str, parameters: dict = None, access_mode: str = READ_ACCESS, timeout: float = None):
+    with timed(query, parameters, access_mode) as execution:
+        async with get_driver().session() as session:
+            execute = session.execute_read if access_mode == READ_ACCESS else session.execute_write
+            records, plan = await execute(with_timeout(_run_and_profile, timeout), query, parameters or {})
+        execution['rows'] = len(records)
+        execution['plan'] = plan
+        return records, plan_tree(plan)
+
 
-neo4j_driver = GraphDatabase.driver(Config.NEO4J_URI, auth=(Config.NEO4J_USERNAME, Config.NEO4J_PASSWORD))
+# Run a query in an auto-commit transaction and yield the records as dictionaries, as they are fetched
+# Records are pulled from the server in batches of fetch_size, so only one batch is held in memory at a time
+async def stream_query(query: str, parameters: dict = None, fetch_size: int = None, access_mode: str = WRITE_ACCESS,
+                       timeout: float = None):
+    with timed(query, parameters, access_mode) as execution:
+        async with get_driver().session(fetch_size=fetch_size or Config.FETCH_SIZE,
+                                        default_access_mode=access_mode) as session:
+            statement = query if timeout is None else Query(str(query), timeout=timeout)
+            result = await session.run(statement, parameters or {})
+            try:
+                async for record in result:
+                    execution['rows'] += 1
+                    yield record.data()
+            except GeneratorExit:
+                # The consumer stopped reading, such as a traversal that reached its limit, so the session is
+                # closed with the records left unread, and the statement is recorded as completed
+                return
@@ -0,0 +1,127 @@
+# General packages and modules
+import asyncio
+import time
+from typing import Optional
+
+# Import modules from FastAPI and Neo4j errors
+from fastapi import Header, HTTPException, Request, status
+from neo4j.exceptions import Neo4jError
+
+# Import the counters of the work reclaimed, and the schema of structured refusals
+from app.utils.metrics import REQUESTS_CANCELLED, DEADLINES_EXCEEDED
+from app.utils.schema import Rejection
+
+# Status of requests whose client went away before the response, as logged by nginx
+CLIENT_CLOSED_REQUEST = 499
+
+# Code of the errors of transactions terminated by the server after their timeout, with or without a suffix
+TIMED_OUT = 'Neo.ClientError.Transaction.TransactionTimedOut'
+
+# Smallest transaction timeout sent to the server, as a timeout of 0 would mean no timeout at all
+MINIMUM_TIMEOUT = 0.001
+
+
+def timed_out(error) -> bool:
+    return (error.code or '').startswith(TIMED_OUT)
+
+
+class Deadline:
+    """
+    Time by which the database work of a request has to finish.
+
+    :param route: name of the route, used in metrics
+    :param seconds: seconds from now, None for no deadline
+    """
+
+    def __init__(self, route: str, seconds: float = None):
+        self.route = route
+        self.seconds = seconds
+        self.expires = None if seconds is None else time.monotonic() + seconds
+        self._counted = False
+
+    # Seconds left, passed to Neo4j as the transaction timeout, None without a deadline
+    def remaining(self):
+        if self.expires is None:
+            return None
+        return max(self.expires - time.monotonic(), MINIMUM_TIMEOUT)
+
+    # A request is counted once, however many of its statements were cut short
+    def client_disconnected(self):
+        if not self._counted:
+            self._counted = True
+            REQUESTS_CANCELLED.inc(route=self.route)
+        return HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed the request.")
+
+    def exceeded(self):
+        if not self._counted:
+            self._counted = True
+            DEADLINES_EXCEEDED.inc(route=self.route)
+        return HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=Rejection(reason='timeout', limit=self.seconds,
+                             detail=f"Operation not permitted, the request ran for longer than "
+                                    f"{self.seconds:g} seconds.").dict(),
+            headers={"WWW-Authenticate": "Bearer"})
+
+
+# Dependency giving each request of a route its deadline, from the X-Request-Timeout header in seconds,
+# which can shorten but not extend the default of the route (0 for none)
+def request_deadline(route: str, default: float = 0):
+    def deadline(x_request_timeout: Optional[float] = Header(None, gt=0)) -> Deadline:
+        seconds = [value for value in (x_request_timeout, default) if value]
+        return Deadline(route, min(seconds) if seconds else None)
+    return deadline
+
+
+# Wait for the client to disconnect, the body of the request must not be needed any more
+async def disconnected(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+# Run the database work of a request, cancelled when the client disconnects or the deadline passes
+# Cancelling the work closes its session, which releases the connection and makes the server stop the transaction
+async def cancellable(request: Request, deadline: Deadline, work):
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(disconnected(request.receive))
+    try:
+        done, _ = await asyncio.wait({task, watcher}, timeout=deadline.remaining(),
+                                     return_when=asyncio.FIRST_COMPLETED)
+        gone = watcher in done and watcher.exception() is None
+        # A receive channel that fails tells nothing about the client, so the work is waited for as usual
+        if task not in done and watcher in done and not gone:
+            done, _ = await asyncio.wait({task}, timeout=deadline.remaining())
+    except BaseException:
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+
+    if task not in done:
+        # Counted before cancelling, so that the cancelled work is not counted again by watched
+        error = deadline.client_disconnected() if gone else deadline.exceeded()
+        task.cancel()
+        # The cancelled work is waited for, so that its session has been released before responding
+        await asyncio.gather(task, return_exceptions=True)
+        raise error
+
+    try:
+        return task.result()
+    except Neo4jError as e:
+        if deadline.seconds and timed_out(e):
+            raise deadline.exceeded() from e
+        raise
+
+
+# Records of a streamed response, counting a stream cut short by the client or by the server's timeout
+async def watched(deadline: Deadline, records):
+    try:
+        async for record in records:
+            yield record
+    except asyncio.CancelledError:
+        deadline.client_disconnected()
+        raise
+    except Neo4jError as e:
+        if deadline.seconds and timed_out(e):
+            deadline.exceeded()
+        raise
@@ -15,7 +15,107 @@ class Config:
     ALGORITHM = os.environ.get('ALGORITHM', "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get('ACCESS_TOKEN_EXPIRE_MINUTES', 10_080))  # one week
 
+    # Static bearer token accepted by /metrics besides user access tokens, for scrapers that cannot log in
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
     # Neo4j driver execution
     NEO4J_URI = os.environ.get('NEO4J_URI','')
     NEO4J_USERNAME = os.environ.get('NEO4J_USERNAME', 'neo4j')
     NEO4J_PASSWORD = os.environ.get('NEO4J_PASSWORD','')
+    NEO4J_DATABASE = os.environ.get('NEO4J_DATABASE')  # defaults to the home database of the user
+
+    # Neo4j driver connection pool, with timeouts and lifetimes in seconds
+    # Use a neo4j:// URI so that read transactions are routed to followers and read replicas in a cluster
+    NEO4J_MAX_CONNECTION_POOL_SIZE = int(os.environ.get('NEO4J_MAX_CONNECTION_POOL_SIZE', 100))
+    NEO4J_CONNECTION_ACQUISITION_TIMEOUT = float(os.environ.get('NEO4J_CONNECTION_ACQUISITION_TIMEOUT', 60))
+    NEO4J_CONNECTION_TIMEOUT = float(os.environ.get('NEO4J_CONNECTION_TIMEOUT', 30))
+    NEO4J_MAX_CONNECTION_LIFETIME = float(os.environ.get('NEO4J_MAX_CONNECTION_LIFETIME', 3600))
+
+    # Connections opened when the application starts, and whether to plan the query templates then
+    # On shutdown, running statements are given NEO4J_DRAIN_TIMEOUT seconds to finish before the pool is closed
+    NEO4J_WARMUP_CONNECTIONS = int(os.environ.get('NEO4J_WARMUP_CONNECTIONS', 4))
+    NEO4J_PRIME_PLANS = os.environ.get('NEO4J_PRIME_PLANS', 'false').lower() == 'true'
+    NEO4J_DRAIN_TIMEOUT = float(os.environ.get('NEO4J_DRAIN_TIMEOUT', 30))
+
+    # Chain the bookmarks of every session, so that reads routed to other cluster members see earlier writes
+    NEO4J_CAUSAL_CONSISTENCY = os.environ.get('NEO4J_CAUSAL_CONSISTENCY', 'true').lower() == 'true'
+
+    # Cache of authenticated users, looked up on every request
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))
+
+    # Pool used for password hashing and verification, 'thread' or 'process'
+    HASH_POOL = os.environ.get('HASH_POOL', 'thread')
+    HASH_WORKERS = int(os.environ.get('HASH_WORKERS', 0)) or None  # defaults to the number of cores
+    HASH_MAX_CONCURRENCY = int(os.environ.get('HASH_MAX_CONCURRENCY', 0)) or None  # defaults to HASH_WORKERS
+
+    # Node and user lookups of concurrent requests are loaded together, collected for COALESCE_WINDOW seconds
+    # (0 collects the lookups made until the next event loop iteration) or until COALESCE_MAX_BATCH keys
+    COALESCE_WINDOW = float(os.environ.get('COALESCE_WINDOW', 0))
+    COALESCE_MAX_BATCH = int(os.environ.get('COALESCE_MAX_BATCH', 100))
+
+    # Maximum number of items written in each transaction by the batch endpoints
+    BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', 1000))
+
+    # Maximum number of operations of a /graph/batch request, all run in one transaction
+    BATCH_MAX_OPERATIONS = int(os.environ.get('BATCH_MAX_OPERATIONS', 1000))
+
+    # Number of records fetched from the database in each batch when streaming results
+    FETCH_SIZE = int(os.environ.get('FETCH_SIZE', 1000))
+
+    # Default and maximum number of nodes in each page of a collection
+    PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 100))
+    MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 1000))
+
+    # Create the configured indexes and constraints when the application starts
+    SCHEMA_ON_STARTUP = os.environ.get('SCHEMA_ON_STARTUP', 'true').lower() == 'true'
+
+    # Serialise large Nodes and Query responses with orjson, without validating the driver output again
+    FAST_SERIALIZATION = os.environ.get('FAST_SERIALIZATION', 'false').lower() == 'true'
+
+    # Cache of node and relationship responses, shared through Redis when a URL is set (requires redis)
+    GRAPH_CACHE_SIZE = int(os.environ.get('GRAPH_CACHE_SIZE', 10_000))
+    GRAPH_CACHE_TTL = float(os.environ.get('GRAPH_CACHE_TTL', 30))
+    GRAPH_CACHE_REDIS_URL = os.environ.get('GRAPH_CACHE_REDIS_URL')
+
+    # Limits on traversals, the maximum number of hops, of nodes returned and of relationships followed from each node
+    TRAVERSAL_MAX_DEPTH = int(os.environ.get('TRAVERSAL_MAX_DEPTH', 3))
+    TRAVERSAL_MAX_RESULTS = int(os.environ.get('TRAVERSAL_MAX_RESULTS', 1000))
+    TRAVERSAL_MAX_FANOUT = int(os.environ.get('TRAVERSAL_MAX_FANOUT', 100))
+
+    # In-memory adjacency snapshot of these labels and relationship types (comma separated, all types if empty),
+    # read again from Neo4j when older than ADJACENCY_MAX_STALENESS seconds or after ADJACENCY_MAX_CHANGES writes
+    ADJACENCY_LABELS = [label.strip() for label in os.environ.get('ADJACENCY_LABELS', '').split(',') if label.strip()]
+    ADJACENCY_RELATIONSHIP_TYPES = [relationship_type.strip() for relationship_type
+                                    in os.environ.get('ADJACENCY_RELATIONSHIP_TYPES', '').split(',')
+                                    if relationship_type.strip()]
+    ADJACENCY_MAX_STALENESS = float(os.environ.get('ADJACENCY_MAX_STALENESS', 60))
+    ADJACENCY_MAX_CHANGES = int(os.environ.get('ADJACENCY_MAX_CHANGES', 10_000))
+
+    # Log statements slower than SLOW_QUERY_SECONDS (0 disables), keeping the last SLOW_QUERY_LOG_SIZE in memory
+    # Slow statements that were not profiled are explained afterwards, to log a summary of their plan
+    SLOW_QUERY_SECONDS = float(os.environ.get('SLOW_QUERY_SECONDS', 1.0))
+    SLOW_QUERY_LOG_SIZE = int(os.environ.get('SLOW_QUERY_LOG_SIZE', 100))
+    SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'
+
+    # Cache of the records of read-only /q statements, bounded by QUERY_CACHE_BYTES of JSON (0 disables)
+    # Entries are dropped when the labels and relationship types they name are written, and after QUERY_CACHE_TTL
+    QUERY_CACHE_BYTES = int(os.environ.get('QUERY_CACHE_BYTES', 64 * 1024 * 1024))
+    QUERY_CACHE_SIZE = int(os.environ.get('QUERY_CACHE_SIZE', 10_000))
+    QUERY_CACHE_TTL = float(os.environ.get('QUERY_CACHE_TTL', 10))
+
+    # Admission control of /q: statements that EXPLAIN estimates to produce more than QUERY_ROW_BUDGET rows in any
+    # operator (0 disables) are rejected, or with QUERY_OVER_BUDGET=queue run QUERY_EXPENSIVE_CONCURRENCY at a time,
+    # waiting up to QUERY_QUEUE_TIMEOUT seconds for their turn
+    QUERY_ROW_BUDGET = int(os.environ.get('QUERY_ROW_BUDGET', 0))
+    QUERY_OVER_BUDGET = os.environ.get('QUERY_OVER_BUDGET', 'reject').lower()
+    QUERY_EXPENSIVE_CONCURRENCY = int(os.environ.get('QUERY_EXPENSIVE_CONCURRENCY', 2))
+    QUERY_QUEUE_TIMEOUT = float(os.environ.get('QUERY_QUEUE_TIMEOUT', 10))
+
+    # Statements of /q each user may run at once (0 disables)
+    QUERY_USER_CONCURRENCY = int(os.environ.get('QUERY_USER_CONCURRENCY', 0))
+
+    # Default deadlines in seconds of /q and /graph/read_node_collection (0 for none), which the X-Request-Timeout
+    # header can shorten, sent to Neo4j as the transaction timeout
+    QUERY_TIMEOUT = float(os.environ.get('QUERY_TIMEOUT', 0))
+    COLLECTION_TIMEOUT = float(os.environ.get('COLLECTION_TIMEOUT', 0))
@@ -0,0 +1,229 @@
+# General packages and modules
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+import asyncio
+import threading
+import time
+
+# Import the name given to statements that were not rendered from a query template
+from app.utils.queries import UNREGISTERED
+
+# Upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# Escape a label value for the Prometheus text format
+def escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def label_text(names, values, extra: str = '') -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric(ABC):
+    """
+    Metric with a value for each combination of its label values, rendered in the Prometheus text format.
+
+    :param name: metric name
+    :param description: help text
+    :param labels: names of the labels
+    """
+    kind = 'untyped'
+
+    def __init__(self, name: str, description: str, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def _key(self, labels: dict):
+        return tuple(labels[name] for name in self.labels)
+
+    # Lines of the Prometheus text format with the current values, one for each series
+    @abstractmethod
+    def samples(self):
+        pass
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    # Counters kept by other components are copied in when the metrics are collected
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{label_text(self.labels, key)} {value}' for key, value in values]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values, counted in buckets by upper bound.
+
+    :param buckets: increasing upper bounds of the buckets, a +Inf bucket is always added
+    """
+    kind = 'histogram'
+
+    def __init__(self, name: str, description: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                bucket = label_text(self.labels, key, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{bucket} {cumulative}')
+            lines.append(f'{self.name}_sum{label_text(self.labels, key)} {total}')
+            lines.append(f'{self.name}_count{label_text(self.labels, key)} {cumulative}')
+        return lines
+
+
+# Every metric, in the order it is rendered
+registry = []
+
+
+def render() -> str:
+    return '\n'.join(metric.render() for metric in registry) + '\n'
+
+
+# Requests
+REQUEST_DURATION = Histogram('http_request_duration_seconds',
+                             'Time to serve a request, until the last byte of the response is sent',
+                             ['method', 'route', 'status'])
+REQUESTS_IN_PROGRESS = Gauge('http_requests_in_progress', 'Requests being served')
+EVENT_LOOP_LAG = Histogram('event_loop_lag_seconds',
+                           'Delay of a timer on the event loop beyond its due time, while the loop runs other work',
+                           buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+
+# Cypher statements
+CYPHER_DURATION = Histogram('cypher_query_duration_seconds',
+                            'Time to run a Cypher statement and fetch its records, by query template',
+                            ['template', 'access_mode'])
+CYPHER_ROWS = Histogram('cypher_query_rows', 'Records returned by a Cypher statement, by query template',
+                        ['template'], buckets=(0, 1, 10, 100, 1000, 10_000, 100_000))
+CYPHER_ERRORS = Counter('cypher_query_errors_total', 'Cypher statements that failed, by query template',
+                        ['template'])
+TRANSACTION_ACQUIRE = Histogram('neo4j_transaction_acquire_seconds',
+                                'Time from opening a session to the start of the transaction function, '
+                                'which is mostly waiting for a connection from the driver pool',
+                                ['access_mode'])
+
+# Lookups coalesced across concurrent requests
+COALESCED_BATCH = Histogram('coalesced_lookup_batch_size', 'Distinct keys loaded by one coalesced lookup statement',
+                            ['lookup'], buckets=(1, 2, 5, 10, 25, 50, 100, 250, 1000))
+
+# Admission control of custom statements
+QUERY_REJECTED = Counter('query_admission_rejected_total', 'Custom statements refused by admission control, by reason',
+                         ['reason'])
+QUERY_QUEUED = Histogram('query_admission_queued_seconds',
+                         'Time an over-budget custom statement waited for its turn to run')
+
+# Database work given up on, because the client disconnected or the deadline of the request passed
+REQUESTS_CANCELLED = Counter('request_cancelled_total',
+                             'Requests whose database work was cancelled as their client disconnected', ['route'])
+DEADLINES_EXCEEDED = Counter('request_deadline_exceeded_total',
+                             'Requests whose database work was stopped as their deadline passed', ['route'])
+
+# Authorisation
+AUTH_LOOKUP = Histogram('auth_user_lookup_seconds',
+                        'Time to find the user of a request, from the user cache or the database', ['cache'])
+
+
+# Record the execution of a statement against its query template
+def observe_query(statement: str, access_mode: str, seconds: float, rows: int, failed: bool):
+    template = getattr(statement, 'template', None) or UNREGISTERED
+    CYPHER_DURATION.observe(seconds, template=template, access_mode=access_mode)
+    if failed:
+        CYPHER_ERRORS.inc(template=template)
+    else:
+        CYPHER_ROWS.observe(rows, template=template)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each request until the last byte of its response, so streamed responses are
+    timed in full. Requests are labelled with the path of their route rather than the requested path,
+    so that IDs in paths do not create a series each.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes = None
+
+    # Path of the route served by each endpoint function, the router sets the endpoint in the scope
+    def route_path(self, scope):
+        if self._routes is None:
+            self._routes = {route.endpoint: route.path for route in scope['app'].routes if hasattr(route, 'endpoint')}
+        return self._routes.get(scope.get('endpoint'), 'unmatched')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_and_record(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            REQUEST_DURATION.observe(time.perf_counter() - start,
+                                     method=scope['method'], route=self.route_path(scope), status=status_code)
+
+
+# Measure how late a timer fires, which is how long other work holds the event loop
+async def monitor_event_loop(interval: float = 0.1):
+    loop = asyncio.get_running_loop()
+    while True:
+        due = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(loop.time() - due, 0.0))
@@ -0,0 +1,103 @@
+# General packages and modules
+from collections import deque
+from datetime import datetime, timezone
+import logging
+import threading
+
+# Import the name given to statements that were not rendered from a query template, and configuration
+from app.utils.queries import UNREGISTERED
+from app.utils.environment import Config
+
+logger = logging.getLogger('app.slow_queries')
+
+
+# Organise a plan from the result summary of a PROFILE or EXPLAIN statement, with the counters of each operator
+# EXPLAIN plans only have estimates, as the statement is not run
+def plan_tree(plan: dict):
+    arguments = plan.get('args', {})
+    return {
+        'operator': plan.get('operatorType'),
+        'details': arguments.get('Details'),
+        'identifiers': plan.get('identifiers', []),
+        'rows': plan.get('rows'),
+        'db_hits': plan.get('dbHits'),
+        'estimated_rows': arguments.get('EstimatedRows'),
+        'page_cache_hits': plan.get('pageCacheHits'),
+        'page_cache_misses': plan.get('pageCacheMisses'),
+        'children': [plan_tree(child) for child in plan.get('children', [])],
+    }
+
+
+def operators(tree: dict):
+    yield tree
+    for child in tree['children']:
+        yield from operators(child)
+
+
+# Totals of a plan, with the operator that made the most database hits
+def plan_summary(tree: dict):
+    every_operator = list(operators(tree))
+    hottest = max(every_operator, key=lambda operator: operator['db_hits'] or 0)
+    profiled = tree['db_hits'] is not None
+    return {
+        'operators': len(every_operator),
+        'db_hits': sum(operator['db_hits'] or 0 for operator in every_operator) if profiled else None,
+        'rows': tree['rows'],
+        'estimated_rows': tree['estimated_rows'],
+        'hottest_operator': hottest['operator'] if profiled else None,
+    }
+
+
+# Describe parameters by their types and sizes, so that their values are not logged
+def parameter_shape(value):
+    if isinstance(value, dict):
+        return {key: parameter_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        element = parameter_shape(value[0]) if value else None
+        return {'list': len(value), 'of': element} if element is not None else {'list': len(value)}
+    return type(value).__name__
+
+
+class SlowQueryLog:
+    """
+    Statements that took longer than a threshold, logged and kept in memory for /admin/slow_queries.
+
+    :param threshold: seconds above which a statement is slow, 0 disables the log
+    :param size: number of recent slow statements kept in memory
+    """
+
+    def __init__(self, threshold: float, size: int = 100):
+        self.threshold = threshold
+        self.entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def is_slow(self, seconds: float):
+        return 0 < self.threshold <= seconds
+
+    def entry(self, statement: str, parameters: dict, access_mode: str, seconds: float, failed: bool):
+        return {
+            'template': getattr(statement, 'template', None) or UNREGISTERED,
+            'access_mode': access_mode,
+            'parameters': parameter_shape(parameters or {}),
+            'seconds': seconds,
+            'failed': failed,
+            'time': datetime.now(timezone.utc),
+            'plan_summary': None,
+        }
+
+    # Keep and log a slow statement, with the summary of its plan if there is one
+    def record(self, entry: dict, plan: dict = None):
+        if plan is not None:
+            entry['plan_summary'] = plan_summary(plan_tree(plan))
+        with self._lock:
+            self.entries.append(entry)
+        logger.warning('Slow query %s (%s) took %.3f s, parameters %s, plan %s', entry['template'],
+                       entry['access_mode'], entry['seconds'], entry['parameters'], entry['plan_summary'])
+
+    def recent(self):
+        with self._lock:
+            return list(reversed(self.entries))
+
+
+# Slow statements of every endpoint, above SLOW_QUERY_SECONDS
+slow_query_log = SlowQueryLog(threshold=Config.SLOW_QUERY_SECONDS, size=Config.SLOW_QUERY_LOG_SIZE)
@@ -0,0 +1,401 @@
+# General packages and modules
+from string import Formatter
+import threading
+
+# Import the constraints used to whitelist identifiers
+from app.utils.constraints import node_labels, relationship_types, property_key_pattern
+
+
+class Statement(str):
+    """
+    Cypher text rendered from a QueryTemplate, carrying the name of its template for statistics.
+    """
+    template = None
+
+
+class QueryTemplate:
+    """
+    Cypher statement in which every value is passed as a parameter.
+
+    Labels, relationship types and property keys cannot be parameters, so they are placeholders in the text,
+    filled in by render. Placeholders ending in 'label' only accept node_labels, ones ending in 'type' only
+    accept relationship_types, ones ending in 'property' only accept plain identifiers, and ones ending in
+    'depth' only accept integers. Every rendering is kept, so the same identifiers always give the same text
+    and Neo4j can reuse the cached plan for it.
+
+    :param name: name of the template, used in statistics
+    :param cypher: Cypher text, with placeholders in braces for identifiers
+    """
+
+    def __init__(self, name: str, cypher: str):
+        self.name = name
+        self.cypher = ' '.join(cypher.split())
+        self.placeholders = {field for _, field, _, _ in Formatter().parse(self.cypher) if field}
+        self._rendered = {}
+
+    def render(self, **identifiers) -> Statement:
+        key = tuple(sorted(identifiers.items()))
+        statement = self._rendered.get(key)
+        if statement is None:
+            if set(identifiers) != self.placeholders:
+                raise ValueError(f'Template {self.name} needs {sorted(self.placeholders)}, got {sorted(identifiers)}')
+            for placeholder, value in identifiers.items():
+                check_identifier(placeholder, value)
+
+            statement = Statement(self.cypher.format(**identifiers))
+            statement.template = self.name
+            self._rendered[key] = statement
+        return statement
+
+
+# Check an identifier against the whitelist for its placeholder
+def check_identifier(placeholder: str, value):
+    if placeholder.endswith('label'):
+        allowed = value in node_labels
+    elif placeholder.endswith('type'):
+        allowed = value in relationship_types
+    elif placeholder.endswith('property'):
+        allowed = isinstance(value, str) and bool(property_key_pattern.fullmatch(value))
+    elif placeholder.endswith('depth'):
+        allowed = isinstance(value, int) and not isinstance(value, bool)
+    else:
+        raise ValueError(f'Placeholder {placeholder} has no whitelist')
+
+    if not allowed:
+        raise ValueError(f'{value!r} is not accepted for {placeholder}')
+
+
+class TemplateStats:
+    """
+    Execution statistics of a template.
+
+    Executions of a text already run by this worker process are counted as repeated statements. Neo4j caches
+    plans by statement text, so only repeated statements can reuse a cached plan, but the count is kept in
+    process and is not a plan cache hit: Neo4j may have evicted the plan, or planned again for other parameter
+    types, and statements run by other workers or before a restart are not counted.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.repeated_statements = 0
+        self.texts = set()
+
+    def record(self, statement: str, seconds: float, failed: bool = False):
+        self.calls += 1
+        self.errors += failed
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        if statement in self.texts:
+            self.repeated_statements += 1
+        else:
+            self.texts.add(statement)
+
+    def summary(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'distinct_statements': len(self.texts),
+            'repeated_statement_ratio': self.repeated_statements / self.calls if self.calls else 0.0,
+            'mean_ms': self.total_seconds / self.calls * 1000 if self.calls else 0.0,
+            'max_ms': self.max_seconds * 1000,
+        }
+
+
+# Statistics for each template, with statements that were not rendered from a template counted together
+UNREGISTERED = 'unregistered'
+template_stats = {}
+_stats_lock = threading.Lock()
+
+
+# Record the execution of a statement against its template
+def record_execution(statement: str, seconds: float, failed: bool = False):
+    name = getattr(statement, 'template', None) or UNREGISTERED
+    with _stats_lock:
+        stats = template_stats.get(name)
+        if stats is None:
+            stats = template_stats[name] = TemplateStats()
+        # Free text statements are not remembered, so that custom queries cannot grow the statistics
+        stats.record(statement if name != UNREGISTERED else '', seconds, failed)
+
+
+# Central registry of query templates, by name
+templates = {}
+
+
+def register(name: str, cypher: str) -> QueryTemplate:
+    template = QueryTemplate(name, cypher)
+    templates[name] = template
+    return template
+
+
+# Users
+READ_USER = register('read_user', """
+    MATCH (user:User) WHERE user.username = $username
+    RETURN user
+    """)
+
+READ_USERS = register('read_users', """
+    MATCH (user:User) WHERE user.username IN $usernames
+    RETURN user
+    """)
+
+CREATE_USER = register('create_user', """
+    CREATE (user:User $params)
+    RETURN user
+    """)
+
+UPDATE_USER = register('update_user', """
+    MATCH (user:User) WHERE user.username = $username
+    SET user += $attributes
+    RETURN user
+    """)
+
+RESET_PASSWORD = register('reset_password', """
+    MATCH (user:User) WHERE user.username = $username
+    SET user.hashed_password = $new_password_hash
+    RETURN user
+    """)
+
+DELETE_USER = register('delete_user', """
+    MATCH (user:User) WHERE user.username = $username
+    DELETE user
+    """)
+
+# Nodes
+CREATE_NODE = register('create_node', """
+    CREATE (new_node:{label})
+    SET new_node += $attributes
+    SET new_node.created_by = $created_by
+    SET new_node.created_time = $created_time
+    RETURN new_node, LABELS(new_node) as labels, ID(new_node) as id
+    """)
+
+CREATE_NODES = register('create_nodes', """
+    UNWIND $rows AS row
+    CREATE (new_node:{label})
+    SET new_node += row.properties
+    SET new_node.created_by = $created_by
+    SET new_node.created_time = $created_time
+    RETURN row.position AS position, ID(new_node) AS id
+    """)
+
+READ_NODE = register('read_node', """
+    MATCH (node)
+    WHERE ID(node) = $node_id
+    RETURN ID(node) as id, LABELS(node) as labels, node
+    """)
+
+READ_NODES_BY_ID = register('read_nodes_by_id', """
+    MATCH (node)
+    WHERE ID(node) IN $ids
+    RETURN ID(node) as id, LABELS(node) as labels, node
+    """)
+
+# Pages are ordered by node ID, so each page continues after the last ID of the previous one
+READ_NODES = register('read_nodes', """
+    MATCH (node)
+    WHERE node.{search_property} = $value AND ID(node) > $after
+    RETURN ID(node) as id, LABELS(node) as labels, node
+    ORDER BY id
+    LIMIT $limit
+    """)
+
+READ_NODES_BY_LABEL = register('read_nodes_by_label', """
+    MATCH (node:{label})
+    WHERE node.{search_property} = $value AND ID(node) > $after
+    RETURN ID(node) as id, LABELS(node) as labels, node
+    ORDER BY id
+    LIMIT $limit
+    """)
+
+# Projections of the read templates, returning only the values of the properties in $fields, in their order
+# The keys are a parameter rather than a map projection, so that every set of fields shares one plan
+READ_NODE_FIELDS = register('read_node_fields', """
+    MATCH (node)
+    WHERE ID(node) = $node_id
+    RETURN ID(node) as id, LABELS(node) as labels, [key IN $fields | node[key]] as node
+    """)
+
+READ_NODES_FIELDS = register('read_nodes_fields', """
+    MATCH (node)
+    WHERE node.{search_property} = $value AND ID(node) > $after
+    RETURN ID(node) as id, LABELS(node) as labels, [key IN $fields | node[key]] as node
+    ORDER BY id
+    LIMIT $limit
+    """)
+
+READ_NODES_BY_LABEL_FIELDS = register('read_nodes_by_label_fields', """
+    MATCH (node:{label})
+    WHERE node.{search_property} = $value AND ID(node) > $after
+    RETURN ID(node) as id, LABELS(node) as labels, [key IN $fields | node[key]] as node
+    ORDER BY id
+    LIMIT $limit
+    """)
+
+UPDATE_NODE = register('update_node', """
+    MATCH (node) WHERE ID(node) = $node_id
+    SET node += $attributes
+    RETURN node, ID(node) as id, LABELS(node) as labels
+    """)
+
+DELETE_NODE = register('delete_node', """
+    MATCH (node)
+    WHERE ID(node) = $node_id
+    DETACH DELETE node
+    """)
+
+# Deletes that report what they deleted, so that a batch can tell when nothing matched
+DELETE_NODE_RETURNING = register('delete_node_returning', """
+    MATCH (node)
+    WHERE ID(node) = $node_id
+    WITH node, ID(node) as id, LABELS(node) as labels
+    DETACH DELETE node
+    RETURN id, labels
+    """)
+
+# Relationships
+CREATE_RELATIONSHIP = register('create_relationship', """
+    MATCH (nodeA:{source_label}) WHERE nodeA.{source_property} = $nodeA_property
+    MATCH (nodeB:{target_label}) WHERE nodeB.{target_property} = $nodeB_property
+    CREATE (nodeA)-[relationship:{relationship_type}]->(nodeB)
+    SET relationship += $attributes
+    SET relationship.created_by = $created_by
+    SET relationship.created_time = $created_time
+    RETURN nodeA, nodeB, LABELS(nodeA), LABELS(nodeB), ID(nodeA), ID(nodeB),
+           ID(relationship), TYPE(relationship), PROPERTIES(relationship)
+    """)
+
+CREATE_RELATIONSHIPS = register('create_relationships', """
+    UNWIND $rows AS row
+    MATCH (nodeA:{source_label}) WHERE nodeA.{source_property} = row.source_value
+    MATCH (nodeB:{target_label}) WHERE nodeB.{target_property} = row.target_value
+    CREATE (nodeA)-[relationship:{relationship_type}]->(nodeB)
+    SET relationship += row.properties
+    SET relationship.created_by = $created_by
+    SET relationship.created_time = $created_time
+    RETURN row.position AS position, COUNT(relationship) AS created
+    """)
+
+CREATE_RELATIONSHIP_BY_ID = register('create_relationship_by_id', """
+    MATCH (nodeA) WHERE ID(nodeA) = $source_id
+    MATCH (nodeB) WHERE ID(nodeB) = $target_id
+    CREATE (nodeA)-[relationship:{relationship_type}]->(nodeB)
+    SET relationship += $attributes
+    SET relationship.created_by = $created_by
+    SET relationship.created_time = $created_time
+    RETURN ID(relationship) as id, TYPE(relationship) as type, PROPERTIES(relationship) as properties,
+           ID(nodeA) as source_id, ID(nodeB) as target_id, LABELS(nodeA) as source_labels,
+           LABELS(nodeB) as target_labels
+    """)
+
+READ_RELATIONSHIP = register('read_relationship', """
+    MATCH (nodeA)-[relationship]->(nodeB)
+    WHERE ID(relationship) = $rel_id
+    RETURN nodeA, ID(nodeA), LABELS(nodeA), relationship, ID(relationship), TYPE(relationship),
+           nodeB, ID(nodeB), LABELS(nodeB), PROPERTIES(relationship)
+    """)
+
+READ_RELATIONSHIP_FIELDS = register('read_relationship_fields', """
+    MATCH (nodeA)-[relationship]->(nodeB)
+    WHERE ID(relationship) = $rel_id
+    RETURN [key IN $fields | nodeA[key]] as nodeA, ID(nodeA), LABELS(nodeA), ID(relationship), TYPE(relationship),
+           [key IN $fields | nodeB[key]] as nodeB, ID(nodeB), LABELS(nodeB), PROPERTIES(relationship)
+    """)
+
+UPDATE_RELATIONSHIP = register('update_relationship', """
+    MATCH (nodeA)-[relationship]->(nodeB)
+    WHERE ID(relationship) = $rel_id
+    SET relationship += $attributes
+    RETURN nodeA, ID(nodeA), LABELS(nodeA), relationship, ID(relationship), TYPE(relationship),
+           nodeB, ID(nodeB), LABELS(nodeB), PROPERTIES(relationship)
+    """)
+
+DELETE_RELATIONSHIP = register('delete_relationship', """
+    MATCH (a)-[relationship]->(b)
+    WHERE ID(relationship) = $rel_id
+    DELETE relationship
+    """)
+
+DELETE_RELATIONSHIP_RETURNING = register('delete_relationship_returning', """
+    MATCH (a)-[relationship]->(b)
+    WHERE ID(relationship) = $rel_id
+    WITH relationship, ID(relationship) as id, TYPE(relationship) as type, ID(a) as source_id, ID(b) as target_id
+    DELETE relationship
+    RETURN id, type, source_id, target_id
+    """)
+
+# Export, streamed without ordering so that the server does not sort the whole label or type
+EXPORT_NODES = register('export_nodes', """
+    MATCH (node:{label})
+    RETURN ID(node) as id, LABELS(node) as labels, node
+    """)
+
+EXPORT_RELATIONSHIPS = register('export_relationships', """
+    MATCH (nodeA)-[relationship:{relationship_type}]->(nodeB)
+    RETURN ID(relationship) as id, ID(nodeA) as source_id, ID(nodeB) as target_id,
+           PROPERTIES(relationship) as properties
+    """)
+
+# Traversal
+# The neighbourhood is expanded one hop at a time from the nodes of the frontier, each following at most $fanout
+# of its relationships, so that a node with many relationships cannot blow up the expansion
+# Relationship types are a parameter, and a null list means no filter
+NEIGHBOURHOOD_HOP = register('neighbourhood_hop', """
+    UNWIND $frontier AS source_id
+    MATCH (source) WHERE ID(source) = source_id
+    CALL {{
+        WITH source
+        MATCH (source)-[relationship]-(node)
+        WHERE NOT node:User
+          AND ($relationship_types IS NULL OR type(relationship) IN $relationship_types)
+        RETURN node
+        LIMIT $fanout
+    }}
+    WITH DISTINCT node
+    RETURN ID(node) as id, LABELS(node) as labels, node
+    """)
+
+# Variable length bounds cannot be parameters, so the maximum depth is rendered into the text
+SHORTEST_PATH = register('shortest_path', """
+    MATCH (source) WHERE ID(source) = $source_id
+    MATCH (target) WHERE ID(target) = $target_id
+    MATCH path = shortestPath((source)-[*..{max_depth}]-(target))
+    WHERE none(node IN nodes(path) WHERE node:User)
+      AND ($relationship_types IS NULL OR all(rel IN relationships(path) WHERE type(rel) IN $relationship_types))
+    UNWIND range(0, length(path)) AS position
+    WITH path, position, nodes(path)[position] AS node, relationships(path)[position] AS next_relationship
+    RETURN position, ID(node) as id, LABELS(node) as labels, node,
+           CASE WHEN next_relationship IS NULL THEN null
+                ELSE {{relationship_id: ID(next_relationship),
+                       relationship_type: TYPE(next_relationship),
+                       source_node_id: ID(startNode(next_relationship)),
+                       target_node_id: ID(endNode(next_relationship)),
+                       properties: PROPERTIES(next_relationship)}} END as next_relationship
+    ORDER BY position
+    """)
+
+# Adjacency snapshot
+ADJACENCY_NODES = register('adjacency_nodes', """
+    MATCH (node) WHERE any(label IN labels(node) WHERE label IN $labels)
+    RETURN ID(node) as id
+    """)
+
+ADJACENCY_RELATIONSHIPS = register('adjacency_relationships', """
+    MATCH (source)-[relationship]->(target)
+    WHERE type(relationship) IN $relationship_types
+      AND any(label IN labels(source) WHERE label IN $labels)
+      AND any(label IN labels(target) WHERE label IN $labels)
+    RETURN ID(relationship) as id, ID(source) as source, ID(target) as target, TYPE(relationship) as type
+    """)
+
+# Schema
+SHOW_INDEXES = register('show_indexes', """
+    SHOW INDEXES YIELD name, type, entityType, labelsOrTypes, properties, state, populationPercent
+    """)
+
+SHOW_CONSTRAINTS = register('show_constraints', """
+    SHOW CONSTRAINTS YIELD name, type, entityType, labelsOrTypes, properties
+    """)
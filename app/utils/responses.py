@@ -0,0 +1,18 @@
+# Import required base modules
+from typing import Any
+
+import orjson
+
+# Import modules from FastAPI
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response serialised with orjson, for content built directly from trusted driver output.
+
+    Values orjson does not know, such as Neo4j temporal and spatial types, are serialised as strings.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Union
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -23,8 +23,57 @@ class Node(NodeBase):
     properties: Optional[dict] = None
 
 
+# Query plan response models, from PROFILE or EXPLAIN
+class PlanOperator(BaseModel):
+    operator: str
+    details: Optional[str] = None
+    identifiers: List[str] = []
+    rows: Optional[int] = None
+    db_hits: Optional[int] = None
+    estimated_rows: Optional[float] = None
+    page_cache_hits: Optional[int] = None
+    page_cache_misses: Optional[int] = None
+    children: List['PlanOperator'] = []
+
+
+PlanOperator.update_forward_refs()
+
+
+class PlanSummary(BaseModel):
+    operators: int
+    db_hits: Optional[int] = None
+    rows: Optional[int] = None
+    estimated_rows: Optional[float] = None
+    hottest_operator: Optional[str] = None
+
+
+class ProfiledNode(Node):
+    plan: PlanOperator
+
+
 class Nodes(BaseModel):
     nodes: List[Node]
+    next_cursor: Optional[str] = None
+    plan: Optional[PlanOperator] = None
+
+
+# Batch request and response models
+class NodeIn(BaseModel):
+    label: str
+    properties: dict = {}
+
+
+# Error for a chunk of a batch, with the node label or relationship pattern of the chunk as group
+class ChunkError(BaseModel):
+    group: str
+    chunk: int
+    positions: List[int]
+    detail: str
+
+
+class BatchNodes(BaseModel):
+    node_ids: List[Optional[int]]
+    errors: List[ChunkError] = []
 
 
 # User response models
@@ -46,8 +95,171 @@ class Relationship(BaseModel):
     source_node: Node
     target_node: Node
     properties: Optional[dict] = None
+    plan: Optional[PlanOperator] = None
+
+
+# Batch relationship request and response models
+class RelationshipIn(BaseModel):
+    source_label: str
+    source_property: str
+    source_value: Any
+    target_label: str
+    target_property: str
+    target_value: Any
+    relationship_type: str
+    properties: dict = {}
+
+
+class BatchRelationships(BaseModel):
+    created: int
+    unmatched: int
+    unmatched_positions: List[int] = []
+    errors: List[ChunkError] = []
+
+
+# Operation of a /graph/batch request, node and relationship IDs may be "$<position>" to reference the node or
+# relationship created by an earlier operation of the same batch
+class BatchOperation(BaseModel):
+    operation: str
+    label: Optional[str] = None
+    node_id: Optional[Union[int, str]] = None
+    relationship_id: Optional[Union[int, str]] = None
+    source_node_id: Optional[Union[int, str]] = None
+    target_node_id: Optional[Union[int, str]] = None
+    relationship_type: Optional[str] = None
+    properties: dict = {}
+
+
+class OperationResult(BaseModel):
+    operation: str
+    node_id: Optional[int] = None
+    labels: Optional[list] = None
+    relationship_id: Optional[int] = None
+    relationship_type: Optional[str] = None
+    source_node_id: Optional[int] = None
+    target_node_id: Optional[int] = None
+    properties: Optional[dict] = None
+
+
+class BatchResults(BaseModel):
+    results: List[OperationResult]
+
+
+# Progress of a bulk import, offset is the number of rows committed and where a new upload resumes
+# Every unmatched relationship row is counted, and the positions of the first of them are kept
+class ImportProgress(BaseModel):
+    import_id: str
+    kind: str
+    status: str
+    offset: int
+    rows_read: int = 0
+    created: int = 0
+    unmatched: int = 0
+    unmatched_positions: List[int] = []
+    error: Optional[str] = None
 
 
 # Query response model
 class Query(BaseModel):
     response: list
+    plan: Optional[PlanOperator] = None
+
+
+# Structured refusal of a /q statement by admission control, or of one the server terminated after its timeout
+class Rejection(BaseModel):
+    reason: str
+    detail: str
+    estimated_rows: Optional[int] = None
+    budget: Optional[int] = None
+    limit: Optional[float] = None
+
+
+# Database schema response models
+class IndexState(BaseModel):
+    name: str
+    type: str
+    entity_type: Optional[str] = None
+    labels_or_types: Optional[List[str]] = None
+    properties: Optional[List[str]] = None
+    state: Optional[str] = None
+    population_percent: Optional[float] = None
+
+
+class SchemaReport(BaseModel):
+    indexes: List[IndexState]
+    constraints: List[IndexState]
+    missing: List[str] = []
+
+
+# Query template statistics response models
+class TemplateStatistics(BaseModel):
+    calls: int
+    errors: int
+    distinct_statements: int
+    repeated_statement_ratio: float
+    mean_ms: float
+    max_ms: float
+
+
+class QueryStatistics(BaseModel):
+    templates: Dict[str, TemplateStatistics]
+
+
+# Cache statistics response models
+class CacheStatistics(BaseModel):
+    size: Optional[int] = None
+    maxsize: Optional[int] = None
+    hits: int
+    misses: int
+    evictions: Optional[int] = None
+    bytes: Optional[int] = None
+    maxbytes: Optional[int] = None
+    hit_ratio: float
+
+
+class CachesStatistics(BaseModel):
+    caches: Dict[str, CacheStatistics]
+
+
+# Adjacency snapshot response models
+class Degree(BaseModel):
+    node_id: int
+    degree: int
+    snapshot_age_seconds: float
+
+
+class Neighbours(BaseModel):
+    node_id: int
+    neighbours: List[int]
+    snapshot_age_seconds: float
+
+
+class AdjacencyStatistics(BaseModel):
+    enabled: bool
+    labels: List[str]
+    relationship_types: List[str]
+    nodes: int
+    relationships: int
+    pending_changes: int
+    array_bytes: int
+    overlay_bytes: int
+    age_seconds: Optional[float] = None
+    max_staleness_seconds: float
+    builds: int
+    build_ms: float
+
+
+# Slow query log response models
+class SlowQuery(BaseModel):
+    template: str
+    access_mode: str
+    parameters: dict
+    seconds: float
+    failed: bool
+    time: datetime
+    plan_summary: Optional[PlanSummary] = None
+
+
+class SlowQueries(BaseModel):
+    threshold_seconds: float
+    queries: List[SlowQuery]
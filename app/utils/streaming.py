@@ -0,0 +1,53 @@
+# Import required base modules
+import csv
+import io
+import json
+
+# Import modules from FastAPI
+from fastapi.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+CSV_MEDIA_TYPE = 'text/csv'
+
+
+# Serialise each record as one line of JSON, starting with the record already fetched
+async def ndjson_lines(first_record, records, transform):
+    yield json.dumps(transform(first_record), default=str) + '\n'
+    async for record in records:
+        yield json.dumps(transform(record), default=str) + '\n'
+
+
+# Stream records from an async generator as newline delimited JSON, optionally transforming each record
+async def ndjson_response(records, transform=lambda record: record):
+    # Fetch the first record before responding, so that errors in the statement are raised as usual
+    try:
+        first_record = await records.__anext__()
+    except StopAsyncIteration:
+        return StreamingResponse(iter(()), media_type=NDJSON_MEDIA_TYPE)
+
+    return StreamingResponse(ndjson_lines(first_record, records, transform), media_type=NDJSON_MEDIA_TYPE)
+
+
+# Serialise the values of one CSV row
+def csv_row(values) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+# Serialise the header and each record as one CSV row, starting with the record already fetched
+async def csv_lines(header: list, first_record, records, row):
+    yield csv_row(header) + csv_row(row(first_record))
+    async for record in records:
+        yield csv_row(row(record))
+
+
+# Stream records from an async generator as CSV, with row turning each record into the values of the header
+async def csv_response(records, header: list, row):
+    # Fetch the first record before responding, so that errors in the statement are raised as usual
+    try:
+        first_record = await records.__anext__()
+    except StopAsyncIteration:
+        return StreamingResponse(iter((csv_row(header),)), media_type=CSV_MEDIA_TYPE)
+
+    return StreamingResponse(csv_lines(header, first_record, records, row), media_type=CSV_MEDIA_TYPE)
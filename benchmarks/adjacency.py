@@ -0,0 +1,105 @@
+"""
+Memory and lookup time of the adjacency snapshot, against a dictionary of dictionaries of the same graph.
+
+The snapshot is read from a fake driver returning a random graph, then degree and two hop neighbour
+lookups are timed from memory. The dictionary of dictionaries holds both directions, with the ID and
+type of each relationship, which is what the snapshot holds.
+
+    python -m benchmarks.adjacency --nodes 100000 --relationships 500000
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import tracemalloc
+
+os.environ.setdefault('NEO4J_URI', 'neo4j://localhost:7687')
+
+from app.utils import db  # noqa: E402
+from app.graph.adjacency import AdjacencySnapshot  # noqa: E402
+from benchmarks.fake_driver import FakeDriver  # noqa: E402
+
+TYPES = ['WORKS_FOR', 'KNOWS', 'FRIEND']
+
+
+class GraphDriver(FakeDriver):
+    """
+    Fake driver returning the nodes and relationships of a random graph to the snapshot queries.
+    """
+
+    def __init__(self, nodes: int, relationships: int, seed: int = 0):
+        super().__init__()
+        generator = random.Random(seed)
+        self.nodes = [{'id': node_id} for node_id in range(nodes)]
+        self.relationships = [{'id': relationship_id,
+                               'source': generator.randrange(nodes),
+                               'target': generator.randrange(nodes),
+                               'type': generator.choice(TYPES)} for relationship_id in range(relationships)]
+
+    # Other statements, such as the EXPLAIN of a statement logged as slow, are plain text and return nothing
+    def records(self, query: str, parameters: dict):
+        template = getattr(query, 'template', None)
+        if template == 'adjacency_nodes':
+            return self.nodes
+        if template == 'adjacency_relationships':
+            return self.relationships
+        return []
+
+
+def dict_of_dicts(relationships):
+    adjacency = {}
+    for relationship in relationships:
+        value = {'id': relationship['id'], 'type': relationship['type']}
+        adjacency.setdefault(relationship['source'], {}).setdefault('out', {})[relationship['target']] = value
+        adjacency.setdefault(relationship['target'], {}).setdefault('in', {})[relationship['source']] = value
+    return adjacency
+
+
+def traced(build):
+    tracemalloc.start()
+    try:
+        result = build()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+def per_lookup(lookup, node_ids):
+    start = time.perf_counter()
+    for node_id in node_ids:
+        lookup(node_id)
+    return (time.perf_counter() - start) / len(node_ids)
+
+
+async def main(nodes: int, relationships: int, lookups: int):
+    driver = db.neo4j_driver = GraphDriver(nodes, relationships)
+    snapshot = AdjacencySnapshot(labels=['Person'], relationship_types=TYPES, max_staleness=3600)
+
+    start = time.perf_counter()
+    await snapshot.current()
+    build = time.perf_counter() - start
+    arrays, _ = snapshot.memory()
+
+    _, dict_size = traced(lambda: dict_of_dicts(driver.relationships))
+
+    sample = random.Random(1).sample(range(nodes), min(lookups, nodes))
+    degree = per_lookup(snapshot.degree, sample)
+    neighbours = per_lookup(lambda node_id: snapshot.neighbours(node_id, depth=2, limit=1000), sample)
+
+    print(f'{nodes} nodes, {relationships} relationships, snapshot read in {build * 1000:.0f} ms')
+    print(f'{"snapshot arrays":>20} {arrays / 2 ** 20:>10.1f} MiB {arrays / relationships:>8.1f} bytes/relationship')
+    print(f'{"dict of dicts":>20} {dict_size / 2 ** 20:>10.1f} MiB {dict_size / relationships:>8.1f} bytes/relationship')
+    print(f'{"degree":>20} {degree * 1e6:>10.1f} us per lookup')
+    print(f'{"2 hop neighbours":>20} {neighbours * 1e6:>10.1f} us per lookup')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nodes', type=int, default=100_000)
+    parser.add_argument('--relationships', type=int, default=500_000)
+    parser.add_argument('--lookups', type=int, default=1000)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.nodes, args.relationships, args.lookups))
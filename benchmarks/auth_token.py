@@ -0,0 +1,73 @@
+"""
+Throughput of /auth/token against the number of password hashing workers.
+
+bcrypt runs on the hashing pool rather than the event loop, so login throughput should grow with the
+number of workers up to the number of cores.
+
+    python -m benchmarks.auth_token --requests 64 --kind thread
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault('NEO4J_URI', 'neo4j://localhost:7687')
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.utils import db  # noqa: E402
+from app.authorisation.hashing import hashing_pool, hash_password  # noqa: E402
+from benchmarks.fake_driver import FakeDriver, default_record  # noqa: E402
+
+PASSWORD = 'benchmark-password'
+
+
+async def run_level(client, total: int, concurrency: int):
+    form = {'username': 'benchmark', 'password': PASSWORD}
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            response = await client.post('/auth/token', data=form)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - start)
+
+
+async def main(kind: str, total: int, worker_counts):
+    password_hash = hash_password(PASSWORD)
+
+    def record_factory(index):
+        record = default_record(index)
+        record['a'] = record['user'] = dict(record['user'], hashed_password=password_hash)
+        return record
+
+    db.neo4j_driver = FakeDriver(record_factory=record_factory)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as client:
+        print(f'/auth/token with a {kind} pool on {os.cpu_count()} cores, {total} logins per level')
+        print(f'{"workers":>10} {"logins/s":>10} {"mean wait ms":>14}')
+        for workers in worker_counts:
+            hashing_pool.configure(kind=kind, workers=workers)
+            hashing_pool.completed = 0
+            hashing_pool.total_wait = 0.0
+            throughput = await run_level(client, total, concurrency=workers * 4)
+            mean_wait = hashing_pool.stats()['mean_wait']
+            print(f'{workers:>10} {throughput:>10.1f} {mean_wait * 1000:>14.1f}')
+    hashing_pool.shutdown()
+
+
+if __name__ == '__main__':
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--kind', choices=['thread', 'process'], default='thread')
+    parser.add_argument('--requests', type=int, default=64, help='logins per worker count')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1))))
+    args = parser.parse_args()
+
+    asyncio.run(main(args.kind, args.requests, args.workers))
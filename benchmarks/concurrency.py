@@ -0,0 +1,71 @@
+"""
+Throughput of the graph endpoints against the number of requests in flight.
+
+Each statement sleeps on the event loop for the configured latency, in the same way as a Bolt round trip
+on the async driver, so throughput should scale close to linearly with concurrency until the worker is
+CPU bound. The graph and query caches are disabled, so that every request reaches the driver.
+
+    python -m benchmarks.concurrency --latency 0.02 --requests 400
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault('NEO4J_URI', 'neo4j://localhost:7687')
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.utils import db  # noqa: E402
+from app.authorisation.auth import create_access_token  # noqa: E402
+from app.graph.cache import graph_cache  # noqa: E402
+from app.query.cache import query_cache  # noqa: E402
+from benchmarks.fake_driver import FakeDriver  # noqa: E402
+
+
+async def run_level(client, path: str, headers: dict, concurrency: int, total: int):
+    latencies = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return total / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1]
+
+
+async def main(latency: float, total: int, levels, path: str):
+    db.neo4j_driver = FakeDriver(latency=latency)
+
+    # Cached responses would not reach the driver, and would measure the cache rather than the statements
+    graph_cache.store.cache.maxsize = 0
+    query_cache.results.maxbytes = 0
+    headers = {'Authorization': f'Bearer {create_access_token({"sub": "benchmark"})}'}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as client:
+        print(f'{path} with {latency * 1000:.0f} ms per statement, {total} requests per level')
+        print(f'{"in flight":>10} {"req/s":>10} {"p50 ms":>10} {"p99 ms":>10}')
+        for concurrency in levels:
+            throughput, p50, p99 = await run_level(client, path, headers, concurrency, total)
+            print(f'{concurrency:>10} {throughput:>10.1f} {p50 * 1000:>10.1f} {p99 * 1000:>10.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per Cypher statement')
+    parser.add_argument('--requests', type=int, default=400, help='requests per concurrency level')
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--path', default='/graph/read/1')
+    args = parser.parse_args()
+
+    asyncio.run(main(args.latency, args.requests, args.levels, args.path))
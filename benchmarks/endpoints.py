@@ -0,0 +1,261 @@
+"""
+Throughput, latency and allocations of every endpoint, against a fake driver.
+
+Each endpoint of the routers included in app.main is driven through an in-process ASGI client at each
+concurrency level, with every Cypher statement waiting for the configured latency and returning the
+configured number of records. Endpoints that hash passwords run fewer requests, as bcrypt dominates them.
+Allocations are the peak memory traced by tracemalloc while serving one request, on a separate pass.
+
+    python -m benchmarks.endpoints --latency 0.005 --result-size 10 --levels 1 8 32
+    python -m benchmarks.endpoints --only /graph --cold-cache
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import tracemalloc
+from typing import NamedTuple, Optional
+
+os.environ.setdefault('NEO4J_URI', 'neo4j://localhost:7687')
+
+import httpx  # noqa: E402
+from fastapi.routing import APIRoute  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.utils import db  # noqa: E402
+from app.utils.environment import Config  # noqa: E402
+from app.authorisation.auth import create_access_token, user_cache  # noqa: E402
+from app.authorisation.hashing import hash_password  # noqa: E402
+from app.graph.cache import graph_cache  # noqa: E402
+from app.graph.adjacency import adjacency_snapshot  # noqa: E402
+from app.query.cache import query_cache  # noqa: E402
+from benchmarks.fake_driver import FakeDriver, default_record  # noqa: E402
+
+PASSWORD = 'benchmark-password'
+
+# Usernames with this prefix are not found by the fake driver, so that users can be created
+NEW_USER = 'new-benchmark-user'
+
+
+class Case(NamedTuple):
+    method: str
+    route: str
+    url: str
+    params: Optional[dict] = None
+    json: object = None
+    data: Optional[dict] = None
+    content: Optional[str] = None
+    authenticated: bool = True
+    hashes: bool = False
+
+
+def batch_nodes(size: int):
+    return [{'label': 'Person', 'properties': {'name': f'person-{i}'}} for i in range(size)]
+
+
+def batch_relationships(size: int):
+    return [{'source_label': 'Person', 'source_property': 'name', 'source_value': f'person-{i}',
+             'target_label': 'Company', 'target_property': 'name', 'target_value': 'company',
+             'relationship_type': 'WORKS_FOR', 'properties': {'since': '2020'}} for i in range(size)]
+
+
+# Upload of batch_size lines of JSON
+def jsonl(rows: list):
+    return ''.join(json.dumps(row) + '\n' for row in rows)
+
+
+# One request for each endpoint, keyed by the route it exercises
+def cases(batch_size: int):
+    relationship = {'source_node_label': 'Person', 'source_node_property': 'name',
+                    'source_node_property_value': 'person-0', 'target_node_label': 'Company',
+                    'target_node_property': 'name', 'target_node_property_value': 'company',
+                    'relationship_type': 'WORKS_FOR'}
+    return [
+        Case('POST', '/auth/token', '/auth/token',
+             data={'username': 'benchmark', 'password': PASSWORD}, authenticated=False, hashes=True),
+        Case('POST', '/auth/launch_user', '/auth/launch_user',
+             params={'username': NEW_USER, 'password': PASSWORD, 'application_password': Config.APP_PASSWORD},
+             authenticated=False, hashes=True),
+        Case('GET', '/users/me', '/users/me'),
+        Case('GET', '/users/{username}', '/users/benchmark'),
+        Case('POST', '/users/create', '/users/create',
+             params={'username': NEW_USER, 'password': PASSWORD}, hashes=True),
+        Case('PUT', '/users/{username}/update', '/users/someone/update', json={'full_name': 'Someone'}),
+        Case('DELETE', '/users/{username}/delete', '/users/someone/delete'),
+        Case('PUT', '/users/me/reset_password', '/users/me/reset_password',
+             params={'new_password': PASSWORD}, hashes=True),
+        Case('POST', '/graph/create_node', '/graph/create_node',
+             params={'label': 'Person'}, json={'name': 'person'}),
+        Case('POST', '/graph/create_nodes', '/graph/create_nodes', json=batch_nodes(batch_size)),
+        Case('GET', '/graph/read/{node_id}', '/graph/read/1'),
+        Case('GET', '/graph/read/{node_id}', '/graph/read/1?profile=true'),
+        # Projected reads are not cached, so they reach the driver with warm caches too
+        Case('GET', '/graph/read/{node_id}', '/graph/read/4?fields=name'),
+        Case('GET', '/graph/read_node_collection', '/graph/read_node_collection',
+             params={'search_node_property': 'name', 'node_property_value': 'person', 'label': 'Person'}),
+        Case('GET', '/graph/read_node_collection', '/graph/read_node_collection?fields=name',
+             params={'search_node_property': 'name', 'node_property_value': 'person', 'label': 'Person'}),
+        Case('PUT', '/graph/update/{node_id}', '/graph/update/2', json={'age': 30}),
+        Case('POST', '/graph/delete/{node_id}', '/graph/delete/3'),
+        Case('POST', '/graph/create_relationship', '/graph/create_relationship',
+             params=relationship, json={'since': '2020'}),
+        Case('POST', '/graph/create_relationships', '/graph/create_relationships',
+             json=batch_relationships(batch_size)),
+        Case('GET', '/graph/read_relationship/{relationship_id}', '/graph/read_relationship/1'),
+        Case('GET', '/graph/read_relationship/{relationship_id}', '/graph/read_relationship/4?node_properties=false'),
+        Case('PUT', '/graph/update_relationship/{relationship_id}', '/graph/update_relationship/2',
+             json={'since': '2021'}),
+        Case('POST', '/graph/delete_relationship/{relationship_id}', '/graph/delete_relationship/3'),
+        Case('POST', '/graph/batch', '/graph/batch', json=[
+            {'operation': 'create_node', 'label': 'Person', 'properties': {'name': 'person'}},
+            {'operation': 'update_node', 'node_id': 2, 'properties': {'age': 30}},
+            {'operation': 'create_relationship', 'source_node_id': '$0', 'target_node_id': 2,
+             'relationship_type': 'KNOWS'},
+            {'operation': 'delete_relationship', 'relationship_id': 3}]),
+        Case('GET', '/graph/neighbourhood/{node_id}', '/graph/neighbourhood/1', params={'depth': 2}),
+        Case('GET', '/graph/shortest_path/{source_node_id}/{target_node_id}', '/graph/shortest_path/1/2'),
+        Case('GET', '/graph/adjacency/{node_id}/degree', '/graph/adjacency/1/degree'),
+        Case('GET', '/graph/adjacency/{node_id}/neighbours', '/graph/adjacency/1/neighbours', params={'depth': 2}),
+        Case('POST', '/graph/import/nodes', '/graph/import/nodes', params={'import_id': 'benchmark'},
+             content=jsonl(batch_nodes(batch_size))),
+        # Read before the relationship imports, whose progress would push it out of the imports kept
+        Case('GET', '/graph/imports/{import_id}', '/graph/imports/benchmark'),
+        Case('POST', '/graph/import/relationships', '/graph/import/relationships',
+             content=jsonl(batch_relationships(batch_size))),
+        Case('GET', '/graph/export/nodes', '/graph/export/nodes', params={'label': 'Person'}),
+        Case('GET', '/graph/export/relationships', '/graph/export/relationships',
+             params={'relationship_type': 'KNOWS', 'format': 'csv', 'columns': 'since'}),
+        Case('GET', '/q', '/q', params={'cypher_string': 'MATCH (node) RETURN node'}),
+        Case('GET', '/q', '/q?stream=true', params={'cypher_string': 'MATCH (node) RETURN node'}),
+        Case('GET', '/admin/schema', '/admin/schema'),
+        Case('GET', '/admin/queries', '/admin/queries'),
+        Case('GET', '/admin/caches', '/admin/caches'),
+        Case('GET', '/admin/adjacency', '/admin/adjacency'),
+        Case('GET', '/admin/slow_queries', '/admin/slow_queries'),
+        Case('GET', '/metrics', '/metrics'),
+    ]
+
+
+# Routes of app.main that no case exercises
+def uncovered_routes(selected):
+    covered = {(case.method, case.route) for case in selected}
+    return sorted((method, route.path) for route in app.routes if isinstance(route, APIRoute)
+                  for method in route.methods if (method, route.path) not in covered)
+
+
+async def send(client, case: Case, headers: dict):
+    response = await client.request(case.method, case.url, params=case.params, json=case.json, data=case.data,
+                                    content=case.content, headers=headers if case.authenticated else None)
+    # The body of a streamed response is read in full, so the time covers the whole stream
+    await response.aread()
+    return response.status_code < 400
+
+
+async def run_level(client, case: Case, headers: dict, concurrency: int, total: int):
+    latencies = []
+    failures = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal failures
+        for _ in remaining:
+            start = time.perf_counter()
+            succeeded = await send(client, case, headers)
+            latencies.append(time.perf_counter() - start)
+            failures += not succeeded
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    return total / elapsed, latencies[len(latencies) // 2], p99, failures
+
+
+# Mean peak of memory allocated while serving one request, in bytes
+async def allocations(client, case: Case, headers: dict, samples: int):
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            await send(client, case, headers)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - baseline)
+    finally:
+        tracemalloc.stop()
+    return sum(peaks) / len(peaks)
+
+
+async def main(latency: float, result_size: int, total: int, levels, only: Optional[str],
+               batch_size: int, samples: int, cold_cache: bool):
+    password_hash = hash_password(PASSWORD)
+
+    def record_factory(index):
+        record = default_record(index)
+        record['a'] = record['user'] = dict(record['user'], hashed_password=password_hash)
+        return record
+
+    def missing(query, parameters):
+        return getattr(query, 'template', None) == 'read_user' and parameters['username'].startswith(NEW_USER)
+
+    # The adjacency snapshot is read from a chain of result_size nodes, which is also what is exported
+    responses = {
+        'adjacency_nodes': [{'id': node_id} for node_id in range(result_size + 1)],
+        'adjacency_relationships': [{'id': node_id, 'source': node_id, 'target': node_id + 1, 'type': 'KNOWS'}
+                                    for node_id in range(result_size)],
+        'create_relationship_by_id': [{'id': 0, 'type': 'KNOWS', 'properties': {}, 'source_id': 0, 'target_id': 1,
+                                       'source_labels': ['Person'], 'target_labels': ['Person']}],
+        'export_relationships': [{'id': node_id, 'source_id': node_id, 'target_id': node_id + 1,
+                                  'properties': {'since': '2020'}} for node_id in range(result_size)],
+    }
+    adjacency_snapshot.labels = adjacency_snapshot.labels or ['Person']
+
+    db.neo4j_driver = FakeDriver(latency=latency, result_size=result_size,
+                                 record_factory=record_factory, missing=missing, responses=responses)
+    Config.APP_PASSWORD = Config.APP_PASSWORD or 'benchmark-application-password'
+
+    # Without the caches, every request reaches the driver
+    if cold_cache:
+        user_cache.maxsize = 0
+        graph_cache.store.cache.maxsize = 0
+        query_cache.results.maxbytes = 0
+
+    selected = [case for case in cases(batch_size) if only is None or case.url.startswith(only)]
+    if only is None:
+        for method, path in uncovered_routes(selected):
+            print(f'warning: {method} {path} is not benchmarked')
+
+    headers = {'Authorization': f'Bearer {create_access_token({"sub": "benchmark"})}'}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as client:
+        print(f'{latency * 1000:.1f} ms and {result_size} records per statement, {total} requests per level, '
+              f'{"cold" if cold_cache else "warm"} caches')
+        print(f'{"endpoint":<48} {"in flight":>9} {"req/s":>9} {"p50 ms":>9} {"p99 ms":>9} {"errors":>7} '
+              f'{"KiB/req":>9}')
+        for case in selected:
+            requests = max(total // 20, 4) if case.hashes else total
+            allocated = await allocations(client, case, headers, samples)
+            for concurrency in levels:
+                throughput, p50, p99, failures = await run_level(client, case, headers, concurrency, requests)
+                print(f'{case.method + " " + case.url:<48} {concurrency:>9} {throughput:>9.1f} '
+                      f'{p50 * 1000:>9.2f} {p99 * 1000:>9.2f} {failures:>7} {allocated / 1024:>9.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.005, help='seconds per Cypher statement')
+    parser.add_argument('--result-size', type=int, default=10, help='records returned by each statement')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint and concurrency level')
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--only', help='only benchmark endpoints whose URL starts with this prefix')
+    parser.add_argument('--batch-size', type=int, default=100, help='items sent to the batch endpoints')
+    parser.add_argument('--samples', type=int, default=20, help='requests traced for allocations')
+    parser.add_argument('--cold-cache', action='store_true', help='disable the user, graph and query caches')
+    args = parser.parse_args()
+
+    asyncio.run(main(args.latency, args.result_size, args.requests, args.levels, args.only,
+                     args.batch_size, args.samples, args.cold_cache))
@@ -0,0 +1,152 @@
+# In-process stand-in for the Neo4j async driver, so the request path can be benchmarked offline
+from types import SimpleNamespace
+import asyncio
+import re
+
+# Clauses that make the server report a statement as writing
+WRITE_CLAUSES = re.compile(r'\b(CREATE|MERGE|SET|DELETE|REMOVE)\b', re.IGNORECASE)
+
+
+# Record returned for every statement, with the keys read by each of the endpoints
+def default_record(index: int = 0):
+    node = {'name': f'node-{index}', 'created_by': 'benchmark', 'created_time': '2023-02-12 00:00:00+00:00'}
+    user = {'username': 'benchmark', 'full_name': 'Benchmark User', 'disabled': False,
+            'joined': '2023-02-12 00:00:00+00:00', 'hashed_password': ''}
+    return {
+        'a': user, 'user': user,
+        'id': index, 'labels': ['Person'], 'node': node, 'new_node': node,
+        'nodeA': node, 'nodeB': node, 'ID(nodeA)': index, 'ID(nodeB)': index + 1,
+        'LABELS(nodeA)': ['Person'], 'LABELS(nodeB)': ['Company'],
+        'relationship': {}, 'ID(relationship)': index, 'TYPE(relationship)': 'WORKS_FOR',
+        'PROPERTIES(relationship)': {'since': '2020'},
+        'position': index, 'next_relationship': None, 'created': 1, 'source_id': index, 'target_id': index + 1,
+        'name': f'index-{index}', 'type': 'RANGE', 'entityType': 'NODE', 'labelsOrTypes': ['Person'],
+        'properties': ['name'], 'state': 'ONLINE', 'populationPercent': 100.0,
+    }
+
+
+# Plan returned in the summary of every statement, as the server reports it for PROFILE
+def fake_plan(rows: int):
+    scan = {'operatorType': 'NodeByLabelScan', 'args': {'Details': 'node:Person', 'EstimatedRows': float(rows)},
+            'identifiers': ['node'], 'rows': rows, 'dbHits': rows + 1, 'children': []}
+    return {'operatorType': 'ProduceResults', 'args': {'Details': 'node', 'EstimatedRows': float(rows)},
+            'identifiers': ['node'], 'rows': rows, 'dbHits': 0, 'children': [scan]}
+
+
+class FakeRecord(dict):
+    def data(self):
+        return dict(self)
+
+
+class FakeResult:
+    def __init__(self, records, query_type: str = 'r'):
+        self._records = records
+        self._query_type = query_type
+
+    async def data(self):
+        return [dict(record) for record in self._records]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for record in self._records:
+            yield FakeRecord(record)
+
+    async def consume(self):
+        plan = fake_plan(len(self._records))
+        return SimpleNamespace(profile=plan, plan=plan, query_type=self._query_type)
+
+
+class FakeTransaction:
+    def __init__(self, driver):
+        self._driver = driver
+
+    async def run(self, query, parameters=None, **kwargs):
+        self._driver.queries += 1
+        if self._driver.latency:
+            await asyncio.sleep(self._driver.latency)
+        # Statements with a timeout are passed as a neo4j.Query, which carries the text
+        query = getattr(query, 'text', query)
+        query_type = 'rw' if WRITE_CLAUSES.search(query) else 'r'
+        return FakeResult(self._driver.records(query, parameters or {}), query_type)
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self._driver = driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def execute_read(self, transaction_function, *args, **kwargs):
+        return await transaction_function(FakeTransaction(self._driver), *args, **kwargs)
+
+    async def execute_write(self, transaction_function, *args, **kwargs):
+        return await transaction_function(FakeTransaction(self._driver), *args, **kwargs)
+
+    async def run(self, query, parameters=None, **kwargs):
+        return await FakeTransaction(self._driver).run(query, parameters, **kwargs)
+
+    async def close(self):
+        pass
+
+
+class FakeDriver:
+    """
+    Async driver returning canned records.
+
+    :param latency: seconds each statement waits before returning, simulating the database round trip
+    :param result_size: number of records returned by each statement
+    :param record_factory: callable building the record for a given row index
+    :param missing: callable taking the statement and its parameters, true when the statement should match nothing
+    :param responses: records returned instead for statements rendered from the named query templates
+
+    Statements without a RETURN clause, such as deletes and schema changes, return no records, and UNWIND
+    batches return one record for each of their rows, with the position of the row. Lookups of a list of
+    ids return one record for each ID, and projections of a list of fields the values of those fields.
+    """
+
+    def __init__(self, latency: float = 0.0, result_size: int = 1, record_factory=default_record, missing=None,
+                 responses=None):
+        self.latency = latency
+        self.result_size = result_size
+        self.record_factory = record_factory
+        self.missing = missing
+        self.responses = responses or {}
+        self.queries = 0
+        self._records = [record_factory(i) for i in range(result_size)]
+
+    def records(self, query: str, parameters: dict):
+        if self.missing is not None and self.missing(query, parameters):
+            return []
+        template = getattr(query, 'template', None)
+        if template in self.responses:
+            return self.responses[template]
+        text = query.upper()
+        if 'RETURN' not in text and not text.lstrip().startswith('SHOW'):
+            return []
+
+        # Projections return the values of the fields in place of each node
+        fields = parameters.get('fields')
+        if fields is not None:
+            return [dict(record, **{key: [record[key].get(field) for field in fields]
+                                    for key in ('node', 'nodeA', 'nodeB')}) for record in self._records]
+
+        ids = parameters.get('ids')
+        if ids is not None:
+            return [dict(self.record_factory(index), id=node_id) for index, node_id in enumerate(ids)]
+
+        rows = parameters.get('rows')
+        if rows is not None:
+            return [dict(self.record_factory(index), position=row['position']) for index, row in enumerate(rows)]
+        return self._records
+
+    def session(self, **kwargs):
+        return FakeSession(self)
+
+    async def close(self):
+        pass
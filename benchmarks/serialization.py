@@ -0,0 +1,89 @@
+"""
+Standard and fast serialisation of large Nodes and Query responses.
+
+The standard path builds the pydantic models, which FastAPI validates again against the response model
+before serialising with the json module. The fast path (FAST_SERIALIZATION=true) builds plain dictionaries
+from the driver output and serialises them with orjson.
+
+    python -m benchmarks.serialization --nodes 10000 --repeat 5
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault('NEO4J_URI', 'neo4j://localhost:7687')
+
+from fastapi import Request  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.utils import db  # noqa: E402
+from app.utils.environment import Config  # noqa: E402
+from app.utils.schema import User  # noqa: E402
+from app.utils.deadlines import Deadline  # noqa: E402
+from app.graph.crud import read_nodes  # noqa: E402
+from app.query.cypher import cypher_query  # noqa: E402
+from benchmarks.fake_driver import FakeDriver  # noqa: E402
+
+
+# Request of a client that stays connected, for the endpoints that stop their work when the client disconnects
+def connected_request():
+    async def receive():
+        await asyncio.get_running_loop().create_future()
+    return Request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': [], 'query_string': b''}, receive)
+
+
+def response_field(path: str):
+    return next(route.response_field for route in app.routes if getattr(route, 'path', None) == path)
+
+
+# Run an endpoint and serialise its result the way FastAPI does, returning the body
+async def request_body(endpoint, field, **kwargs):
+    content = await endpoint(**kwargs)
+    if isinstance(content, JSONResponse):
+        return content.body
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+
+async def measure(endpoint, field, repeat: int, **kwargs):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = await request_body(endpoint, field, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(body)
+
+
+async def main(nodes: int, repeat: int):
+    db.neo4j_driver = FakeDriver(result_size=nodes)
+    user = User(username='benchmark')
+
+    cases = [
+        ('Nodes', read_nodes, response_field('/graph/read_node_collection'),
+         dict(request=connected_request(), search_node_property='name', node_property_value='x', label=None,
+              limit=nodes, cursor=None, profile=False, fields=None, current_user=user,
+              deadline=Deadline('/graph/read_node_collection'))),
+        ('Query', cypher_query, response_field('/q'),
+         dict(request=connected_request(), cypher_string='MATCH (node) RETURN node', stream=False,
+              fetch_size=Config.FETCH_SIZE, accept=None, current_user=user, deadline=Deadline('/q'))),
+    ]
+
+    print(f'{nodes} records, best of {repeat}')
+    print(f'{"response":>10} {"standard ms":>12} {"fast ms":>10} {"speedup":>8} {"bytes":>10}')
+    for name, endpoint, field, kwargs in cases:
+        Config.FAST_SERIALIZATION = False
+        standard, size = await measure(endpoint, field, repeat, **kwargs)
+        Config.FAST_SERIALIZATION = True
+        fast, _ = await measure(endpoint, field, repeat, **kwargs)
+        print(f'{name:>10} {standard * 1000:>12.1f} {fast * 1000:>10.1f} {standard / fast:>7.1f}x {size:>10}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nodes', type=int, default=10_000, help='records in each response')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.nodes, args.repeat))
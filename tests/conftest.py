@@ -0,0 +1,69 @@
+# Tests drive the API through an in-process ASGI client, with the Neo4j driver swapped for a fake one
+import os
+
+os.environ.setdefault('NEO4J_URI', 'neo4j://localhost:7687')
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.utils import db  # noqa: E402
+from app.authorisation.auth import create_access_token, user_cache  # noqa: E402
+from app.graph.cache import graph_cache  # noqa: E402
+from app.query.admission import admission  # noqa: E402
+from app.query.cache import query_cache  # noqa: E402
+from app.query.plans import estimates  # noqa: E402
+from benchmarks.fake_driver import FakeDriver  # noqa: E402
+
+
+class RecordingDriver(FakeDriver):
+    """
+    Fake driver keeping every statement it is sent, with its parameters.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.statements = []
+
+    def records(self, query: str, parameters: dict):
+        self.statements.append((query, parameters))
+        return super().records(query, parameters)
+
+    # Parameters of the statements rendered from a query template, in the order they were sent
+    def sent(self, template: str):
+        return [parameters for query, parameters in self.statements if getattr(query, 'template', None) == template]
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+# Caches and admission state are shared by the whole application, so each test starts from empty ones
+@pytest.fixture(autouse=True)
+def fresh_state():
+    user_cache.clear()
+    graph_cache.store.cache.clear()
+    query_cache.results.clear()
+    query_cache.generations.clear()
+    estimates.clear()
+    admission.running.clear()
+    admission._expensive = None
+    yield
+
+
+# Fake driver used by the application, with the options of the driver marker of the test
+@pytest.fixture
+def driver(request, monkeypatch):
+    marker = request.node.get_closest_marker('driver')
+    fake = RecordingDriver(**(marker.kwargs if marker else {}))
+    monkeypatch.setattr(db, 'neo4j_driver', fake)
+    return fake
+
+
+@pytest.fixture
+async def client(driver):
+    headers = {'Authorization': f'Bearer {create_access_token({"sub": "benchmark"})}'}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test',
+                                 headers=headers) as client:
+        yield client
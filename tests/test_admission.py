@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from neo4j.exceptions import ClientError, ServiceUnavailable
+
+from app.query.admission import Admission, admission
+
+pytestmark = pytest.mark.anyio
+
+
+def refusal(error: pytest.ExceptionInfo):
+    return error.value.status_code, error.value.detail['reason']
+
+
+async def test_statements_within_the_budget_are_admitted():
+    ticket = await Admission(row_budget=100).admit('alice', 100)
+    ticket.release()
+
+
+async def test_statements_over_the_budget_are_rejected():
+    with pytest.raises(HTTPException) as error:
+        await Admission(row_budget=100).admit('alice', 101)
+    assert refusal(error) == (422, 'budget')
+
+
+async def test_statements_without_an_estimate_are_refused_while_a_budget_is_set():
+    with pytest.raises(HTTPException) as error:
+        await Admission(row_budget=100).admit('alice', None)
+    assert refusal(error) == (503, 'estimate')
+
+
+async def test_statements_without_an_estimate_are_admitted_without_a_budget():
+    ticket = await Admission(row_budget=0).admit('alice', None)
+    ticket.release()
+
+
+async def test_users_run_at_most_user_concurrency_statements():
+    limited = Admission(row_budget=0, user_concurrency=1)
+    ticket = await limited.admit('alice')
+
+    with pytest.raises(HTTPException) as error:
+        await limited.admit('alice')
+    assert refusal(error) == (429, 'concurrency')
+
+    # Other users are not held up, and a released ticket frees its turn
+    (await limited.admit('bob')).release()
+    ticket.release()
+    (await limited.admit('alice')).release()
+
+
+async def test_tickets_are_released_once():
+    limited = Admission(row_budget=0, user_concurrency=2)
+    first = await limited.admit('alice')
+    second = await limited.admit('alice')
+    first.release()
+    first.release()
+    assert limited.running == {'alice': 1}
+    second.release()
+    assert limited.running == {}
+
+
+async def test_queued_statements_time_out_without_a_free_turn():
+    queued = Admission(row_budget=10, over_budget='queue', expensive_concurrency=1, queue_timeout=0.01)
+    ticket = await queued.admit('alice', 50)
+
+    with pytest.raises(HTTPException) as error:
+        await queued.admit('bob', 50)
+    assert refusal(error) == (429, 'queue_timeout')
+    assert 'bob' not in queued.running
+
+    ticket.release()
+    (await queued.admit('bob', 50)).release()
+
+
+async def test_queued_statements_run_once_a_turn_is_free():
+    queued = Admission(row_budget=10, over_budget='queue', expensive_concurrency=1, queue_timeout=1)
+    ticket = await queued.admit('alice', 50)
+    waiting = asyncio.ensure_future(queued.admit('bob', 50))
+    await asyncio.sleep(0)
+    assert not waiting.done()
+
+    ticket.release()
+    (await waiting).release()
+    assert queued.running == {}
+
+
+# EXPLAIN fails with these errors before the statement is run
+def failing_explain(driver, error):
+    records = driver.records
+
+    def explained(query, parameters):
+        if query.startswith('EXPLAIN'):
+            raise error
+        return records(query, parameters)
+    driver.records = explained
+
+
+async def test_query_is_refused_when_explain_fails_while_a_budget_is_set(client, driver, monkeypatch):
+    monkeypatch.setattr(admission, 'row_budget', 100)
+    failing_explain(driver, ServiceUnavailable('Connection lost'))
+
+    response = await client.get('/q', params={'cypher_string': 'MATCH (n:Person) RETURN n'})
+    assert response.status_code == 503
+    assert response.json()['detail']['reason'] == 'estimate'
+    assert admission.running == {}
+
+
+async def test_invalid_query_is_run_to_report_its_error(client, driver, monkeypatch):
+    monkeypatch.setattr(admission, 'row_budget', 100)
+    failing_explain(driver, ClientError.hydrate(code='Neo.ClientError.Statement.SyntaxError', message='Invalid'))
+
+    response = await client.get('/q', params={'cypher_string': 'MATCH (n:Person) RETURN n'})
+    assert response.status_code == 200
+    assert [query for query, _ in driver.statements][-1] == 'MATCH (n:Person) RETURN n'
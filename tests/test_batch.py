@@ -0,0 +1,68 @@
+import pytest
+from fastapi import HTTPException
+
+from app.graph.crud import validate_batch
+from app.utils.schema import BatchOperation
+from benchmarks.fake_driver import default_record
+
+pytestmark = pytest.mark.anyio
+
+
+def operations(*values):
+    return [BatchOperation(**value) for value in values]
+
+
+def test_references_to_earlier_creations_are_accepted():
+    validate_batch(operations(
+        {'operation': 'create_node', 'label': 'Person'},
+        {'operation': 'create_relationship', 'source_node_id': '$0', 'target_node_id': 7,
+         'relationship_type': 'KNOWS'},
+        {'operation': 'update_relationship', 'relationship_id': '$1', 'properties': {'since': 2020}}))
+
+
+@pytest.mark.parametrize('reference', ['$1', '$2', '$a', '$', '$-1', 'first'])
+def test_references_to_later_or_missing_operations_are_rejected(reference):
+    with pytest.raises(HTTPException) as error:
+        validate_batch(operations(
+            {'operation': 'create_node', 'label': 'Person'},
+            {'operation': 'update_node', 'node_id': reference, 'properties': {'name': 'Ada'}}))
+    assert error.value.status_code == 422
+
+
+def test_references_to_an_operation_of_another_kind_are_rejected():
+    with pytest.raises(HTTPException) as error:
+        validate_batch(operations(
+            {'operation': 'create_node', 'label': 'Person'},
+            {'operation': 'delete_relationship', 'relationship_id': '$0'}))
+    assert 'not an earlier create_relationship' in error.value.detail
+
+
+async def test_references_are_resolved_to_the_created_ids(client, driver):
+    relationship = {'id': 31, 'type': 'KNOWS', 'properties': {}, 'source_id': 42, 'target_id': 7,
+                    'source_labels': ['Person'], 'target_labels': ['Person']}
+    driver.responses.update({'create_node': [dict(default_record(), id=42)],
+                             'create_relationship_by_id': [relationship]})
+
+    response = await client.post('/graph/batch', json=[
+        {'operation': 'create_node', 'label': 'Person', 'properties': {'name': 'Ada'}},
+        {'operation': 'create_relationship', 'source_node_id': '$0', 'target_node_id': 7,
+         'relationship_type': 'KNOWS'},
+        {'operation': 'update_relationship', 'relationship_id': '$1', 'properties': {'since': 2020}}])
+
+    assert response.status_code == 200
+    assert [result['operation'] for result in response.json()['results']] == \
+        ['create_node', 'create_relationship', 'update_relationship']
+    created = driver.sent('create_relationship_by_id')[0]
+    assert (created['source_id'], created['target_id']) == (42, 7)
+    assert driver.sent('update_relationship')[0]['rel_id'] == 31
+
+
+async def test_a_batch_is_rolled_back_when_an_operation_matches_nothing(client, driver):
+    driver.responses['update_node'] = []
+
+    response = await client.post('/graph/batch', json=[
+        {'operation': 'create_node', 'label': 'Person'},
+        {'operation': 'update_node', 'node_id': '$0', 'properties': {'name': 'Ada'}}])
+
+    assert response.status_code == 422
+    assert 'rolled back' in response.json()['detail']
@@ -0,0 +1,43 @@
+import pytest
+from fastapi import HTTPException
+
+from app.graph.crud import decode_cursor, encode_cursor
+
+pytestmark = pytest.mark.anyio
+
+PAGE = {'search_node_property': 'name', 'node_property_value': 'Ada', 'label': 'Person', 'limit': 2}
+
+
+def test_cursors_hold_the_last_node_id():
+    assert decode_cursor(encode_cursor(41)) == 41
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor', encode_cursor('x')[:-2], 'eyJiZWZvcmUiOiAxfQ=='])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 422
+
+
+@pytest.mark.driver(result_size=3)
+async def test_a_full_page_has_a_cursor_to_the_next_page(client, driver):
+    page = (await client.get('/graph/read_node_collection', params=PAGE)).json()
+    assert [node['node_id'] for node in page['nodes']] == [0, 1]
+    # One node more than the page is fetched to find out whether there is a next page
+    assert driver.sent('read_nodes_by_label')[0]['limit'] == 3
+
+    await client.get('/graph/read_node_collection', params=dict(PAGE, cursor=page['next_cursor']))
+    assert driver.sent('read_nodes_by_label')[1]['after'] == 1
+
+
+async def test_the_last_page_has_no_cursor(client, driver):
+    page = (await client.get('/graph/read_node_collection', params=PAGE)).json()
+    assert len(page['nodes']) == 1
+    assert page['next_cursor'] is None
+    assert driver.sent('read_nodes_by_label')[0]['after'] == -1
+
+
+async def test_an_invalid_cursor_is_refused_before_the_query(client, driver):
+    response = await client.get('/graph/read_node_collection', params=dict(PAGE, cursor='not a cursor'))
+    assert response.status_code == 422
+    assert driver.sent('read_nodes_by_label') == []
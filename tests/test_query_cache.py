@@ -0,0 +1,79 @@
+import pytest
+
+from app.query.cache import QueryResultCache, dependencies, normalise
+
+pytestmark = pytest.mark.anyio
+
+STATEMENT = 'MATCH (person:Person)-[:WORKS_FOR]->(company) RETURN person'
+
+
+def cached(cache: QueryResultCache, statement: str, records: list):
+    key = cache.key(statement, {})
+    depends_on = dependencies(statement)
+    cache.set(key, depends_on, cache.snapshot(depends_on), records)
+    return key
+
+
+def test_statements_depend_on_the_labels_and_types_they_name():
+    assert dependencies(STATEMENT) == {'Person', 'WORKS_FOR'}
+    assert dependencies("MATCH (n) WHERE n.name = ':Company' RETURN n") is None
+    assert dependencies('MATCH (n:`Event`|Address) RETURN n') == {'Event', 'Address'}
+
+
+def test_reformatted_statements_share_a_key():
+    assert normalise('MATCH  (n)\n RETURN n') == normalise('MATCH (n) RETURN n')
+    assert normalise("RETURN 'a  b'") != normalise("RETURN 'a b'")
+
+
+def test_changes_to_a_named_label_invalidate_the_entry():
+    cache = QueryResultCache(maxbytes=1024 * 1024, ttl=60)
+    key = cached(cache, STATEMENT, [{'person': 1}])
+    assert cache.get(key) == [{'person': 1}]
+
+    cache.changed('Company')
+    assert cache.get(key) == [{'person': 1}]
+
+    cache.changed('Person')
+    assert cache.get(key) is None
+
+
+def test_any_change_invalidates_statements_that_name_nothing():
+    cache = QueryResultCache(maxbytes=1024 * 1024, ttl=60)
+    key = cached(cache, 'MATCH (n) RETURN n', [{'n': 1}])
+
+    cache.changed('Event')
+    assert cache.get(key) is None
+
+
+def test_changes_that_cannot_be_scoped_invalidate_every_entry():
+    cache = QueryResultCache(maxbytes=1024 * 1024, ttl=60)
+    key = cached(cache, STATEMENT, [{'person': 1}])
+
+    cache.changed_everything()
+    assert cache.get(key) is None
+
+
+def test_changes_made_while_a_statement_runs_leave_its_entry_stale():
+    cache = QueryResultCache(maxbytes=1024 * 1024, ttl=60)
+    key = cache.key(STATEMENT, {})
+    depends_on = dependencies(STATEMENT)
+    generations = cache.snapshot(depends_on)
+    cache.changed('Person')
+    cache.set(key, depends_on, generations, [{'person': 1}])
+    assert cache.get(key) is None
+
+
+async def test_query_results_are_served_until_a_write_to_their_label(client, driver):
+    params = {'cypher_string': 'MATCH (n:Person) RETURN n', 'read_only': 'true'}
+    first = await client.get('/q', params=params)
+    sent = len(driver.statements)
+
+    assert (await client.get('/q', params=params)).json() == first.json()
+    assert len(driver.statements) == sent
+
+    response = await client.post('/graph/create_node', params={'label': 'Person'}, json={'name': 'Ada'})
+    assert response.status_code == 200
+    sent = len(driver.statements)
+
+    assert (await client.get('/q', params=params)).status_code == 200
+    assert len(driver.statements) == sent + 1
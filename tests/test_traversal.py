@@ -0,0 +1,37 @@
+import pytest
+
+from app.utils.metrics import CYPHER_ERRORS
+
+pytestmark = pytest.mark.anyio
+
+
+async def template_errors(client, template: str):
+    statistics = (await client.get('/admin/queries')).json()['templates']
+    return statistics.get(template, {'errors': 0})['errors']
+
+
+def error_samples(template: str):
+    return [sample for sample in CYPHER_ERRORS.samples() if f'template="{template}"' in sample]
+
+
+@pytest.mark.driver(result_size=5)
+async def test_a_neighbourhood_read_up_to_its_limit_is_not_an_error(client, driver):
+    errors = await template_errors(client, 'neighbourhood_hop')
+    samples = error_samples('neighbourhood_hop')
+
+    response = await client.get('/graph/neighbourhood/100', params={'limit': 1})
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 1
+
+    assert await template_errors(client, 'neighbourhood_hop') == errors
+    assert error_samples('neighbourhood_hop') == samples
+
+
+@pytest.mark.driver(result_size=3)
+async def test_each_hop_expands_the_new_nodes_of_the_last(client, driver):
+    response = await client.get('/graph/neighbourhood/100', params={'depth': 2, 'fanout': 2})
+    assert response.status_code == 200
+
+    hops = driver.sent('neighbourhood_hop')
+    assert [hop['frontier'] for hop in hops] == [[100], [0, 1, 2]]
+    assert {hop['fanout'] for hop in hops} == {2}
@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.authorisation.auth import user_cache
+from app.utils import cache
+from benchmarks.fake_driver import default_record
+
+pytestmark = pytest.mark.anyio
+
+
+# User returned by the user lookups from now on, as the database would after a change
+def stored_user(driver, **changes):
+    driver.responses['read_users'] = [{'user': dict(default_record()['user'], **changes)}]
+
+
+async def test_users_are_looked_up_once_while_cached(client, driver):
+    before = user_cache.stats()
+    for _ in range(3):
+        assert (await client.get('/users/me')).status_code == 200
+
+    after = user_cache.stats()
+    assert len(driver.sent('read_users')) == 1
+    assert (after['hits'] - before['hits'], after['misses'] - before['misses']) == (2, 1)
+
+
+async def test_users_are_looked_up_again_once_their_entry_expires(client, driver, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, 'time', SimpleNamespace(monotonic=lambda: now[0]))
+
+    await client.get('/users/me')
+    now[0] += user_cache.ttl - 1
+    await client.get('/users/me')
+    assert len(driver.sent('read_users')) == 1
+
+    now[0] += 2
+    await client.get('/users/me')
+    assert len(driver.sent('read_users')) == 2
+
+
+async def test_a_disabled_user_is_refused_straight_after_the_update(client, driver):
+    assert (await client.get('/users/me')).status_code == 200
+
+    stored_user(driver, disabled=True)
+    response = await client.put('/users/benchmark/update', json={'disabled': True})
+    assert response.status_code == 200
+    assert 'benchmark' not in user_cache._entries
+
+    assert (await client.get('/users/me')).status_code == 400
+
+
+async def test_a_deleted_user_is_refused_straight_after_the_delete(client, driver):
+    assert (await client.get('/users/me')).status_code == 200
+
+    driver.responses['read_users'] = []
+    assert (await client.delete('/users/benchmark/delete')).status_code == 200
+
+    assert (await client.get('/users/me')).status_code == 401
+
+
+async def test_a_new_password_drops_the_cached_user(client, driver):
+    assert (await client.get('/users/me')).status_code == 200
+
+    stored_user(driver, full_name='Renamed User')
+    response = await client.put('/users/me/reset_password', params={'new_password': 'new-password'})
+    assert response.status_code == 200
+
+    assert (await client.get('/users/me')).json()['full_name'] == 'Renamed User'
+    assert len(driver.sent('read_users')) == 2